@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+from results import PFResult
+
+
+def power_mismatch(Y, V, S):
+    """ Complex power mismatch V * conj(Y V) - S, bus x batch """
+    return V * np.conj(Y @ V) - S
+
+
+def newton_raphson(Y, S, V0, slack, tol=1e-8, max_iter=20):
+    """
+    AC power flow by Newton-Raphson in polar form, many cases at once
+    ------------------------------------------------
+    Every column of S / V0 is one case (period or scenario) over the same
+    Ybus. The Jacobians of all the cases form one block-diagonal sparse
+    matrix, factorized once per iteration, so the batch costs about as
+    many iterations as a single case. The slack bus keeps the voltage of
+    V0; every other bus is PQ with the injection S.
+    ------------------------------------------------
+    Args:
+        Y = Ybus 'scipy.sparse' n x n (Topology.admittance)
+        S = complex injections in p.u. (generation - load), bus x batch
+        V0 = complex starting voltages, bus x batch
+        slack = row of the slack bus
+    ------------------------------------------------
+    Return:
+        'dict' with V (complex, bus x batch), iterations, converged and
+        mismatch (largest |dS| per case, p.u.)
+    """
+    Y = sp.csr_matrix(Y)
+    S = np.asarray(S, dtype=complex).reshape(Y.shape[0], -1)
+    V = np.array(V0, dtype=complex).reshape(S.shape)
+    n, B = S.shape
+
+    pq = np.flatnonzero(np.arange(n) != slack)
+    n_pq = len(pq)
+    position = np.full(n, -1)
+    position[pq] = np.arange(n_pq)
+
+    # _________ Ybus entries between PQ buses, the sparsity of every Jacobian block _________
+    coo = Y.tocoo()
+    keep = (position[coo.row] >= 0) & (position[coo.col] >= 0)
+    i, j, y = coo.row[keep], coo.col[keep], coo.data[keep][:, None]
+    a, b = position[i], position[j]
+    rows = np.concatenate([a, a, a + n_pq, a + n_pq, position[pq], position[pq], position[pq] + n_pq, position[pq] + n_pq])
+    cols = np.concatenate([b, b + n_pq, b, b + n_pq, position[pq], position[pq] + n_pq, position[pq], position[pq] + n_pq])
+    offset = np.arange(B) * 2 * n_pq
+    rows, cols = (rows[:, None] + offset).ravel(), (cols[:, None] + offset).ravel()
+
+    Va, Vm = np.angle(V), np.abs(V)
+    mismatch = power_mismatch(Y, V, S)[pq]
+    F = np.concatenate([mismatch.real, mismatch.imag])
+    iterations = 0
+    while np.abs(F).max(initial=0) > tol and iterations < max_iter:
+        iterations += 1
+        current = Y @ V
+        Vn = V / Vm
+        # dS/dVa = j diag(V) conj(diag(I) - Y diag(V)), dS/dVm = diag(V) conj(Y diag(Vn)) + conj(diag(I)) diag(Vn)
+        dVa = -1j * V[i] * np.conj(y * V[j])
+        dVm = V[i] * np.conj(y * Vn[j])
+        dVa_diag = 1j * V[pq] * np.conj(current[pq])
+        dVm_diag = np.conj(current[pq]) * Vn[pq]
+        values = np.concatenate([dVa.real, dVm.real, dVa.imag, dVm.imag,
+                                 dVa_diag.real, dVm_diag.real, dVa_diag.imag, dVm_diag.imag]).ravel()
+        J = sp.csc_matrix((values, (rows, cols)), shape=(2 * n_pq * B, 2 * n_pq * B))
+
+        step = spsolve(J, -F.T.ravel()).reshape(B, 2 * n_pq).T
+        Va[pq] += step[:n_pq]
+        Vm[pq] += step[n_pq:]
+        V = Vm * np.exp(1j * Va)
+        mismatch = power_mismatch(Y, V, S)[pq]
+        F = np.concatenate([mismatch.real, mismatch.imag])
+
+    largest = np.abs(mismatch).max(axis=0, initial=0)
+    return {'V': V, 'iterations': iterations, 'converged': largest <= tol, 'mismatch': largest}
+
+
+def injections(topology, values):
+    """
+    Net complex injections (generation - load) of a DistFlow solution, bus x batch
+    ------------------------------------------------
+    From the balances (1)(2) of SOCP_PF, so they need neither the loads
+    nor the generation set points: P_inj = -sum_out(P_ij - r I) + sum_in(P_ij).
+    """
+    S = np.zeros(values['V'].shape, dtype=complex)
+    for flow, loss, unit in (('P_ij', topology.r, 1), ('Q_ij', topology.x, 1j)):
+        net = np.zeros(values['V'].shape)
+        np.add.at(net, topology.from_idx, loss[:, None] * values['I'] - values[flow])
+        np.add.at(net, topology.to_idx, values[flow])
+        S += unit * net
+    return S
+
+
+def voltage_phasors(topology, values):
+    """
+    Complex voltages of a DistFlow solution, bus x batch
+    ------------------------------------------------
+    Magnitudes are the SOCP ones; angles follow the branch currents from
+    the root (angle 0): I_ij = conj(S_send / V_i) and V_j = V_i - z I_ij,
+    with S_send = -(P_ij + j Q_ij) + z I, the power received at j plus
+    the branch losses.
+    """
+    z = topology.r + 1j * topology.x
+    sending = -(values['P_ij'] + 1j * values['Q_ij']) + z[:, None] * values['I']
+    V = np.sqrt(np.maximum(values['V'], 0)).astype(complex)
+    angle = np.zeros(values['V'].shape)
+    for k in topology.order[1:]:
+        b, i = topology.parent_branch[k], topology.parent[k]
+        Vi = V[i] * np.exp(1j * angle[i])
+        angle[k] = np.angle(Vi - z[b] * np.conj(sending[b] / Vi))
+    return V * np.exp(1j * angle)
+
+
+def verify_ac(topology, results, shunts=False, tol=1e-8, max_iter=20):
+    """
+    AC check of SOCP solutions by Newton-Raphson started from them
+    ------------------------------------------------
+    All periods of all the results go through newton_raphson as one batch,
+    with the injections of each solution (generation set points included)
+    and the root as slack at the SOCP voltage. Per case it reports:
+        relaxation_gap  = largest slack of the cone (4), V_from I - P^2 - Q^2
+        start_mismatch  = largest |dS| of the AC equations at the SOCP point
+        mismatch, iterations, converged = of the Newton-Raphson solution
+        V_error         = largest | |V_ac| - V_socp | [p.u.]
+        losses, losses_ac = SOCP and AC total losses [x scale of the result]
+    The cone (4) pairs the received power with the sending-end voltage, so
+    even a tight relaxation differs from the AC solution by a second order
+    term; V_error and the losses show by how much.
+    ------------------------------------------------
+    Args:
+        topology = 'Topology' the results refer to
+        results = 'PFResult' or list of them (e.g. scenarios), same network
+        shunts = include the branch charging bsh in Ybus (SOCP_PF leaves it out)
+    ------------------------------------------------
+    Return:
+        DataFrame with one row per (case, t)
+    """
+    results = [results] if isinstance(results, PFResult) else list(results)
+    values = {name: np.concatenate([r.model_values()[name] for r in results], axis=1)
+              for name in ('V', 'I', 'P_ij', 'Q_ij')}
+    Y = topology.admittance(shunts=shunts)
+
+    S = injections(topology, values)
+    V0 = voltage_phasors(topology, values)
+    ac = newton_raphson(Y, S, V0, topology.root, tol=tol, max_iter=max_iter)
+
+    gap = values['V'][topology.from_idx] * values['I'] - values['P_ij'] ** 2 - values['Q_ij'] ** 2
+    scale = np.concatenate([np.full(len(r.times), r.scale) for r in results])
+    report = pd.DataFrame({
+        'case': np.concatenate([np.full(len(r.times), k) for k, r in enumerate(results)]),
+        't': [t for r in results for t in r.times],
+        'relaxation_gap': gap.max(axis=0, initial=0),
+        'start_mismatch': np.abs(power_mismatch(Y, V0, S)[np.arange(topology.n_bus) != topology.root]).max(axis=0),
+        'mismatch': ac['mismatch'],
+        'iterations': ac['iterations'],
+        'converged': ac['converged'],
+        'V_error': np.abs(np.abs(ac['V']) - np.abs(V0)).max(axis=0),
+        'losses': np.concatenate([r.losses for r in results]),
+        'losses_ac': np.real(power_mismatch(Y, ac['V'], 0).sum(axis=0)) * scale})
+    return report
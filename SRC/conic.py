@@ -0,0 +1,317 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+
+# Column blocks of the conic problem, same order and (row x time) layout as model.VARIABLES
+COLUMNS = ('P_ij', 'Q_ij', 'I', 'V', 'Pgen', 'Qgen', 'Perdas')
+
+# Constant variable bounds of the SOCP relaxation (squared magnitudes)
+BOUNDS = {'I': (0 ** 2, 500 ** 2),
+          'V': (0.95 ** 2, 1.05 ** 2)}
+
+# LinDistFlow objective weight of -sum(V): without losses the generation no longer
+# depends on V, so the LP is steered to the high voltages the SOCP picks to cut losses
+LINDISTFLOW_V_WEIGHT = 1e-3
+
+# Equality row blocks, named as the constraints of the Pyomo model
+ROWS = ('active_power', 'reactive_power', 'voltage_drop', 'perdas')
+
+
+class ConicProblem:
+    """
+    SOCP relaxation in standard conic form
+    ------------------------------------------------
+        minimize    c'x (+ x'Hx / 2 with a `quadratic` H)
+        subject to  A x = b
+                    lb <= x <= ub
+                    x[u] * x[v] >= x[w1]^2 + x[w2]^2   for (u, v, w1, w2) in rotated_cones
+    ------------------------------------------------
+    x stacks the COLUMNS blocks, each of shape (bus or branch) x time and
+    flattened row-major, so x[columns['V']] reshaped (-1, T) is V as in
+    SOCP_PF._model_values. The rows of A are the ROWS blocks in the same
+    layout; a rotated cone (V_from, I, P_ij, Q_ij) is the constraint (4)
+    of one branch and period. `quadratic` (None by default) is a sparse H
+    set by callers that add proximal terms (decomposition.ADMMDecomposition).
+    """
+
+    def __init__(self, c, A, b, lb, ub, rotated_cones, columns, rows, n_times):
+        self.c = c
+        self.A = A
+        self.b = b
+        self.lb = lb
+        self.ub = ub
+        self.rotated_cones = rotated_cones
+        self.columns = columns
+        self.rows = rows
+        self.n_times = n_times
+        self.quadratic = None
+
+    @property
+    def n(self):
+        return len(self.c)
+
+    def values(self, x):
+        """ 'dict' {variable: array (bus or branch) x time} of a solution vector """
+        return {name: np.asarray(x[block]).reshape(-1, self.n_times) for name, block in self.columns.items()}
+
+    def row_values(self, y):
+        """ 'dict' {constraint: array (bus or branch) x time} of a vector over the rows of A (e.g. duals) """
+        return {name: np.asarray(y[block]).reshape(-1, self.n_times) for name, block in self.rows.items()}
+
+    def standard_form(self):
+        """
+        Split into equality and cone blocks as taken by interior-point solvers
+        ------------------------------------------------
+        Fixed variables (lb == ub, e.g. Pgen of buses without generation)
+        become equality rows; finite bounds go to the nonnegative cone and
+        each rotated cone becomes the second-order cone
+        ||(u - v, 2 w1, 2 w2)|| <= u + v.
+        ------------------------------------------------
+        Return:
+            A_eq, b_eq, G, h, n_nonneg, n_soc with A_eq x = b_eq and
+            h - G x in R+^n_nonneg x (SOC of dimension 4)^n_soc
+        """
+        n = self.n
+        eye = sp.identity(n, format='csr')
+        fixed = np.flatnonzero(self.lb == self.ub)
+        free = self.lb != self.ub
+        lower = np.flatnonzero(free & np.isfinite(self.lb))
+        upper = np.flatnonzero(free & np.isfinite(self.ub))
+
+        A_eq = sp.vstack([self.A, eye[fixed]], format='csc')
+        b_eq = np.concatenate([self.b, self.lb[fixed]])
+
+        u, v, w1, w2 = self.rotated_cones.T
+        k = len(u)
+        cone_rows = np.arange(4 * k).reshape(k, 4)
+        soc = sp.coo_matrix((np.concatenate([-np.ones(2 * k), -np.ones(k), np.ones(k), -2 * np.ones(2 * k)]),
+                             (np.concatenate([cone_rows[:, 0], cone_rows[:, 0], cone_rows[:, 1], cone_rows[:, 1],
+                                              cone_rows[:, 2], cone_rows[:, 3]]),
+                              np.concatenate([u, v, u, v, w1, w2]))), shape=(4 * k, n))
+
+        G = sp.vstack([-eye[lower], eye[upper], soc], format='csc')
+        h = np.concatenate([-self.lb[lower], self.ub[upper], np.zeros(4 * k)])
+        return A_eq, b_eq, G, h, len(lower) + len(upper), k
+
+
+def conic_form(topology, profiles):
+    """
+    Assemble the SOCP relaxation of SOCP_PF directly as sparse matrices
+    ------------------------------------------------
+    Same constraints (1)-(4), losses and objective as SOCP_PF.build, built
+    with vectorized index arithmetic over the topology arrays instead of
+    Pyomo expressions.
+    ------------------------------------------------
+    Args:
+        topology = 'Topology' in p.u.
+        profiles = 'dict' {quantity: array bus x time in p.u.} with 'P',
+                   'Q', 'P_gen_limit' and 'Q_gen_limit' (SOCP_PF.profiles)
+    ------------------------------------------------
+    Return:
+        'ConicProblem'
+    """
+    n_bus, n_br = topology.n_bus, topology.n_branch
+    T = profiles['P'].shape[1]
+    sizes = {'P_ij': n_br, 'Q_ij': n_br, 'I': n_br, 'V': n_bus, 'Pgen': n_bus, 'Qgen': n_bus, 'Perdas': n_bus}
+
+    offsets = np.cumsum([0] + [sizes[name] * T for name in COLUMNS])
+    columns = {name: slice(offsets[k], offsets[k + 1]) for k, name in enumerate(COLUMNS)}
+    row_sizes = {'active_power': n_bus, 'reactive_power': n_bus, 'voltage_drop': n_br, 'perdas': n_bus}
+    row_offsets = np.cumsum([0] + [row_sizes[name] * T for name in ROWS])
+    rows = {name: slice(row_offsets[k], row_offsets[k + 1]) for k, name in enumerate(ROWS)}
+
+    t = np.arange(T)
+
+    def at(block, index):
+        # Flat positions (index x time) inside a column or row block
+        start = columns[block].start if block in columns else rows[block].start
+        return (np.asarray(index)[:, None] * T + t).ravel() + start
+
+    def per_time(values):
+        return np.repeat(values, T)
+
+    frm, to = topology.from_idx, topology.to_idx
+    branches = np.arange(n_br)
+    r, x = topology.r, topology.x
+    z2 = r ** 2 + x ** 2
+    ones_bus, ones_br = np.ones(n_bus * T), np.ones(n_br * T)
+
+    entries = []    # (row positions, column positions, values)
+    # _________ (1) and (2) Pgen - P - sum_out(r I) + sum_out(P_ij) - sum_in(P_ij) = 0 _________
+    for balance, flow, gen, loss in (('active_power', 'P_ij', 'Pgen', r), ('reactive_power', 'Q_ij', 'Qgen', x)):
+        entries += [(at(balance, np.arange(n_bus)), at(gen, np.arange(n_bus)), ones_bus),
+                    (at(balance, frm), at('I', branches), -per_time(loss)),
+                    (at(balance, frm), at(flow, branches), ones_br),
+                    (at(balance, to), at(flow, branches), -ones_br)]
+
+    # _________ (3) V_from - V_to + 2(r P + x Q) - (r^2 + x^2) I = 0 _________
+    entries += [(at('voltage_drop', branches), at('V', frm), ones_br),
+                (at('voltage_drop', branches), at('V', to), -ones_br),
+                (at('voltage_drop', branches), at('P_ij', branches), 2 * per_time(r)),
+                (at('voltage_drop', branches), at('Q_ij', branches), 2 * per_time(x)),
+                (at('voltage_drop', branches), at('I', branches), -per_time(z2))]
+
+    # _________ Perdas - Pgen = -P _________
+    entries += [(at('perdas', np.arange(n_bus)), at('Perdas', np.arange(n_bus)), ones_bus),
+                (at('perdas', np.arange(n_bus)), at('Pgen', np.arange(n_bus)), -ones_bus)]
+
+    row_idx, col_idx, vals = (np.concatenate(parts) for parts in zip(*entries))
+    A = sp.csr_matrix((vals, (row_idx, col_idx)), shape=(row_offsets[-1], offsets[-1]))
+
+    P = profiles['P'].ravel()
+    b = np.concatenate([P, profiles['Q'].ravel(), np.zeros(n_br * T), -P])
+
+    c = np.zeros(offsets[-1])
+    c[columns['Pgen']] = 10
+
+    lb = np.full(offsets[-1], -np.inf)
+    ub = np.full(offsets[-1], np.inf)
+    for name, (low, high) in BOUNDS.items():
+        lb[columns[name]], ub[columns[name]] = low, high
+    for name, limit in (('Pgen', 'P_gen_limit'), ('Qgen', 'Q_gen_limit')):
+        lb[columns[name]] = 0
+        ub[columns[name]] = np.nan_to_num(profiles[limit]).ravel()
+
+    # _________ (4) V_from * I >= P_ij^2 + Q_ij^2 _________
+    rotated_cones = np.column_stack([at('V', frm), at('I', branches), at('P_ij', branches), at('Q_ij', branches)])
+
+    return ConicProblem(c, A, b, lb, ub, rotated_cones, columns, rows, T)
+
+
+def lindistflow_form(topology, profiles):
+    """
+    Linearized DistFlow (LinDistFlow) LP of the same network
+    ------------------------------------------------
+    conic_form without the cones (4) and with I fixed at 0, which drops
+    the loss terms r * I, x * I of the balances and (r^2 + x^2) * I of the
+    voltage drops: flows are the sums of the downstream loads and V falls
+    linearly along the feeder. All periods are solved in one LP.
+    ------------------------------------------------
+    The objective also carries -LINDISTFLOW_V_WEIGHT * sum(V): without
+    losses any voltage level within the bounds is optimal, and the SOCP
+    settles at the highest one.
+    """
+    problem = conic_form(topology, profiles)
+    problem.lb[problem.columns['I']] = problem.ub[problem.columns['I']] = 0
+    problem.c[problem.columns['V']] = -LINDISTFLOW_V_WEIGHT
+    problem.rotated_cones = np.empty((0, 4), dtype=int)
+    return problem
+
+
+class ConicSolution:
+    """
+    Outcome of a conic backend
+    ------------------------------------------------
+    x = primal solution; duals = multipliers of the rows of A (sign as
+    z in c + A'z + ... = 0, the one of Clarabel and ECOS); status =
+    backend status text; converged = 'bool'
+    """
+
+    def __init__(self, x, duals, status, converged, iterations=None, solve_time=None):
+        self.x = x
+        self.duals = duals
+        self.status = status
+        self.converged = converged
+        self.iterations = iterations
+        self.solve_time = solve_time
+
+
+class ConicBackend:
+    """
+    Interface of a conic interior-point solver
+    ------------------------------------------------
+    Subclasses implement solve(problem, **options) -> ConicSolution and
+    import their solver lazily, so only the backend in use has to be
+    installed. New backends are added with register_backend().
+    """
+
+    name = None
+
+    def solve(self, problem, **options):
+        raise NotImplementedError
+
+
+class ClarabelBackend(ConicBackend):
+    """ Clarabel (pip install clarabel) """
+
+    name = 'clarabel'
+
+    def solve(self, problem, **options):
+        try:
+            import clarabel
+        except ImportError as error:
+            raise ImportError("The 'clarabel' conic backend requires clarabel (pip install clarabel)") from error
+
+        A_eq, b_eq, G, h, n_nonneg, n_soc = problem.standard_form()
+        settings = clarabel.DefaultSettings()
+        settings.verbose = False
+        for option, value in options.items():
+            setattr(settings, option, value)
+
+        cones = [clarabel.ZeroConeT(A_eq.shape[0]), clarabel.NonnegativeConeT(n_nonneg)]
+        cones += [clarabel.SecondOrderConeT(4)] * n_soc
+        # Clarabel takes the upper triangle of H
+        H = sp.csc_matrix((problem.n, problem.n)) if problem.quadratic is None else sp.triu(problem.quadratic, format='csc')
+        solver = clarabel.DefaultSolver(H, problem.c,
+                                        sp.vstack([A_eq, G], format='csc'), np.concatenate([b_eq, h]),
+                                        cones, settings)
+        solution = solver.solve()
+        status = str(solution.status)
+        return ConicSolution(np.array(solution.x), np.array(solution.z)[:problem.A.shape[0]], status,
+                             status in ('Solved', 'AlmostSolved'), solution.iterations, solution.solve_time)
+
+
+class ECOSBackend(ConicBackend):
+    """ ECOS (pip install ecos) """
+
+    name = 'ecos'
+
+    def solve(self, problem, **options):
+        try:
+            import ecos
+        except ImportError as error:
+            raise ImportError("The 'ecos' conic backend requires ecos (pip install ecos)") from error
+
+        if problem.quadratic is not None:
+            raise ValueError('ECOS does not take a quadratic objective, use the clarabel backend')
+        A_eq, b_eq, G, h, n_nonneg, n_soc = problem.standard_form()
+        start = time.perf_counter()
+        solution = ecos.solve(problem.c, G, h, {'l': n_nonneg, 'q': [4] * n_soc}, A_eq, b_eq,
+                              verbose=False, **options)
+        info = solution['info']
+        return ConicSolution(solution['x'], solution['y'][:problem.A.shape[0]], info['infostring'],
+                             info['exitFlag'] in (0, 10), info['iter'], time.perf_counter() - start)
+
+
+class HiGHSBackend(ConicBackend):
+    """ HiGHS through scipy.optimize.linprog, for problems without cones (lindistflow_form) """
+
+    name = 'highs'
+
+    def solve(self, problem, **options):
+        from scipy.optimize import linprog
+
+        if len(problem.rotated_cones) or problem.quadratic is not None:
+            raise ValueError('HiGHS solves linear problems only, use the clarabel backend for the SOCP')
+        start = time.perf_counter()
+        solution = linprog(problem.c, A_eq=problem.A, b_eq=problem.b, bounds=np.column_stack([problem.lb, problem.ub]),
+                           method='highs', options=options or None)
+        converged = solution.status == 0
+        x = solution.x if converged else np.full(problem.n, np.nan)
+        # linprog marginals are d(objective)/d(b), the opposite of the ConicSolution sign
+        duals = -solution.eqlin.marginals if converged else np.full(problem.A.shape[0], np.nan)
+        return ConicSolution(x, duals, solution.message, converged, solution.nit, time.perf_counter() - start)
+
+
+BACKENDS = {'clarabel': ClarabelBackend, 'ecos': ECOSBackend, 'highs': HiGHSBackend}
+
+
+def register_backend(name, backend):
+    """ Make a ConicBackend subclass available as SOCP_PF(engine='conic', solver=name) """
+    BACKENDS[name] = backend
+
+
+def get_backend(name):
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown conic backend {name!r}, expected one of {list(BACKENDS)}')
+    return BACKENDS[name]()
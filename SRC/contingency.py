@@ -0,0 +1,337 @@
+import os
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+from model import SOCP_PF, VARIABLES, DUALS
+from conic import ConicProblem, conic_form, get_backend
+
+# Per-branch and per-bus components switched off by a contingency
+BRANCH_VARIABLES = ('P_ij', 'Q_ij', 'I')
+BRANCH_CONSTRAINTS = ('voltage_drop', 'branch_flow')
+BUS_VARIABLES = ('V', 'Pgen', 'Qgen', 'Perdas')
+BUS_CONSTRAINTS = ('active_power', 'reactive_power', 'perdas')
+
+# Sort keys of the ranking, most severe first
+RANKING = ('converged', 'voltage_violation', 'load_shed', 'loss_increase')
+
+# Case handler owned by each worker process (model built once, switched per case)
+_WORKER = None
+
+
+def n_minus_1_cases(topology, branches=None):
+    """
+    One outage case per branch
+    ------------------------------------------------
+    Args:
+        branches = list of (from, to) bus ids; defaults to all the branches
+    ------------------------------------------------
+    Return:
+        List of case dicts {'name': 'i-j', 'open': [(i, j)]}
+    """
+    if branches is None:
+        branches = topology.branch_list()
+    return [{'name': f'{i}-{j}', 'open': [(i, j)]} for i, j in branches]
+
+
+def energized_buses(topology, opened, profiles=None):
+    """
+    Buses still supplied with some branches open
+    ------------------------------------------------
+    Args:
+        opened = 'np.ndarray' bool per branch, True when open
+        profiles = with profiles, islands holding a bus with generation
+                   capacity (P_gen_limit > 0) stay energized; by default
+                   only the island of the root is
+    ------------------------------------------------
+    Return:
+        'np.ndarray' bool per bus
+    """
+    closed = ~np.asarray(opened, dtype=bool)
+    n = topology.n_bus
+    graph = sp.coo_matrix((np.ones(closed.sum()), (topology.from_idx[closed], topology.to_idx[closed])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    sources = [topology.root]
+    if profiles is not None:
+        sources += np.flatnonzero((profiles['P_gen_limit'] > 0).any(axis=1)).tolist()
+    return np.isin(labels, labels[sources])
+
+
+class ContingencyScreening:
+    """
+    Branch outage (N-1) and switching studies over one feeder model
+    ------------------------------------------------
+    Each worker process builds the model once; a case opens or closes
+    branches by fixing P_ij, Q_ij and I of the branch at zero and
+    deactivating its voltage_drop / branch_flow constraints (engine 'socp'),
+    or by fixing the same columns and dropping the rows and cones
+    (engine 'conic'). Only the components that differ from the previous
+    case are touched. Buses left without supply are de-energized the same
+    way (V, Pgen, Qgen and Perdas fixed at zero, balances deactivated) and
+    their load is reported as shed.
+    ------------------------------------------------
+    Cases are solved with the emergency voltage limits, so a post-outage
+    undervoltage shows up as a violation of the normal limits instead of
+    an infeasible model. The Pyomo model is warm-started from the base-case
+    solution and multipliers (IPOPT warm-start options, see
+    SOCP_PF.resolve); conic backends take no initial point and start cold.
+    """
+
+    def __init__(self, pf, normally_open=(), limits=(0.95, 1.05), emergency_limits=(0.9, 1.05),
+                 dg_islands=False, workers=None):
+        """
+        Args:
+            pf = 'SOCP_PF' of the feeder (engine 'socp' or 'conic'); its
+                 network and profiles are used, the model is not touched
+            normally_open = (from, to) of the tie branches open in the base
+                            case; they must be in the branch table (DLIN)
+                            and can be closed by a switching case
+            limits = normal voltage limits [p.u.] the violation refers to
+            emergency_limits = voltage limits [p.u.] of the post-contingency
+                               solves; the upper one stays at the normal limit
+                               by default, as minimizing losses pushes V up
+            dg_islands = keep islands with generation capacity energized
+                         (off by default, as anti-islanding protection trips DG)
+        """
+        if pf.engine not in ('socp', 'conic'):
+            raise ValueError(f"Contingency screening needs an optimization engine, not {pf.engine!r}")
+        if pf.topology is None:
+            pf.load_data()
+
+        self.topology = pf.topology
+        self.profiles = pf.profiles
+        self.S_base = pf.S_base
+        self.V_base = pf.V_base
+        self.solver = pf.solver
+        self.engine = pf.engine
+        self.limits = limits
+        self.emergency_limits = emergency_limits
+        self.dg_islands = dg_islands
+        self.workers = workers or os.cpu_count()
+
+        self.branch_index = {b: k for k, b in enumerate(self.topology.branch_list())}
+        self.normally_open = self._mask(normally_open)
+        self.base = None
+
+    def _mask(self, branches):
+        mask = np.zeros(self.topology.n_branch, dtype=bool)
+        for branch in branches:
+            if tuple(branch) not in self.branch_index:
+                raise ValueError(f'Branch {branch} is not in the branch table')
+            mask[self.branch_index[tuple(branch)]] = True
+        return mask
+
+    def case_state(self, case):
+        """
+        Open branches and de-energized buses of a case
+        ------------------------------------------------
+        Args:
+            case = 'dict' with optional 'open' and 'close' lists of (from, to);
+                   only normally open branches can be closed
+        ------------------------------------------------
+        Return:
+            opened (bool per branch), dead (bool per bus); branches touching
+            a de-energized bus are open as well
+        """
+        close = self._mask(case.get('close', ()))
+        if np.any(close & ~self.normally_open):
+            raise ValueError(f"Only normally open branches can be closed, got {case['close']}")
+        opened = (self.normally_open & ~close) | self._mask(case.get('open', ()))
+
+        dead = ~energized_buses(self.topology, opened, self.profiles if self.dg_islands else None)
+        opened |= dead[self.topology.from_idx] | dead[self.topology.to_idx]
+        return opened, dead
+
+    def run(self, cases=None, chunksize=1):
+        """
+        Solve the base case, then every case in parallel, and rank them
+        ------------------------------------------------
+        Args:
+            cases = list of case dicts ('name', 'open', 'close', see
+                    case_state); defaults to n_minus_1_cases of the branches
+                    closed in the base case
+        ------------------------------------------------
+        Return:
+            'pd.DataFrame' with one row per case, most severe first: not
+            converged, then voltage_violation, load_shed and loss_increase
+            (losses over the base case), all summed / worst over the periods
+        """
+        if cases is None:
+            closed = [b for b, k in self.branch_index.items() if not self.normally_open[k]]
+            cases = n_minus_1_cases(self.topology, closed)
+        cases = [dict(c, name=c.get('name', k)) for k, c in enumerate(cases)]
+        states = [self.case_state(c) for c in cases]
+
+        # _________ Base case, solved here; its solution warm-starts the cases _________
+        initargs = (self.topology, self.profiles, self.S_base, self.V_base, self.solver, self.engine,
+                    self.limits, self.emergency_limits)
+        _init_worker(*initargs)
+        base_state = self.case_state({})
+        base, values = _solve_case(base_state)
+        if not base.converged:
+            raise RuntimeError('The base case did not converge')
+        self.base = _indicators(base, base_state[1])
+        initargs += (values, _WORKER.multipliers())
+
+        if self.workers == 1:
+            _init_worker(*initargs)
+            outcomes = list(map(_run_case, states))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs) as pool:
+                outcomes = list(pool.map(_run_case, states, chunksize=chunksize))
+
+        table = pd.DataFrame([dict(name=c['name'], open=c.get('open', []), close=c.get('close', []), **outcome)
+                              for c, outcome in zip(cases, outcomes)])
+        table['loss_increase'] = table['losses'] - self.base['losses']
+        table = table.sort_values(list(RANKING), ascending=[True, False, False, False], kind='stable')
+        table.insert(0, 'rank', np.arange(1, len(table) + 1))
+        return table.reset_index(drop=True)
+
+
+class _PyomoCase:
+    """ Built SOCP_PF model switched incrementally from case to case """
+
+    def __init__(self, pf):
+        pf.build()
+        self.pf = pf
+        self.opened = np.zeros(pf.topology.n_branch, dtype=bool)
+        self.dead = np.zeros(pf.topology.n_bus, dtype=bool)
+
+    def apply(self, opened, dead):
+        """ Fix / deactivate only the branches and buses whose state changed """
+        m, topo = self.pf.modelo, self.pf.topology
+        ramos = topo.branch_list()
+        for changed, keys, variables, constraints, state in (
+                (opened != self.opened, ramos, BRANCH_VARIABLES, BRANCH_CONSTRAINTS, opened),
+                (dead != self.dead, topo.nodes.tolist(), BUS_VARIABLES, BUS_CONSTRAINTS, dead)):
+            for k in np.flatnonzero(changed):
+                key = keys[k] if isinstance(keys[k], tuple) else (keys[k],)
+                for t in self.pf.times:
+                    for name in variables:
+                        var = getattr(m, name)[key + (t,)]
+                        var.fix(0) if state[k] else var.unfix()
+                    for name in constraints:
+                        con = getattr(m, name)[key + (t,)]
+                        con.deactivate() if state[k] else con.activate()
+        self.opened, self.dead = opened.copy(), dead.copy()
+
+    def multipliers(self):
+        """ Constraint duals and IPOPT bound multipliers of the last solve, as arrays in storage order """
+        m = self.pf.modelo
+        found = {'dual': {name: [m.dual.get(c) for c in getattr(m, name).values()] for name in DUALS}}
+        for suffix in ('ipopt_zL', 'ipopt_zU'):
+            if hasattr(m, suffix + '_out'):
+                out = getattr(m, suffix + '_out')
+                found[suffix] = {name: [out.get(v) for v in getattr(m, name).values()] for name in VARIABLES}
+        return found
+
+    def set_multipliers(self, multipliers):
+        """ Export multipliers (from multipliers(), e.g. of the base case) with the next solve """
+        m = self.pf.modelo
+        for suffix, source in (('dual', m.dual), ('ipopt_zL', getattr(m, 'ipopt_zL_in', None)),
+                               ('ipopt_zU', getattr(m, 'ipopt_zU_in', None))):
+            if source is None or suffix not in multipliers:
+                continue
+            if suffix != 'dual':
+                source.clear()
+            for name, values in multipliers[suffix].items():
+                for component, z in zip(getattr(m, name).values(), values):
+                    if z is not None:
+                        source[component] = z
+
+    def solve(self, opened, dead, initial_point=None, multipliers=None):
+        self.apply(opened, dead)
+        if initial_point is not None:
+            self.pf.set_initial_point(_switched_point(initial_point, opened, dead))
+        if multipliers is not None:
+            self.set_multipliers(multipliers)
+        return self.pf.resolve(print_output=False, warm_start=initial_point is not None)
+
+
+class _ConicCase:
+    """ Conic form assembled once; a case fixes columns and drops rows and cones """
+
+    def __init__(self, pf):
+        base = self.base = conic_form(pf.topology, pf.profiles)
+        base.lb[base.columns['V']], base.ub[base.columns['V']] = pf.V_bounds
+        self.pf = pf
+
+    def _positions(self, blocks, mask, names):
+        # Flat positions (row x time) of the masked rows of column or row blocks
+        T = self.base.n_times
+        index = (np.flatnonzero(mask)[:, None] * T + np.arange(T)).ravel()
+        return np.concatenate([index + blocks[name].start for name in names])
+
+    def multipliers(self):
+        return None
+
+    def solve(self, opened, dead, initial_point=None, multipliers=None):
+        base, pf = self.base, self.pf
+        lb, ub = base.lb.copy(), base.ub.copy()
+        for mask, names in ((opened, BRANCH_VARIABLES), (dead, BUS_VARIABLES)):
+            fixed = self._positions(base.columns, mask, names)
+            lb[fixed] = ub[fixed] = 0
+
+        keep = np.ones(base.A.shape[0], dtype=bool)
+        keep[self._positions(base.rows, opened, ('voltage_drop',))] = False
+        keep[self._positions(base.rows, dead, BUS_CONSTRAINTS)] = False
+        cones = base.rotated_cones[~np.repeat(opened, base.n_times)]
+
+        problem = ConicProblem(base.c, base.A[keep], base.b[keep], lb, ub, cones, base.columns, {}, base.n_times)
+        pf.solver_result = get_backend(pf.solver).solve(problem)
+        return pf._results(problem.values(pf.solver_result.x), pf.solver_result.converged, False)
+
+
+def _switched_point(values, opened, dead):
+    """ Initial point with the switched-off branches and buses at zero """
+    point = {name: np.array(v, dtype=float) for name, v in values.items()}
+    for names, mask in ((BRANCH_VARIABLES, opened), (BUS_VARIABLES, dead)):
+        for name in names:
+            point[name][mask] = 0
+    return point
+
+
+def _init_worker(topology, profiles, S_base, V_base, solver, engine, limits, emergency_limits, initial_point=None,
+                 multipliers=None):
+    global _WORKER
+    pf = SOCP_PF.from_data(topology, profiles, S_base, V_base, solver=solver, engine=engine)
+    pf.set_voltage_limits(*emergency_limits)
+    _WORKER = (_PyomoCase if engine == 'socp' else _ConicCase)(pf)
+    _WORKER.limits = limits
+    _WORKER.initial_point = initial_point
+    _WORKER.base_multipliers = multipliers
+
+
+def _solve_case(state):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        resultado = _WORKER.solve(*state, initial_point=_WORKER.initial_point, multipliers=_WORKER.base_multipliers)
+    return resultado, resultado.model_values()
+
+
+def _run_case(state):
+    dead = state[1]
+    try:
+        resultado, _ = _solve_case(state)
+    except Exception as error:
+        return dict(_shed(dead), converged=False, status=f'error: {error}', losses=np.nan)
+    return _indicators(resultado, dead)
+
+
+def _shed(dead):
+    pf = _WORKER.pf
+    load = pf.profiles['P'][dead].clip(min=0).sum(axis=0)
+    return {'islanded_buses': int(dead.sum()), 'load_shed': float(load.max(initial=0)) * pf.S_base}
+
+
+def _indicators(resultado, dead):
+    """ Worst-period indicators of a solved case, over the energized buses """
+    if not resultado.converged:
+        return dict(_shed(dead), converged=False, status='not converged', losses=np.nan)
+    V = resultado.V[:, ~dead]
+    V_min, V_max = _WORKER.limits
+    return dict(_shed(dead), converged=True, status='ok', V_min=float(V.min()), V_max=float(V.max()),
+                voltage_violation=float(max(V_min - V.min(), V.max() - V_max, 0)),
+                losses=float(resultado.losses.sum()))
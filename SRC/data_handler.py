@@ -1,35 +1,88 @@
 import time
+import os
+import glob
+import hashlib
+import tempfile
+import contextlib
+import zipfile
+from itertools import zip_longest
 import pandas as pd
 import math
 import numpy as np
+from topology import Topology
+
+# Bump when the cached arrays change meaning, so old cache files are ignored
+CACHE_VERSION = 3
+
+# Environment variable overriding the folder of the parsed network cache
+CACHE_ENV = 'NETDATA_CACHE_DIR'
+
+# Time-series quantities (bus x time) and the workbook sheets holding them
+PROFILE_SHEETS = {'P': 'DPERFIL_P', 'Q': 'DPERFIL_Q',
+                  'P_gen_limit': 'DPERFIL_PGEN', 'Q_gen_limit': 'DPERFIL_QGEN'}
 
 
 class NetData:
 
 
-    def __init__(self, path_filename, S_base=100, V_base=13.8):
-        
-        self.data = pd.ExcelFile(path_filename)
+    def __init__(self, path_filename, S_base=100, V_base=13.8, cache_dir=None):
+        """
+        Args:
+            path_filename = 'str' path to the .xlsx file
+            S_base = 'float' base power in MVA
+            V_base = 'float' base voltage in kV
+            cache_dir = 'str' folder for the parsed network cache,
+                        None for default_cache_dir() (per user, never
+                        next to the workbook), False to disable the cache
+        """
+        self.path_filename = path_filename
         self.S_base = S_base*1e3
         self.V_base = V_base
         self.Ybar = None
+        if cache_dir is None:
+            cache_dir = self.default_cache_dir()
+        self.cache_dir = cache_dir
+        self._data = None
+
+    @staticmethod
+    def default_cache_dir():
+        """ $NETDATA_CACHE_DIR, else socp_pf/netdata in the user cache folder ($XDG_CACHE_HOME or ~/.cache) """
+        if os.environ.get(CACHE_ENV):
+            return os.environ[CACHE_ENV]
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(root, 'socp_pf', 'netdata')
+
+    @property
+    def data(self):
+        """ Workbook, only opened when a sheet has to be parsed """
+        if self._data is None:
+            self._data = pd.ExcelFile(self.path_filename)
+        return self._data
 
     @staticmethod
-    def convert_power_pu(power_kw, mva):
+    def convert_power_pu(power_kw, mva, inplace=False):
         """
         Convert Dictionary Data in kW to p.u.
         -------------------------------------
         Args:
-            power_pw = 'dict' with data in kW
+            power_pw = 'dict' with data in kW or 'np.ndarray'
             mva = 'int' base power in MVA
+            inplace = convert a float array in its own memory (no copy)
         -------------------------------------
         Return:
-            Dict with same structure data in p.u.
+            Dict with same structure data in p.u. (array if an array is given,
+            with NaN replaced by 0)
         -------------------------------------
         Formula: https://nepsi.com/resources/calculators/per-unit-impedance-calculator.htm
         """
 
-        
+        if isinstance(power_kw, np.ndarray) and inplace:
+            np.divide(power_kw, mva, out=power_kw)
+            return np.nan_to_num(power_kw, copy=False, nan=0.0)
+
+        if isinstance(power_kw, np.ndarray):
+            return np.nan_to_num(power_kw.astype(float) / mva, nan=0.0)
+
         if type(power_kw[1]) is not dict:
             agents = power_kw.keys()
             power_pu = {a:0 for a in agents}
@@ -59,19 +112,22 @@ class NetData:
         Convert Dictionary Data in ohm to p.u.
         -------------------------------------
         Args:
-            z_ohm = 'dict' with data in Ohm
+            z_ohm = 'dict' with data in Ohm or 'np.ndarray' (branch table)
             mva = 'int' base power in MVA
             kv = 'int' power transformer voltage level
         -------------------------------------
         Return:
-            Dict with same structure data in p.u.
+            Dict with same structure data in p.u. (array if an array is given)
         -------------------------------------
         Formula: https://nepsi.com/resources/calculators/per-unit-impedance-calculator.htm
         """
+        z_base = (kv * kv ) / (mva)
+
+        if isinstance(z_ohm, np.ndarray):
+            return z_ohm.astype(float) / z_base
+
         nodes = list(z_ohm.keys())
         z_pu = {i:{j:0 for j in nodes} for i in nodes}
-
-        z_base = (kv * kv ) / (mva)
         
         for i in nodes:
             for j in nodes:
@@ -79,6 +135,22 @@ class NetData:
 
         return z_pu
 
+    @staticmethod
+    def convert_siemens_pu(b_siemens, mva, kv):
+        """
+        Convert a branch table of admittances in siemens to p.u.
+        -------------------------------------
+        Args:
+            b_siemens = 'np.ndarray' with data in S
+            mva = 'int' base power, the same given to convert_ohm_pu
+            kv = 'int' power transformer voltage level
+        -------------------------------------
+        Return:
+            'np.ndarray' in p.u. (y_base = 1 / z_base), NaN replaced by 0
+        """
+        z_base = (kv * kv ) / (mva)
+        return np.nan_to_num(np.asarray(b_siemens, dtype=float) * z_base, nan=0.0)
+
 
     @staticmethod
     def get_data(df,num_coluna):
@@ -87,88 +159,286 @@ class NetData:
         value = map(lambda x: x if x != 'x' else math.nan, value)
         return list(value)
 
-    def get_system_data(self):
+    def file_hash(self):
+        """ SHA-256 of the workbook content """
+        digest = hashlib.sha256()
+        with open(self.path_filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def cache_path(self, file_hash=None):
+        """ Cache file keyed by workbook path and hash, S_base, V_base and cache version """
+        # The folder is shared by all workbooks: the stem tells same-named files apart
+        location = hashlib.sha256(os.path.abspath(self.path_filename).encode()).hexdigest()
+        stem = f'{os.path.splitext(os.path.basename(self.path_filename))[0]}_{location[:8]}'
+        bases = hashlib.sha256(f'{self.S_base!r}|{self.V_base!r}|{CACHE_VERSION}'.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{stem}-{(file_hash or self.file_hash())[:20]}-{bases[:8]}.npz')
+
+    def get_topology(self):
+        """
+        Network topology in p.u., from the cache when the workbook is unchanged
+        ------------------------------------------------
+        Return:
+            Topology with branch table and bus data in p.u.
         """
-        Fetch data from .xlsx file from a specific sheet
+        if not self.cache_dir:
+            return self.read_topology()
+
+        path = self.cache_path()
+        if os.path.exists(path):
+            try:
+                with np.load(path) as cached:
+                    return Topology.from_arrays(cached)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                pass    # Unreadable entry, parse the workbook again
+
+        topo = self.read_topology()
+        self._write_cache(path, topo)
+        return topo
+
+    def _write_cache(self, path, topo):
+        stem, file_hash, _ = os.path.basename(path).rsplit('-', 2)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Entries of older versions of the same workbook are stale
+            for old in glob.glob(os.path.join(glob.escape(self.cache_dir), f'{glob.escape(stem)}-*-*.npz')):
+                if os.path.basename(old).rsplit('-', 2)[1] != file_hash:
+                    with contextlib.suppress(FileNotFoundError):    # Removed by another writer
+                        os.remove(old)
+            # Own temporary file per writer: worker pools parse the same workbook at once
+            handle, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-', suffix='.npz')
+            try:
+                with os.fdopen(handle, 'wb') as f:
+                    np.savez(f, **topo.arrays())
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+        except OSError:
+            pass    # Read-only location: the cache is only an optimization
+
+    def read_topology(self):
+        """
+        Fetch network data from the DLIN and DBAR sheets of the .xlsx file
         ------------------------------------------------
-        Args: 
-            file_path = 'str' to path file
-            sheet_name = 'str' name of the sheet to open
+        DLIN holds R and X in ohm and Bsh, the total charging susceptance
+        of the branch, in siemens; all three go to p.u. on the same z_base.
         ------------------------------------------------
         Return:
-            branches, nodes, P, Q, R, X, Pgen_limit, Qgen_limit
+            Topology with branch table and bus data in p.u.
         """
-        
-        DLIN_data = pd.read_excel(self.data, sheet_name ='DLIN',header=0, index_col=0)
-        DBAR_data = pd.read_excel(self.data, sheet_name ='DBAR',header=0, index_col=0)
-        column_index = DLIN_data.columns.values
-        column_index_agents = DBAR_data.columns.values
-
-        from_bus = self.get_data(DLIN_data,0)
-        to_bus = self.get_data(DLIN_data,1)
-        Resistance = self.get_data(DLIN_data,2)
-        Reactance = self.get_data(DLIN_data,3)
-        Bsh = self.get_data(DLIN_data,4)
-
-        Bus_Location = self.get_data(DBAR_data,0)
-        ActivePower = self.get_data(DBAR_data,1)
-        ReactivePower = self.get_data(DBAR_data,2)
-        P_gen = self.get_data(DBAR_data,3)
-        Q_gen = self.get_data(DBAR_data,4)
-
-        nodes = list(range(1,len(from_bus)+2))
-
-        P, P_gen_limit = {},{}
-        Q, Q_gen_limit = {},{}
-        R = {i:{j:0 for j in nodes} for i in nodes}
-        X = {i:{j:0 for j in nodes} for i in nodes}
-        branches  = {}
-        head_bus, tails = [], []
-
-        for pos in range(0,len(from_bus)):
-            R[from_bus[pos]][to_bus[pos]] = Resistance[pos]
-            R[to_bus[pos]][from_bus[pos]] = Resistance[pos]
-            X[from_bus[pos]][to_bus[pos]] = Reactance[pos]
-            X[to_bus[pos]][from_bus[pos]] = Reactance[pos]
-
-        for pos in range(1, len(from_bus)+1):
-            branches[pos] = (int(from_bus[pos-1]),int(to_bus[pos-1]))
-
-            head_bus.append(from_bus[pos-1])
-            tails.append(to_bus[pos-1])
-
-        for loc in Bus_Location:
-            P[loc] = float(ActivePower[loc-1])
-            Q[loc] = float(ReactivePower[loc-1])
-            P_gen_limit[loc] = P_gen[loc-1]
-            Q_gen_limit[loc] = Q_gen[loc-1]
-
-        Cx = {n:{nn:0 for nn in nodes} for n in nodes}
-        for i in nodes:
-            for j in nodes:
-                if R[i][j] != 0:
-                    Cx[i][j] = 1
 
-        head_bus = list(dict.fromkeys(head_bus))
-
-        # Set of tail buses on head buses
-        tail_bus = {head:[] for head in head_bus}
-
-        for head in head_bus:
-            for tail in tails:
-                if (head,tail) in branches:
-                    tail_bus[head].append(tail)
-
-        P = self.convert_power_pu(P,self.S_base) #Carga
-        P_gen_limit = self.convert_power_pu(P_gen_limit,self.S_base) #Capacidade Ger Max
-        Q = self.convert_power_pu(Q,self.S_base) # Reativo
-        Q_gen_limit = self.convert_power_pu(Q_gen_limit,self.S_base) #Capacidade de Reativo
-        R = self.convert_ohm_pu(R,mva=self.S_base,kv=self.V_base) # Resistencia
-        X = self.convert_ohm_pu(X,mva=self.S_base,kv=self.V_base) # Reatancia
+        sheets = pd.read_excel(self.data, sheet_name=['DLIN', 'DBAR'], header=0, index_col=0)
+        DLIN_data, DBAR_data = sheets['DLIN'], sheets['DBAR']
+
+        from_bus = np.asarray(self.get_data(DLIN_data,0), dtype=int)
+        to_bus = np.asarray(self.get_data(DLIN_data,1), dtype=int)
+        Resistance = np.asarray(self.get_data(DLIN_data,2), dtype=float)
+        Reactance = np.asarray(self.get_data(DLIN_data,3), dtype=float)
+        Bsh = np.asarray(self.get_data(DLIN_data,4), dtype=float)
+
+        Bus_Location = np.asarray(self.get_data(DBAR_data,0), dtype=int)
+        ActivePower = np.asarray(self.get_data(DBAR_data,1), dtype=float)
+        ReactivePower = np.asarray(self.get_data(DBAR_data,2), dtype=float)
+        P_gen = np.asarray(self.get_data(DBAR_data,3), dtype=float)
+        Q_gen = np.asarray(self.get_data(DBAR_data,4), dtype=float)
+
+        # Buses named in DLIN or DBAR; tie rows do not add buses
+        nodes = np.unique(np.concatenate([from_bus, to_bus, Bus_Location]))
+
+        # Bus data by position of the Localizacao column in the bus list
+        pos = np.searchsorted(nodes, Bus_Location)
+        P, Q = np.full(len(nodes), np.nan), np.full(len(nodes), np.nan)
+        P_gen_limit, Q_gen_limit = np.full(len(nodes), np.nan), np.full(len(nodes), np.nan)
+        P[pos], Q[pos] = ActivePower, ReactivePower
+        P_gen_limit[pos], Q_gen_limit[pos] = P_gen, Q_gen
+
+        return Topology(nodes, from_bus, to_bus,
+                        r=self.convert_ohm_pu(Resistance,mva=self.S_base,kv=self.V_base), # Resistencia
+                        x=self.convert_ohm_pu(Reactance,mva=self.S_base,kv=self.V_base), # Reatancia
+                        P=self.convert_power_pu(P,self.S_base), #Carga
+                        Q=self.convert_power_pu(Q,self.S_base), # Reativo
+                        P_gen_limit=self.convert_power_pu(P_gen_limit,self.S_base), #Capacidade Ger Max
+                        Q_gen_limit=self.convert_power_pu(Q_gen_limit,self.S_base), #Capacidade de Reativo
+                        bsh=self.convert_siemens_pu(Bsh,mva=self.S_base,kv=self.V_base)) # Susceptancia shunt [S]
+
+    def get_ybus(self, shunts=True):
+        """
+        Sparse bus admittance matrix in p.u., also kept in self.Ybar
+        ------------------------------------------------
+        Return:
+            'scipy.sparse.csr_matrix' ordered as get_topology().nodes,
+            see Topology.admittance
+        """
+        self.Ybar = self.get_topology().admittance(shunts)
+        return self.Ybar
 
-        
-        return branches, nodes, P, Q, R, X, P_gen_limit, Q_gen_limit, Cx
+    def get_system_data(self):
+        """
+        Fetch data from .xlsx file as dicts
+        ------------------------------------------------
+        Thin view over get_topology(): R, X and Cx read as dense N x N
+        nested dicts but only the branch entries are stored.
+        ------------------------------------------------
+        Return:
+            branches, nodes, P, Q, R, X, Pgen_limit, Qgen_limit, Cx
+        """
+        return self.get_topology().system_data()
 
+    def get_profiles(self, source, nodes):
+        """
+        Fetch per-bus load and generation profiles
+        ------------------------------------------------
+        Args:
+            source = one of
+                'str' path to a .xlsx with DPERFIL_P / DPERFIL_Q /
+                    DPERFIL_PGEN / DPERFIL_QGEN sheets (rows = buses,
+                    first column = bus id, remaining columns = periods)
+                'str' path to a .npz with arrays 'P', 'Q', 'P_gen_limit',
+                    'Q_gen_limit' of shape bus x time
+                'dict' {quantity: array bus x time | .csv path | .npy path}
+            nodes = bus ids, the row order of the returned arrays
+        ------------------------------------------------
+        Return:
+            Dict {quantity: 'np.ndarray' bus x time in p.u.} with the
+            quantities present in the source (kW / kvar in the source,
+            missing buses and NaN read as 0)
+        """
+        nodes = np.asarray(nodes)
+
+        if isinstance(source, str) and source.endswith('.npz'):
+            with np.load(source) as data:
+                source = {name: data[name] for name in PROFILE_SHEETS if name in data}
+        elif isinstance(source, str):
+            sheets = pd.ExcelFile(source).sheet_names
+            source = {name: pd.read_excel(source, sheet_name=sheet, header=0, index_col=0)
+                      for name, sheet in PROFILE_SHEETS.items() if sheet in sheets}
+
+        profiles = {}
+        for name, values in source.items():
+            if name not in PROFILE_SHEETS:
+                raise KeyError(f'Unknown profile quantity {name!r}, expected one of {list(PROFILE_SHEETS)}')
+            if isinstance(values, str) and values.endswith('.npy'):
+                values = np.load(values)
+            elif isinstance(values, str):
+                values = pd.read_csv(values, header=0, index_col=0)
+
+            if isinstance(values, pd.DataFrame):
+                values = values.reindex(nodes).to_numpy(dtype=float)
+            values = np.asarray(values, dtype=float)
+            if values.ndim != 2 or values.shape[0] != len(nodes):
+                raise ValueError(f'Profile {name!r} must have shape (buses, time) = ({len(nodes)}, T), got {values.shape}')
+            profiles[name] = self.convert_power_pu(values, self.S_base)
+
+        horizons = {values.shape[1] for values in profiles.values()}
+        if len(horizons) > 1:
+            raise ValueError(f'Profiles with different number of periods: {sorted(horizons)}')
+        return profiles
+
+    def iter_profiles(self, source, nodes, window, start=0, stop=None, block=None):
+        """
+        Per-bus profiles in time windows, read chunk by chunk
+        ------------------------------------------------
+        Only `block` periods of each file are held at a time, so memory does
+        not depend on the length of the horizon.
+        ------------------------------------------------
+        Args:
+            source = 'dict' {quantity: file or array}, with
+                '.csv'     one row per period, first column = period label,
+                           header = bus ids (read with pd.read_csv chunksize)
+                '.parquet' same layout, read by record batches (requires pyarrow)
+                '.npy'     array time x bus (or bus x time), memory-mapped
+                array      bus x time as in get_profiles
+              anything else get_profiles takes is read whole and cut in windows
+            nodes = bus ids, the row order of the returned arrays
+            window = 'int' number of periods per window (the last one may be shorter)
+            start, stop = range of periods to deliver (stop=None: to the end)
+            block = periods read at a time from CSV / Parquet (default: window)
+        ------------------------------------------------
+        Yield:
+            (first period, 'dict' {quantity: 'np.ndarray' bus x window in p.u.});
+            each window is a new float array converted to p.u. in place
+        """
+        nodes = np.asarray(nodes)
+        if not isinstance(source, dict) or not all(_streamable(values) for values in source.values()):
+            source = self.get_profiles(source, nodes)
+            to_pu = False
+        else:
+            to_pu = True
+
+        streams = {}
+        for name, values in source.items():
+            if name not in PROFILE_SHEETS:
+                raise KeyError(f'Unknown profile quantity {name!r}, expected one of {list(PROFILE_SHEETS)}')
+            streams[name] = _windows(_blocks(values, nodes, block or window), window, start, stop)
+
+        first = start
+        for chunks in zip_longest(*streams.values()):
+            lengths = {None if chunk is None else len(chunk) for chunk in chunks}
+            if len(lengths) > 1:
+                raise ValueError(f'Profiles with different number of periods after period {first}')
+            profiles = {}
+            for name, chunk in zip(streams, chunks):
+                values = np.array(chunk.T, dtype=float, order='C')
+                profiles[name] = self.convert_power_pu(values, self.S_base, inplace=True) if to_pu else values
+            yield first, profiles
+            first += lengths.pop()
+
+
+def _streamable(values):
+    return isinstance(values, np.ndarray) or (isinstance(values, str) and values.endswith(('.csv', '.parquet', '.npy')))
+
+
+def _blocks(values, nodes, block):
+    """ Blocks of rows (time x bus, ordered as nodes) of one profile source """
+    if isinstance(values, np.ndarray):
+        if values.ndim != 2 or values.shape[0] != len(nodes):
+            raise ValueError(f'Profile arrays must have shape (buses, time) = ({len(nodes)}, T), got {values.shape}')
+        yield values.T
+    elif values.endswith('.npy'):
+        data = np.load(values, mmap_mode='r')
+        if data.ndim != 2 or len(nodes) not in data.shape:
+            raise ValueError(f'{values} must have shape (time, {len(nodes)}), got {data.shape}')
+        yield data if data.shape[1] == len(nodes) else data.T
+    elif values.endswith('.csv'):
+        for chunk in pd.read_csv(values, index_col=0, chunksize=block):
+            chunk.columns = chunk.columns.astype(int)
+            yield chunk.reindex(columns=nodes).to_numpy(dtype=float)
+    else:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Parquet profiles require pyarrow (pip install pyarrow)") from error
+        parquet = pq.ParquetFile(values)
+        columns = {int(c): c for c in parquet.schema_arrow.names if c.lstrip('-').isdigit()}
+        present = [k for k, bus in enumerate(nodes.tolist()) if bus in columns]
+        for batch in parquet.iter_batches(batch_size=block, columns=[columns[nodes[k]] for k in present]):
+            rows = np.full((batch.num_rows, len(nodes)), np.nan)
+            rows[:, present] = batch.to_pandas().to_numpy(dtype=float)
+            yield rows
+
+
+def _windows(blocks, window, start=0, stop=None):
+    """ Cut a stream of row blocks into windows of `window` rows over the rows [start, stop) """
+    buffer, held, t = [], 0, 0
+    for rows in blocks:
+        first, t = t, t + len(rows)
+        if t <= start:
+            continue
+        rows = rows[max(start - first, 0):]
+        if stop is not None:
+            rows = rows[:max(stop - max(first, start), 0)]
+        buffer.append(rows)
+        held += len(rows)
+        while held >= window:
+            rows = np.concatenate(buffer) if len(buffer) > 1 else buffer[0]
+            yield rows[:window]
+            buffer, held = [rows[window:]], held - window
+        if stop is not None and t >= stop:
+            break
+    if held:
+        yield np.concatenate(buffer)
 
 
 
@@ -0,0 +1,435 @@
+import os
+import contextlib
+import traceback
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyomo.environ as pe
+import scipy.sparse as sp
+from topology import Topology
+from model import SOCP_PF
+from conic import conic_form, get_backend
+from results import PFResult
+
+# Consensus quantities of a boundary bus: squared voltage and the P / Q sent into its subtree
+COUPLING = ('V', 'Pgen', 'Qgen')
+
+
+def split_tree(topology, boundaries):
+    """
+    Areas of a radial feeder cut at boundary buses
+    ------------------------------------------------
+    Area 0 holds the root; every boundary bus starts a new area made of
+    its subtree down to the next boundary buses. A branch belongs to the
+    area of its sending bus, so the branch arriving at a boundary bus
+    stays upstream and the boundary bus also appears there as a leaf copy.
+    ------------------------------------------------
+    Args:
+        topology = 'Topology'
+        boundaries = bus ids where the tree is cut (not the root)
+    ------------------------------------------------
+    Return:
+        list of 'dict' per area with bus rows 'buses' (own buses), 'copies'
+        (boundary buses seen as leaves), 'branches' and the area 'root' row
+    """
+    cuts = topology.index_of(list(boundaries)).tolist()
+    if topology.root in cuts:
+        raise ValueError('The root bus cannot be a boundary bus')
+    cuts = set(cuts)
+
+    area = np.empty(topology.n_bus, dtype=int)
+    roots = [topology.root]
+    area[topology.root] = 0
+    for k in topology.order[1:]:
+        if k in cuts:
+            area[k] = len(roots)
+            roots.append(int(k))
+        else:
+            area[k] = area[topology.parent[k]]
+
+    owner = area[topology.from_idx]
+    return [{'buses': np.flatnonzero(area == a),
+             'copies': np.array([k for k in roots[1:] if area[topology.parent[k]] == a], dtype=int),
+             'branches': np.flatnonzero(owner == a),
+             'root': root}
+            for a, root in enumerate(roots)]
+
+
+def choose_boundaries(topology, n_areas, profiles=None):
+    """
+    Boundary buses giving about n_areas areas of similar size
+    ------------------------------------------------
+    Cuts greedily from the leaves up whenever the part of a subtree not
+    yet assigned reaches n_bus / n_areas buses (or the largest subtree
+    below the root, if smaller); buses with generation are never chosen.
+    """
+    gen = topology.P_gen_limit if profiles is None else profiles['P_gen_limit'].max(axis=1)
+    size = np.ones(topology.n_bus)
+    for k in topology.order[:0:-1]:
+        size[topology.parent[k]] += size[k]
+    # Shallow feeders may have no subtree of n_bus / n_areas buses below the root
+    target = min(topology.n_bus / n_areas, np.delete(size, topology.root).max())
+    remaining = np.ones(topology.n_bus)
+    boundaries = []
+    for k in topology.order[::-1]:
+        if k == topology.root:
+            continue
+        if remaining[k] >= target and not np.nan_to_num(gen[k]) > 0 and len(boundaries) < n_areas - 1:
+            boundaries.append(int(topology.nodes[k]))
+        else:
+            remaining[topology.parent[k]] += remaining[k]
+    return boundaries
+
+
+def area_specs(topology, profiles, boundaries):
+    """
+    Picklable description of every area (sub-topology, profiles and couplings)
+    ------------------------------------------------
+    Boundary copies (upstream side) and boundary roots (downstream side)
+    get an unbounded artificial generator that carries the exchanged power
+    and is left out of the objective. Couplings are (variable, local row,
+    sign, boundary number) with sign * variable the power sent downstream.
+    """
+    areas = split_tree(topology, boundaries)
+    boundary_rows = [area['root'] for area in areas[1:]]
+    for k in boundary_rows:
+        if np.nan_to_num(profiles['P_gen_limit'][k]).max() > 0 or np.nan_to_num(profiles['Q_gen_limit'][k]).max() > 0:
+            raise ValueError(f'Boundary bus {topology.nodes[k]} has generation; choose buses without it')
+    number = {k: n for n, k in enumerate(boundary_rows)}
+
+    specs = []
+    for a, area in enumerate(areas):
+        rows = np.concatenate([area['buses'], area['copies']])
+        local = {k: n for n, k in enumerate(rows.tolist())}
+        b = area['branches']
+
+        sub = {name: values[rows].copy() for name, values in profiles.items()}
+        copies = np.arange(len(area['buses']), len(rows))
+        sub['P'][copies] = sub['Q'][copies] = 0
+
+        artificial = copies.tolist()
+        couplings = []
+        for k in area['copies'].tolist():
+            couplings += [('V', local[k], 1, number[k]), ('Pgen', local[k], -1, number[k]), ('Qgen', local[k], -1, number[k])]
+        if a > 0:
+            root = local[area['root']]
+            artificial.append(root)
+            couplings += [('V', root, 1, number[area['root']]), ('Pgen', root, 1, number[area['root']]),
+                          ('Qgen', root, 1, number[area['root']])]
+        for name in ('P_gen_limit', 'Q_gen_limit'):
+            sub[name][artificial] = np.inf
+
+        nodes = topology.nodes[rows]
+        sub_topology = Topology(nodes, topology.nodes[topology.from_idx[b]], topology.nodes[topology.to_idx[b]],
+                                topology.r[b], topology.x[b], sub['P'][:, 0], sub['Q'][:, 0],
+                                sub['P_gen_limit'][:, 0], sub['Q_gen_limit'][:, 0],
+                                bsh=topology.bsh[b], branch_ids=topology.branch_ids[b])
+        specs.append({'topology': sub_topology, 'profiles': sub, 'rows': rows, 'own': len(area['buses']),
+                      'branches': b, 'artificial': artificial, 'couplings': couplings})
+    return specs
+
+
+class _Area:
+    """ Subtree SOCP with the ADMM terms y'(s x - z) + rho/2 ||s x - z||^2 in its objective """
+
+    def __init__(self, spec, S_base, V_base, solver, engine):
+        self.spec = spec
+        self.engine = engine
+        self.pf = SOCP_PF.from_data(spec['topology'], spec['profiles'], S_base, V_base, solver=solver, engine=engine)
+        self.T = len(self.pf.times)
+        self.sign = np.array([[s] for _, _, s, _ in spec['couplings']], dtype=float)
+        self.real = np.setdiff1d(np.arange(spec['topology'].n_bus), spec['artificial'])
+        self.values = None
+        self.iterations = 0
+        if engine == 'conic':
+            self._setup_conic()
+        else:
+            self._setup_pyomo()
+
+    def _setup_conic(self):
+        self.problem = conic_form(self.pf.topology, self.pf.profiles)
+        T, columns = self.T, self.problem.columns
+        for name in ('Pgen', 'Qgen'):
+            cols = (np.array(self.spec['artificial'], dtype=int)[:, None] * T + np.arange(T)).ravel() + columns[name].start
+            self.problem.lb[cols], self.problem.ub[cols] = -np.inf, np.inf
+            if name == 'Pgen':
+                self.problem.c[cols] = 0
+        self.c0 = self.problem.c.copy()
+        self.cols = np.array([[columns[name].start + row * T + t for t in range(T)]
+                              for name, row, _, _ in self.spec['couplings']], dtype=int).reshape(-1, T)
+        self.backend = get_backend(self.pf.solver)
+
+    def _setup_pyomo(self):
+        m = self.pf.build()
+        nodes, T = self.pf.topology.nodes.tolist(), self.pf.times
+        real = [nodes[k] for k in self.real]
+        for k in self.spec['artificial']:
+            for t in T:
+                for var in (m.Pgen, m.Qgen):
+                    var[nodes[k], t].setlb(None)
+                    var[nodes[k], t].setub(None)
+
+        K = range(len(self.spec['couplings']))
+        m.admm_z = pe.Param(K, T, mutable=True, initialize=0.0)
+        m.admm_y = pe.Param(K, T, mutable=True, initialize=0.0)
+        m.admm_rho = pe.Param(mutable=True, initialize=1.0)
+        self.local = [[getattr(m, name)[nodes[row], t] for t in T] for name, row, _, _ in self.spec['couplings']]
+        m.objective.deactivate()
+        m.admm_objective = pe.Objective(sense=pe.minimize, expr=
+            sum(10 * m.Pgen[i, t] for i in real for t in T) +
+            sum(m.admm_y[c, t] * s * self.local[c][t] + m.admm_rho / 2 * (s * self.local[c][t] - m.admm_z[c, t]) ** 2
+                for c, (_, _, s, _) in enumerate(self.spec['couplings']) for t in T))
+
+    def solve(self, z, y, rho):
+        """
+        Minimize the area objective for consensus z, multipliers y and penalty rho
+        ------------------------------------------------
+        Return:
+            (x, cost, converged) with x the local consensus values (coupling x time)
+            and cost the generation part of the objective (10 * sum of real Pgen)
+        """
+        if self.engine == 'conic':
+            problem = self.problem
+            problem.c = self.c0.copy()
+            problem.c[self.cols.ravel()] += (self.sign * (y - rho * z)).ravel()
+            problem.quadratic = sp.csc_matrix((np.full(self.cols.size, float(rho)), (self.cols.ravel(), self.cols.ravel())),
+                                              shape=(problem.n, problem.n))
+            solution = self.backend.solve(problem)
+            x = solution.x
+            self.values = problem.values(x)
+            converged = solution.converged
+            local = self.sign * x[self.cols]
+        else:
+            m = self.pf.modelo
+            m.admm_rho = float(rho)
+            m.admm_z.store_values(dict(zip(m.admm_z.keys(), np.asarray(z, dtype=float).ravel().tolist())))
+            m.admm_y.store_values(dict(zip(m.admm_y.keys(), np.asarray(y, dtype=float).ravel().tolist())))
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                resultado = self.pf.resolve(warm_start=self.iterations > 0)
+            self.values = self.pf._model_values()
+            converged = resultado.converged
+            local = self.sign * np.array([[v.value for v in row] for row in self.local], dtype=float).reshape(-1, self.T)
+        self.iterations += 1
+        return local, 10 * np.nansum(self.values['Pgen'][self.real]), converged
+
+
+def _area_worker(conn, specs, S_base, V_base, solver, engine):
+    """ Worker process owning some areas: builds them once and solves them on request """
+    try:
+        areas = {a: _Area(spec, S_base, V_base, solver, engine) for a, spec in specs.items()}
+        conn.send(('ok', None))
+        while True:
+            message, payload = conn.recv()
+            if message == 'stop':
+                break
+            if message == 'solve':
+                rho, inputs = payload
+                conn.send(('ok', {a: areas[a].solve(z, y, rho) for a, (z, y) in inputs.items()}))
+            elif message == 'values':
+                conn.send(('ok', {a: area.values for a, area in areas.items()}))
+    except Exception:
+        conn.send(('error', traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+class _AreaPool:
+    """ Areas spread over worker processes (or kept in this process with workers=1) """
+
+    def __init__(self, specs, options, workers):
+        self.areas = None
+        self.workers = []
+        if workers == 1:
+            self.areas = {a: _Area(spec, *options) for a, spec in enumerate(specs)}
+            return
+        groups = [{a: specs[a] for a in range(w, len(specs), workers)} for w in range(workers)]
+        for group in groups:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_area_worker, args=(child, group) + tuple(options), daemon=True)
+            process.start()
+            self.workers.append((parent, process, list(group)))
+        self._gather([None] * len(self.workers))
+
+    def _gather(self, messages):
+        for (conn, _, _), message in zip(self.workers, messages):
+            if message is not None:
+                conn.send(message)
+        replies = {}
+        for conn, _, _ in self.workers:
+            status, payload = conn.recv()
+            if status == 'error':
+                self.close()
+                raise RuntimeError(f'ADMM worker failed:\n{payload}')
+            if payload:
+                replies.update(payload)
+        return replies
+
+    def solve(self, rho, inputs):
+        if self.areas is not None:
+            return {a: self.areas[a].solve(z, y, rho) for a, (z, y) in inputs.items()}
+        return self._gather([('solve', (rho, {a: inputs[a] for a in group})) for _, _, group in self.workers])
+
+    def values(self):
+        if self.areas is not None:
+            return {a: area.values for a, area in self.areas.items()}
+        return self._gather([('values', None)] * len(self.workers))
+
+    def close(self):
+        for conn, process, _ in self.workers:
+            with contextlib.suppress(OSError, BrokenPipeError):
+                conn.send(('stop', None))
+            process.join(timeout=5)
+        self.workers = []
+
+
+class ADMMDecomposition:
+    """
+    Distributed solution of the SOCP relaxation by subtree decomposition
+    ------------------------------------------------
+    The feeder is cut at boundary buses (split_tree); every area is a
+    SOCP_PF of its subtree, built once in a worker process and re-solved
+    with updated ADMM terms. Areas agree, through consensus ADMM, on the
+    squared voltage and on the P / Q exchanged at each boundary bus.
+    ------------------------------------------------
+    Per iteration the history records the primal residual (disagreement
+    between the areas and the consensus) and the dual residual (change of
+    the consensus); run() stops when both fall below tol * sqrt(number of
+    consensus values). The single-model SOCP_PF result is the reference
+    the stitched result is checked against with deviation().
+    """
+
+    def __init__(self, topology, profiles, boundaries, S_base, V_base, solver=None, engine='socp', rho=10.0, workers=None):
+        """
+        Args:
+            topology, profiles = network and bus x time profiles in p.u.
+                                 (SOCP_PF.topology / SOCP_PF.profiles)
+            boundaries = bus ids where the feeder is cut, see choose_boundaries
+            solver, engine = how every area is solved: engine 'socp' (Pyomo,
+                             default solver ipopt) or 'conic' (default clarabel)
+            rho = initial ADMM penalty
+            workers = worker processes (default: one per area up to the CPU
+                      count); 1 solves the areas in this process
+        """
+        if engine not in ('socp', 'conic'):
+            raise ValueError(f"ADMM areas are solved with engine 'socp' or 'conic', not {engine!r}")
+        self.topology = topology
+        self.profiles = profiles
+        self.boundaries = list(boundaries)
+        self.S_base = S_base
+        self.V_base = V_base
+        self.solver = solver
+        self.engine = engine
+        self.rho = rho
+        self.specs = area_specs(topology, profiles, self.boundaries)
+        self.workers = min(workers or os.cpu_count(), len(self.specs))
+        self.history = None
+        self.result = None
+
+    @classmethod
+    def from_model(cls, pf, boundaries, **options):
+        """ Decomposition of the network and profiles of a SOCP_PF (read if needed) """
+        if pf.topology is None:
+            pf.load_data()
+        if pf.engine in ('socp', 'conic'):
+            options.setdefault('engine', pf.engine)
+            if options['engine'] == pf.engine:
+                options.setdefault('solver', pf.solver)
+        return cls(pf.topology, pf.profiles, boundaries, pf.S_base, pf.V_base, **options)
+
+    def _initial_consensus(self):
+        """ Flat start: V = 1 and the downstream load of every boundary bus """
+        flat = SOCP_PF.from_data(self.topology, self.profiles, self.S_base, self.V_base).flat_start()
+        rows = self.topology.index_of(self.boundaries)
+        branch = self.topology.parent_branch[rows]
+        return np.stack([flat['V'][rows], -flat['P_ij'][branch], -flat['Q_ij'][branch]], axis=1)
+
+    def run(self, max_iter=300, tol=1e-5, adaptive=True, print_output=False):
+        """
+        Iterate ADMM until the residuals are below tol or max_iter is reached
+        ------------------------------------------------
+        Args:
+            adaptive = rebalance rho when one residual is 10x the other
+        ------------------------------------------------
+        Return:
+            'PFResult' of the whole feeder (engine 'admm'); the iteration
+            log is in self.history
+        """
+        T = self.profiles['P'].shape[1]
+        index = {a: np.array([number * 3 + COUPLING.index(name) for name, _, _, number in spec['couplings']], dtype=int)
+                 for a, spec in enumerate(self.specs)}
+        z = self._initial_consensus().reshape(-1, T)
+        copies = np.bincount(np.concatenate(list(index.values())), minlength=len(z))[:, None]
+        y = {a: np.zeros((len(k), T)) for a, k in index.items()}
+        rho = self.rho
+        eps = tol * np.sqrt(z.size)
+
+        history = []
+        converged = False
+        pool = _AreaPool(self.specs, (self.S_base, self.V_base, self.solver, self.engine), self.workers)
+        try:
+            for iteration in range(1, max_iter + 1):
+                outcome = pool.solve(rho, {a: (z[k], y[a]) for a, k in index.items()})
+
+                # _________ Consensus and multiplier updates _________
+                z_old = z
+                z = np.zeros_like(z_old)
+                for a, k in index.items():
+                    np.add.at(z, k, outcome[a][0] + y[a] / rho)
+                z /= copies
+                primal = 0.0
+                for a, k in index.items():
+                    gap = outcome[a][0] - z[k]
+                    y[a] += rho * gap
+                    primal += np.sum(gap ** 2)
+                primal = np.sqrt(primal)
+                dual = rho * np.sqrt(np.sum(copies * (z - z_old) ** 2))
+
+                history.append({'iteration': iteration, 'primal_residual': primal, 'dual_residual': dual, 'rho': rho,
+                                'objective': sum(cost for _, cost, _ in outcome.values()),
+                                'areas_converged': all(ok for _, _, ok in outcome.values())})
+                if print_output:
+                    print(f"[ADMM] {iteration:4d}  r = {primal:.3e}  s = {dual:.3e}  rho = {rho:.3g}")
+                if primal < eps and dual < eps:
+                    converged = history[-1]['areas_converged']
+                    break
+
+                if adaptive and primal > 10 * dual:
+                    rho *= 2
+                elif adaptive and dual > 10 * primal:
+                    rho /= 2
+            values = pool.values()
+        finally:
+            pool.close()
+
+        self.history = pd.DataFrame(history)
+        self.result = PFResult.from_values(self._stitch(values), self.topology, range(T), self.S_base, converged, engine='admm')
+        return self.result
+
+    def _stitch(self, values):
+        """ Area solutions back on the buses and branches of the whole feeder """
+        topo, T = self.topology, self.profiles['P'].shape[1]
+        full = {name: np.full((topo.n_bus, T), np.nan) for name in ('V', 'Pgen', 'Qgen', 'Perdas')}
+        full.update({name: np.full((topo.n_branch, T), np.nan) for name in ('P_ij', 'Q_ij', 'I')})
+        for a, spec in enumerate(self.specs):
+            own = spec['own']
+            for name in ('V', 'Pgen', 'Qgen', 'Perdas'):
+                full[name][spec['rows'][:own]] = values[a][name][:own]
+            for name in ('P_ij', 'Q_ij', 'I'):
+                full[name][spec['branches']] = values[a][name]
+
+        # The artificial generator of a boundary bus is an exchange, not generation
+        rows = topo.index_of(self.boundaries)
+        full['Pgen'][rows] = full['Qgen'][rows] = 0
+        full['Perdas'][rows] = -self.profiles['P'][rows]
+        return full
+
+    def deviation(self, reference):
+        """
+        Largest absolute differences to a reference PFResult of the whole
+        feeder (normally the single-model SOCP_PF solution)
+        """
+        result = self.result
+        deviation = {name: float(np.nanmax(np.abs(getattr(result, name) - getattr(reference, name))))
+                     for name in ('V', 'I', 'P_ij', 'Q_ij')}
+        deviation['objective'] = abs(result.objective - reference.objective)
+        return deviation
@@ -0,0 +1,96 @@
+import os
+import contextlib
+import numpy as np
+import pandas as pd
+
+
+def capacity_estimates(pf, buses=None):
+    """
+    Linear hosting-capacity estimate of each bus from the sensitivities
+    ------------------------------------------------
+    A DG injection P at bus i raises |V| there by V_P * P. The whole
+    profile can move down until the lowest voltage reaches the lower limit
+    (the root voltage is free in the model), so the voltage estimate is
+    (V_max - |V_i| + min|V| - V_min) / V_P. The root generator can not
+    export (Pgen >= 0): an injection replaces P (1 + loss_P) of its
+    generation, which bounds P by Pgen_root / (1 + loss_P). The estimate is
+    the smallest of both over the periods.
+    ------------------------------------------------
+    Args:
+        pf = solved 'SOCP_PF' (engine 'socp' or 'conic')
+        buses = bus ids (default: all but the root)
+    ------------------------------------------------
+    Return:
+        array of estimates in p.u., ordered as buses
+    """
+    if not pf.result.converged:
+        raise ValueError('The hosting capacity needs a converged base case')
+    topo = pf.topology
+    rows = np.delete(np.arange(topo.n_bus), topo.root) if buses is None else topo.index_of(buses)
+    s = pf.sensitivities()
+    V = pf.result.V.T
+    V_min, V_max = np.sqrt(pf.V_bounds)
+
+    headroom = V_max - V[rows] + V.min(axis=0) - V_min
+    with np.errstate(divide='ignore', invalid='ignore'):
+        by_voltage = np.where(s['V_P'][rows] > 0, headroom / s['V_P'][rows], np.inf)
+    root_gen = pf.result.Pgen[:, topo.root] / pf.S_base
+    by_export = root_gen / (1 + s['loss_P'][rows])
+    return np.clip(np.minimum(by_voltage, by_export).min(axis=1), 0, None)
+
+
+def hosting_capacity(pf, buses=None, margin=0.1, max_solves=4, gap_tol=1e-6):
+    """
+    DG hosting capacity of candidate buses with a few confirming solves
+    ------------------------------------------------
+    The linear estimate (capacity_estimates) picks the first trial; each
+    trial adds the DG as a constant injection in every period (unity power
+    factor) and re-solves. A trial is accepted when the solve converges
+    with an exact relaxation (largest cone slack below gap_tol: past the
+    export limit the relaxation burns the surplus instead). The next trial
+    steps the estimate up or down by `margin` until the capacity is
+    bracketed, then bisects. The base loads are restored after every bus;
+    pf is left with the solution of the last trial.
+    ------------------------------------------------
+    Args:
+        pf = solved 'SOCP_PF' (engine 'socp' or 'conic')
+        buses = bus ids (default: all but the root)
+        margin = relative step around the estimate
+        max_solves = confirming solves per bus
+    ------------------------------------------------
+    Return:
+        'pd.DataFrame' per bus: estimate, capacity (largest accepted trial)
+        and upper (smallest rejected trial, inf if none) in kW, and solves
+    """
+    topo = pf.topology
+    if buses is None:
+        buses = np.delete(topo.nodes, topo.root).tolist()
+    estimates = capacity_estimates(pf, buses)
+    kva = pf.S_base * 1e3
+    base_P = pf.profiles['P'].copy()
+
+    table = []
+    for bus, estimate in zip(buses, estimates):
+        load = base_P[topo.bus_index[int(bus)]] * kva
+        lower, upper, trial, solves = 0.0, np.inf, estimate, 0
+        try:
+            while solves < max_solves and estimate > 0:
+                pf.update_loads(P={bus: (load - trial * kva).tolist()})
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    resultado = pf.resolve(print_output=False)
+                solves += 1
+                if resultado.converged and pf.relaxation_gap(resultado).max() <= gap_tol:
+                    lower = trial
+                else:
+                    upper = trial
+                if np.isinf(upper):
+                    trial = lower * (1 + margin)
+                elif lower == 0:
+                    trial = upper * (1 - margin)
+                else:
+                    trial = (lower + upper) / 2
+        finally:
+            pf.update_loads(P={bus: load.tolist()})
+        table.append({'bus': bus, 'estimate': estimate * kva, 'capacity': lower * kva,
+                      'upper': upper * kva, 'solves': solves})
+    return pd.DataFrame(table)
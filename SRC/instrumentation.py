@@ -0,0 +1,156 @@
+import re
+import sys
+import time
+import logging
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+logger = logging.getLogger('socp_pf')
+
+# Phases of a run, in execution order
+PHASES = ('parse', 'build', 'solve', 'extract', 'write')
+
+# IPOPT summary lines (3.14+ prints "Total seconds", older versions the CPU split)
+_IPOPT_PATTERNS = {'iterations': r'Number of Iterations\.*:\s*(\d+)',
+                   'solver_time': r'Total seconds in IPOPT\s*=\s*([\d.eE+-]+)',
+                   'solver_cpu': r'Total CPU secs in IPOPT \(w/o function evaluations\)\s*=\s*([\d.eE+-]+)',
+                   'function_cpu': r'Total CPU secs in NLP function evaluations\s*=\s*([\d.eE+-]+)',
+                   'exit': r'EXIT:\s*(.+)'}
+
+
+def max_rss_mb():
+    """ Peak resident memory of the process in MB (None where unavailable) """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kB elsewhere
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
+
+def parse_ipopt_log(text):
+    """
+    Iteration count and timings from an IPOPT log
+    ------------------------------------------------
+    Return:
+        'dict' with the keys found among 'iterations', 'solver_time' [s],
+        'exit'; solver_time falls back to the CPU split of older versions
+    """
+    stats = {}
+    for key, pattern in _IPOPT_PATTERNS.items():
+        found = re.findall(pattern, text)
+        if found:
+            stats[key] = found[-1].strip() if key == 'exit' else float(found[-1])
+    if 'iterations' in stats:
+        stats['iterations'] = int(stats['iterations'])
+    if 'solver_time' not in stats and 'solver_cpu' in stats:
+        stats['solver_time'] = stats['solver_cpu'] + stats.get('function_cpu', 0.0)
+    stats.pop('solver_cpu', None)
+    stats.pop('function_cpu', None)
+    return stats
+
+
+class RunStats:
+    """
+    Timings, memory and solver statistics of a SOCP_PF run
+    ------------------------------------------------
+    phases = {phase: {'time': wall seconds, 'max_rss_mb': process peak
+              after the phase, 'peak_mb': traced peak during the phase
+              (only with trace_memory)}}
+    counts = model size ('variables', 'constraints', 'buses', 'branches', 'times')
+    solver = IPOPT 'iterations', 'solver_time' and 'exit' read from the
+             solver log, plus 'interface_time' (solve wall time not spent
+             inside IPOPT: NL file writing and solution loading)
+    ------------------------------------------------
+    Every finished phase is logged on the 'socp_pf' logger (DEBUG) and
+    passed to the hooks as hook(phase, record); the solver statistics are
+    reported as phase 'solver'.
+    """
+
+    def __init__(self, trace_memory=False, hooks=()):
+        self.trace_memory = trace_memory
+        self.hooks = list(hooks)
+        self.phases = {}
+        self.counts = {}
+        self.solver = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Time (and optionally trace memory of) the enclosed block as `name` """
+        started = False
+        if self.trace_memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                started = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {'time': time.perf_counter() - start, 'max_rss_mb': max_rss_mb()}
+            if self.trace_memory:
+                record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+                if started:
+                    tracemalloc.stop()
+            self.phases[name] = record
+            self._emit(name, record)
+
+    def reset(self):
+        """ Forget phases and solver statistics (the model counts are kept) """
+        self.phases = {}
+        self.solver = {}
+
+    def set_solver(self, **stats):
+        self.solver = stats
+        if 'solver_time' in stats and 'solve' in self.phases:
+            self.solver['interface_time'] = max(self.phases['solve']['time'] - stats['solver_time'], 0.0)
+        self._emit('solver', self.solver)
+
+    def _emit(self, name, record):
+        logger.debug('%s: %s', name, ', '.join(f'{k}={v:.4g}' if isinstance(v, float) else f'{k}={v}'
+                                                for k, v in record.items()))
+        for hook in self.hooks:
+            hook(name, record)
+
+    def as_dict(self):
+        """ Plain (picklable) copy: {'phases': ..., 'counts': ..., 'solver': ...} """
+        return {'phases': {name: dict(record) for name, record in self.phases.items()},
+                'counts': dict(self.counts),
+                'solver': dict(self.solver)}
+
+
+def flat_stats(stats):
+    """ One-level dict of a RunStats / as_dict(): 'build_time', 'variables', 'iterations', ... """
+    if isinstance(stats, RunStats):
+        stats = stats.as_dict()
+    flat = {}
+    for name, record in stats['phases'].items():
+        flat.update({f'{name}_{key}': value for key, value in record.items()})
+    flat.update(stats['counts'])
+    flat.update({key: value for key, value in stats['solver'].items() if key != 'exit'})
+    return flat
+
+
+def aggregate_stats(runs):
+    """
+    Summary of many runs (e.g. the scenarios of a batch)
+    ------------------------------------------------
+    Args:
+        runs = iterable of RunStats / as_dict() / flat_stats() dicts
+    ------------------------------------------------
+    Return:
+        'pd.DataFrame' with one row per statistic and columns
+        count, total, mean, min, max
+    """
+    table = pd.DataFrame([flat_stats(run) if isinstance(run, RunStats) or 'phases' in run else run
+                          for run in runs])
+    numeric = table.select_dtypes(include=[np.number])
+    return pd.DataFrame({'count': numeric.count(), 'total': numeric.sum(), 'mean': numeric.mean(),
+                         'min': numeric.min(), 'max': numeric.max()})
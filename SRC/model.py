@@ -1,150 +1,690 @@
-from matplotlib.dates import ConciseDateConverter
+import os
+import tempfile
 import pyomo.environ as pe
 import pyomo.opt as po
+from pyomo.core.expr.numeric_expr import LinearExpression
+import numpy as np
 from data_handler import NetData
-from pprint import pprint, pformat
+from sweep import backward_forward_sweep
+from results import PFResult
+from writers import open_writers
+from instrumentation import RunStats, parse_ipopt_log
+from conic import BOUNDS, BACKENDS, LINDISTFLOW_V_WEIGHT, conic_form, lindistflow_form, get_backend
+from pprint import pprint
 import contextlib
 
+# Profile quantity -> mutable Param of the model
+PARAMS = {'P': 'P', 'Q': 'Q', 'P_gen_limit': 'Pgen_max', 'Q_gen_limit': 'Qgen_max'}
+
+ENGINES = ('socp', 'sweep', 'conic', 'lindistflow')
+
+# Solver used when none is given: Pyomo solver for 'socp' / 'lindistflow', conic backend for 'conic'
+DEFAULT_SOLVER = {'socp': 'ipopt', 'sweep': None, 'conic': 'clarabel', 'lindistflow': 'glpk'}
+
+# Decision variables carried between solves by an initial point
+VARIABLES = ('P_ij', 'Q_ij', 'I', 'V', 'Pgen', 'Qgen', 'Perdas')
+
+# Constraints whose duals are read back after a solve
+DUALS = ('active_power', 'reactive_power', 'voltage_drop')
+
+# IPOPT options used when the initial point (and multipliers) come from a previous solve
+WARM_START_OPTIONS = {'warm_start_init_point': 'yes',
+                      'warm_start_bound_push': 1e-6,
+                      'warm_start_slack_bound_push': 1e-6,
+                      'warm_start_mult_bound_push': 1e-6,
+                      'mu_init': 1e-6}
+
+
+def linear(terms, constant=0):
+    """
+    Linear expression constant + sum(coef * var)
+    ------------------------------------------------
+    Built directly as a Pyomo LinearExpression, skipping the operator
+    overloading of sum() and +/- on every term.
+    ------------------------------------------------
+    Args:
+        terms = list of (coef, var data)
+        constant = number or (mutable) Param expression
+    """
+    coefs, variables = zip(*terms) if terms else ((), ())
+    return LinearExpression(constant=constant, linear_coefs=list(coefs), linear_vars=list(variables))
+
 class SOCP_PF:
 
-    def __init__(self, data_dir, S_base, V_base, solver='ipopt', times=1):
-        
+    def __init__(self, data_dir, S_base, V_base, solver=None, times=None, profiles=None, engine='socp',
+                 output_dir=None, output_formats=('json',), dump_model=False, trace_memory=False, hooks=(),
+                 cache_dir=None):
+        """
+        Args:
+            data_dir = 'str' path to the .xlsx with DLIN and DBAR sheets
+            S_base, V_base = base power [MVA] and voltage [kV]
+            solver = 'str' Pyomo solver name (engine 'socp', default 'ipopt';
+                     engine 'lindistflow', default 'glpk') or conic backend
+                     (engine 'conic', default 'clarabel'; engine
+                     'lindistflow' with 'highs', see conic.BACKENDS)
+            times = 'int' number of periods; defaults to the profile length
+                    (or 1 without profiles)
+            profiles = load / generation time series, see NetData.get_profiles.
+                       Without profiles the DBAR snapshot is used in every period.
+                       solve_windows() reads them by windows instead, see
+                       NetData.iter_profiles.
+            engine = 'socp'  : SOCP relaxation solved by `solver` (Pyomo)
+                     'sweep' : NumPy backward/forward sweep load flow (no
+                               optimizer; root bus is the slack at 1 p.u. and
+                               the other buses inject no generation)
+                     'conic' : same SOCP relaxation assembled as sparse
+                               matrices (conic.conic_form) and solved by a
+                               conic interior-point backend, without Pyomo
+                     'lindistflow' : linearized DistFlow LP (no losses, no
+                               cone (4)) for screening; Pyomo model and LP
+                               solver, or conic.lindistflow_form with an LP
+                               backend ('highs'). See approximation_error()
+            output_dir = 'str' folder for the results; None (default) writes nothing
+            output_formats = writers used in output_dir: 'json', 'csv', 'parquet'
+            dump_model = also write the Pyomo model (resolution.txt) to output_dir
+            trace_memory = also trace the peak memory of each phase (tracemalloc;
+                           slows the run down)
+            hooks = callables hook(phase, record) called after every phase,
+                    see instrumentation.RunStats
+            cache_dir = parsed network cache of NetData (None: default_cache_dir(),
+                        False: parse the workbook on every load)
+        """
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+
+        if dump_model and output_dir is None:
+            raise ValueError('dump_model requires an output_dir')
+
         self.data_dir = data_dir
+        self.engine = engine
+        self.output_dir = output_dir
+        self.output_formats = tuple(output_formats)
+        self.dump_model = dump_model
         self.S_base = S_base
         self.V_base = V_base
-        self.solver = solver
-        self.times = range(times)
-
-        
-    def solve(self, print_output:bool = False):
-
-        linhas, barras, P, Q, R, X, P_gen_limit, Q_gen_limit, Cx = NetData(path_filename=self.data_dir,S_base=self.S_base,V_base=self.V_base).get_system_data()
-        times = self.times
+        self.solver = solver or DEFAULT_SOLVER[engine]
+        self.profile_source = profiles
+        self.cache_dir = cache_dir
+        self.n_times = times
+        self.times = range(times or 1)
+        self.stats = RunStats(trace_memory=trace_memory, hooks=hooks)
+        self.V_bounds = BOUNDS['V']
+
+        self.topology = None
+        self.profiles = None
+        self.base_profiles = None
+        self.modelo = None
+        self._opt = None
+
+    @property
+    def pyomo(self):
+        """ True when the engine solves the Pyomo model of build() """
+        return self.engine == 'socp' or (self.engine == 'lindistflow' and self.solver not in BACKENDS)
+
+    @classmethod
+    def from_data(cls, topology, profiles, S_base, V_base, solver=None, engine='socp'):
+        """
+        Model over an already parsed network, without access to the workbook
+        ------------------------------------------------
+        Args:
+            topology = 'Topology' in p.u. (e.g. from NetData.get_topology)
+            profiles = 'dict' {quantity: array bus x time in p.u.} as in
+                       SOCP_PF.profiles
+        """
+        pf = cls(None, S_base, V_base, solver=solver, engine=engine)
+        pf.topology = topology
+        pf.profiles = {name: np.array(values, dtype=float) for name, values in profiles.items()}
+        pf.n_times = pf.profiles['P'].shape[1]
+        pf.times = range(pf.n_times)
+        return pf
+
+    def load_data(self):
+        """ Read the network (through the NetData cache) and the bus x time profiles """
+        with self.stats.phase('parse'):
+            return self._read_data()
+
+    def _read_data(self):
+        net = NetData(path_filename=self.data_dir,S_base=self.S_base,V_base=self.V_base,cache_dir=self.cache_dir)
+        self.topology = net.get_topology()
+
+        profiles = {}
+        if self.profile_source is not None:
+            profiles = net.get_profiles(self.profile_source, self.topology.nodes)
+        horizon = next(iter(profiles.values())).shape[1] if profiles else 1
+        n_times = self.n_times or horizon
+        if profiles and n_times > horizon:
+            raise ValueError(f'times={n_times} is longer than the profiles ({horizon} periods)')
+        self.times = range(n_times)
+
+        # Quantities without profile repeat the DBAR snapshot
+        self.profiles = {}
+        for name in PARAMS:
+            if name in profiles:
+                self.profiles[name] = np.ascontiguousarray(profiles[name][:, :n_times])
+            else:
+                self.profiles[name] = np.repeat(getattr(self.topology, name)[:, None], n_times, axis=1)
+        return self.topology
+
+    def build(self):
+        """
+        Build the Pyomo model once for the current topology
+        ------------------------------------------------
+        Loads (P, Q), generation limits (Pgen_max, Qgen_max) and voltage
+        limits (V_min, V_max) are mutable Params, so update_loads() /
+        set_voltage_limits() + resolve() reuse the same model.
+        """
+        if self.topology is None:
+            self.load_data()
+        with self.stats.phase('build'):
+            self._build_model()
+        self.stats.counts = {'variables': self.modelo.nvariables(), 'constraints': self.modelo.nconstraints(),
+                             'buses': self.topology.n_bus, 'branches': len(self.topology.r),
+                             'times': len(self.times)}
+        return self.modelo
+
+    def _build_model(self):
+        topo = self.topology
+        barras = topo.nodes.tolist()
+        ramos = topo.branch_list()
+        times = list(self.times)
+        n_t = len(times)
+
+        # Row of each bus / branch / period; components are stored (bus or branch) x time
+        linha = {i: k for k, i in enumerate(barras)}
+        ramo = {b: k for k, b in enumerate(ramos)}
+        periodo = {t: s for s, t in enumerate(times)}
+
+        def por_periodo(name):
+            values = self.profiles[name].tolist()
+            return lambda m, i, t: values[linha[i]][periodo[t]]
 
     # Criando o modelo
-        
-        # Pyomo Model     
+
+        # Pyomo Model
         self.modelo  = pe.ConcreteModel()
         # Model name
         self.modelo.name = '*** Fluxo de Carga SOCP ***'
-        # Propriedadesa
-        mva = self.S_base
-        solver = self.solver
+        m = self.modelo
 
+        # LinDistFlow: no current terms (losses) and no cone (4), I stays out of the LP
+        lossless = self.engine == 'lindistflow'
+        if lossless:
+            m.name = '*** Fluxo de Carga LinDistFlow ***'
 
-    # Criando Variaveis de Decisao
 
-        self.modelo.P_ij = pe.Var(barras, barras, times, domain=pe.Reals)  # purchased power
-        self.modelo.Q_ij = pe.Var(barras, barras, times, domain=pe.Reals)  # purchased power
-        self.modelo.I = pe.Var(barras, barras, times, domain=pe.Reals)
-        self.modelo.V = pe.Var(barras, times, domain=pe.Reals)
-        self.modelo.Pgen = pe.Var(barras, times, domain=pe.Reals)
-        self.modelo.Qgen = pe.Var(barras, times, domain=pe.Reals)
-        self.modelo.Perdas = pe.Var(barras, times, domain=pe.Reals)
+    # Parametros mutaveis (cargas e limites de geracao em p.u., por periodo)
+
+        m.P = pe.Param(barras, times, mutable=True, initialize=por_periodo('P'))
+        m.Q = pe.Param(barras, times, mutable=True, initialize=por_periodo('Q'))
+        m.Pgen_max = pe.Param(barras, times, mutable=True, initialize=por_periodo('P_gen_limit'))
+        m.Qgen_max = pe.Param(barras, times, mutable=True, initialize=por_periodo('Q_gen_limit'))
+        m.V_min = pe.Param(mutable=True, initialize=self.V_bounds[0])
+        m.V_max = pe.Param(mutable=True, initialize=self.V_bounds[1])
 
 
+    # Criando Variaveis de Decisao
+
+        # Set of branches (from, to) taken from the NetData branch table
+        m.L = pe.Set(initialize=ramos, dimen=2, ordered=True)
+
+        m.P_ij = pe.Var(m.L, times, domain=pe.Reals)  # purchased power
+        m.Q_ij = pe.Var(m.L, times, domain=pe.Reals)  # purchased power
+        m.I = pe.Var(m.L, times, domain=pe.Reals, bounds=BOUNDS['I'])        # Square of the current magnitude
+        m.V = pe.Var(barras, times, domain=pe.Reals, bounds=(m.V_min, m.V_max))  # Square of the voltage magnitude
+        m.Pgen = pe.Var(barras, times, domain=pe.Reals, bounds=lambda m, i, t: (0, m.Pgen_max[i,t]))
+        m.Qgen = pe.Var(barras, times, domain=pe.Reals, bounds=lambda m, i, t: (0, m.Qgen_max[i,t]))
+        m.Perdas = pe.Var(barras, times, domain=pe.Reals)
+
+        # _________ Component data in storage order, position = row * n_t + period _________
+        P, Q = list(m.P.values()), list(m.Q.values())
+        P_ij, Q_ij, I = list(m.P_ij.values()), list(m.Q_ij.values()), list(m.I.values())
+        V, Pgen, Qgen, Perdas = list(m.V.values()), list(m.Pgen.values()), list(m.Qgen.values()), list(m.Perdas.values())
+        r, x = topo.r.tolist(), topo.x.tolist()
+        z2 = (topo.r ** 2 + topo.x ** 2).tolist()
+        frm, to = topo.from_idx.tolist(), topo.to_idx.tolist()
+
+        # Branches leaving / arriving at each bus from the CSR neighbour lists
+        saida = [topo.out_branches(k).tolist() for k in range(len(barras))]
+        chegada = [topo.in_branches(k).tolist() for k in range(len(barras))]
+
+        def balanco(flow, loss, load, gen):
+            # Pgen - P - sum_out(loss * I) + sum_out(P_ij) - sum_in(P_ij) == 0
+            def rule(m, i, t):
+                k, s = linha[i], periodo[t]
+                terms = [(1, gen[k*n_t + s])]
+                if not lossless:
+                    terms += [(-loss[b], I[b*n_t + s]) for b in saida[k]]
+                terms += [(1, flow[b*n_t + s]) for b in saida[k]]
+                terms += [(-1, flow[b*n_t + s]) for b in chegada[k]]
+                return linear(terms, -load[k*n_t + s]) == 0
+            return rule
+
+        def queda_tensao(m, i, j, t):
+            b, s = ramo[i,j], periodo[t]
+            n = b*n_t + s
+            terms = [(1, V[frm[b]*n_t + s]), (-1, V[to[b]*n_t + s]), (2 * r[b], P_ij[n]), (2 * x[b], Q_ij[n])]
+            if not lossless:
+                terms.append((-z2[b], I[n]))
+            return linear(terms) == 0
+
+        def fluxo_ramo(m, i, j, t):
+            b, s = ramo[i,j], periodo[t]
+            n = b*n_t + s
+            return V[frm[b]*n_t + s] * I[n] >= P_ij[n] ** 2 + Q_ij[n] ** 2
+
+        def perdas(m, i, t):
+            n = linha[i]*n_t + periodo[t]
+            return linear([(1, Perdas[n]), (-1, Pgen[n])], P[n]) == 0
+
+        # _________ (1) P = load - Pres + somaP + r * I^2 ________________________________________________________
+        m.active_power = pe.Constraint(barras, times, rule=balanco(P_ij, r, P, Pgen))
+
+        # _________ (2) Q = load - Qres + somaQ + x * I^2 ________________________________________________________
+        m.reactive_power = pe.Constraint(barras, times, rule=balanco(Q_ij, x, Q, Qgen))
+
+        # _________ (3) Vm^2 - 2(r x P + x x Q) + (r^2 + x^2). I^2 = Vn ^2 ______________________________________
+        m.voltage_drop = pe.Constraint(m.L, times, rule=queda_tensao)
+
+        # _________ (4) V^2 x I^2 = P^2 + Q^2 ___________________________________________________________________
+        if not lossless:
+            m.branch_flow = pe.Constraint(m.L, times, rule=fluxo_ramo)
+
+        m.perdas = pe.Constraint(barras, times, rule=perdas)
+
+        objective = [(10, v) for v in Pgen]
+        if lossless:
+            objective += [(-LINDISTFLOW_V_WEIGHT, v) for v in V]
+        m.objective = pe.Objective(sense=pe.minimize, expr=linear(objective))
+
+        # _________ Multipliers: constraint duals (sensitivities) and IPOPT warm starts _________
+        if 'ipopt' in str(self.solver):
+            m.dual = pe.Suffix(direction=pe.Suffix.IMPORT_EXPORT)
+            m.ipopt_zL_out = pe.Suffix(direction=pe.Suffix.IMPORT)
+            m.ipopt_zU_out = pe.Suffix(direction=pe.Suffix.IMPORT)
+            m.ipopt_zL_in = pe.Suffix(direction=pe.Suffix.EXPORT)
+            m.ipopt_zU_in = pe.Suffix(direction=pe.Suffix.EXPORT)
+        else:
+            m.dual = pe.Suffix(direction=pe.Suffix.IMPORT)
+
         # _________ Variables initialization _________
-        for t in times:
-            for i in barras:
-                for j in barras:
-                    self.modelo.P_ij[i,j,t] = 0.0
-                    self.modelo.Q_ij[i,j,t] = 0.0
-                    self.modelo.I[i,j,t] = 0.0
-
-                self.modelo.V[i,t] = 0.0
-                self.modelo.Pgen[i,t] = 0.0
-                self.modelo.Qgen[i,t] = 0.0
-    
-        # _________ Variable Bounds _________
-        for t in times:
-            for i in barras:
-                for j in barras:
-                    self.modelo.I[i,j,t].setub(500 ** 2)    # Square of the current magnitude
-                    self.modelo.I[i,j,t].setlb(0 ** 2)
-            
-                self.modelo.V[i,t].setlb(0.95 ** 2)    # Square of the voltage magnitude
-                self.modelo.V[i,t].setub(1.05 ** 2)
-
-                self.modelo.Pgen[i,t].setlb(0)
-                self.modelo.Pgen[i,t].setub(P_gen_limit[i])
-
-                self.modelo.Qgen[i,t].setlb(0)
-                self.modelo.Qgen[i,t].setub(Q_gen_limit[i])
-        
-        self.modelo.active_power = pe.ConstraintList()
-        self.modelo.reactive_power = pe.ConstraintList()
-        self.modelo.voltage_drop = pe.ConstraintList()
-        self.modelo.branch_flow = pe.ConstraintList()
-        self.modelo.perdas = pe.ConstraintList()
-        
-        for t in times:
-            for i in barras:
-                self.modelo.perdas.add(self.modelo.Perdas[i,t] == self.modelo.Pgen[i,t]  - P[i])
-                
-
-            for i in barras:
-                # _________ (1) P = load - Pres + somaP + r * I^2 ________________________________________________________
-                self.modelo.active_power.add(self.modelo.Pgen[i,t] - P[i] - 
-                                    sum(R[i][j] * self.modelo.I[i,j,t] for j in barras if j>i if Cx[i][j] == 1) + 
-                                    sum(self.modelo.P_ij[i,j,t] for j in barras if j>i if Cx[i][j] == 1) == 
-                                    sum(self.modelo.P_ij[k,i,t] for k in barras if k<i if Cx[k][i] == 1))
-
-
-                # _________ (2) Q = load - Qres + somaQ + r * I^2 ________________________________________________________
-                self.modelo.reactive_power.add(self.modelo.Qgen[i,t] - Q[i] - 
-                                sum(X[i][j] * self.modelo.I[i,j,t] for j in barras if j>i if Cx[i][j] == 1) + 
-                                sum(self.modelo.Q_ij[i,j,t] for j in barras if j>i if Cx[i][j] == 1) == 
-                                sum(self.modelo.Q_ij[k,i,t] for k in barras if k<i if Cx[k][i] == 1))
-
-            for i in barras:
-                for j in barras:
-                    if Cx[i][j] == 1:
-                        # _________ (3) Vm^2 - 2(r x P + x x Q) + (r^2 + x^2). I^2 = Vn ^2 ______________________________________
-                        self.modelo.voltage_drop.add(self.modelo.V[i,t] == self.modelo.V[j,t] - 2 * (R[i][j] * self.modelo.P_ij[i,j,t] + X[i][j] * self.modelo.Q_ij[i,j,t]) +
-                                            ((R[i][j]) ** 2 + (X[i][j]) ** 2) * self.modelo.I[i,j,t] )
-
-                        # _________ (4) V^2 x I^2 = P^2 + Q^2 ___________________________________________________________________
-                        self.modelo.branch_flow.add((self.modelo.V[i,t]) * self.modelo.I[i,j,t] >= (self.modelo.P_ij[i,j,t] ** 2) + (self.modelo.Q_ij[i,j,t] ** 2))
-
-
-    # Resolução do Problema
-
-        obj = sum(10*self.modelo.Pgen[i,t] for i in barras for t in times)
-        self.modelo.objective = pe.Objective(sense=pe.minimize, expr=obj)
-
-        # Solve the problem
-        solver = po.SolverFactory(solver)
-        result = solver.solve(self.modelo)
-
-
-         # Results
-        V = {t:{i:0 for i in barras} for t in times}
-        I = {t:{i:{j:0 for j in barras} for i in barras} for t in times}
-        P_ij = {t:{i:{j:0 for j in barras} for i in barras} for t in times}
-        Q_ij = {t:{i:{j:0 for j in barras} for i in barras} for t in times}
-        Pgen = {t:{i:0 for i in barras} for t in times}
-        Perdas = {t:{i:0 for i in barras} for t in times}
-
-        #region Pass results
-        for t in times:
-            for i in barras:
-                V[t][i] = pe.value(self.modelo.V[i,t]) ** 0.5
-                Pgen[t][i] = pe.value(self.modelo.Pgen[i,t]) * mva
-                Perdas[t][i] = pe.value(self.modelo.Perdas[i,t] * mva)
-            
-                for j in linhas:
-                    I[t][i][j] = pe.value(self.modelo.I[i,j,t]) ** 0.5
-                    P_ij[t][i][j] = pe.value(self.modelo.P_ij[i,j,t]) * mva
-                    Q_ij[t][i][j] = pe.value(self.modelo.Q_ij[i,j,t]) * mva
-        #endregion
-        P_ijt = {t:0 for t in times}
-        for t in times:
-            P_ijt[t] = sum(P_ij[t][i][j] for i in barras for j in barras)
+        self.set_initial_point('flat')
+
+    def flat_start(self):
+        """
+        Flat-start profile for the current loads
+        ------------------------------------------------
+        V = 1 p.u. and branch flows equal to the sum of the loads downstream
+        (P_ij = -downstream load, the sign convention of the balance
+        constraints), supplied by the root generator.
+        ------------------------------------------------
+        Return:
+            'dict' {variable name: array (bus or branch) x time} in p.u. (squared V and I)
+        """
+        topo = self.topology
+        P, Q = self.profiles['P'], self.profiles['Q']
+
+        # Downstream load of every bus, accumulated leaves -> root
+        sub_P, sub_Q = P.copy(), Q.copy()
+        for k in topo.order[::-1]:
+            if topo.parent[k] >= 0:
+                sub_P[topo.parent[k]] += sub_P[k]
+                sub_Q[topo.parent[k]] += sub_Q[k]
+
+        P_ij, Q_ij = -sub_P[topo.to_idx], -sub_Q[topo.to_idx]
+        Pgen, Qgen = np.zeros_like(P), np.zeros_like(Q)
+        Pgen[topo.root] = np.clip(sub_P[topo.root], 0, self.profiles['P_gen_limit'][topo.root])
+        Qgen[topo.root] = np.clip(sub_Q[topo.root], 0, self.profiles['Q_gen_limit'][topo.root])
+
+        return {'P_ij': P_ij, 'Q_ij': Q_ij, 'I': P_ij ** 2 + Q_ij ** 2, 'V': np.ones_like(P),
+                'Pgen': Pgen, 'Qgen': Qgen, 'Perdas': Pgen - P}
+
+    def sweep(self, V0=1.0, **options):
+        """
+        Backward/forward sweep load flow over all periods at once
+        ------------------------------------------------
+        Return:
+            'dict' of arrays (bus or branch) x time in p.u., see
+            sweep.backward_forward_sweep
+        """
+        if self.topology is None:
+            self.load_data()
+        return backward_forward_sweep(self.topology, self.profiles['P'], self.profiles['Q'], V0=V0, **options)
+
+    def set_initial_point(self, initial_point='flat'):
+        """
+        Initialize the model variables
+        ------------------------------------------------
+        Args:
+            initial_point = one of
+                'flat'   : flat_start()
+                'sweep'  : backward/forward sweep solution (sweep())
+                SOCP_PF  : a solved instance over the same network; its
+                           variable values and (IPOPT) multipliers are copied
+                PFResult : the result of solve()/resolve() (same network)
+                (P_ij, Q_ij, V, I) : the historical tuple of result dicts
+                'dict'   : {variable name: array (bus or branch) x time} in p.u.
+        """
+        if self.modelo is None:
+            self.build()
+        m = self.modelo
+
+        if isinstance(initial_point, str) and initial_point == 'flat':
+            initial_point = self.flat_start()
+        elif isinstance(initial_point, str) and initial_point == 'sweep':
+            initial_point = {name: values for name, values in self.sweep().items() if name in VARIABLES}
+        elif isinstance(initial_point, SOCP_PF):
+            other = initial_point.modelo
+            for name in VARIABLES:
+                getattr(m, name).set_values({k: v.value for k, v in getattr(other, name).items()
+                                             if k in getattr(m, name) and v.value is not None})
+            for suffix in ('ipopt_zL', 'ipopt_zU'):
+                if hasattr(m, suffix + '_in') and hasattr(other, suffix + '_out'):
+                    getattr(m, suffix + '_in').update((m.find_component(v.name), z)
+                                                      for v, z in getattr(other, suffix + '_out').items())
+            if hasattr(m, 'dual') and hasattr(other, 'dual'):
+                m.dual.update((m.find_component(c.name), d) for c, d in other.dual.items())
+            return
+        elif isinstance(initial_point, PFResult):
+            initial_point = initial_point.model_values()
+        elif isinstance(initial_point, tuple):
+            initial_point = self._from_result(*initial_point)
+
+        for name, values in initial_point.items():
+            for v, value in zip(getattr(m, name).values(), np.asarray(values, dtype=float).ravel().tolist()):
+                v.set_value(value, skip_validation=True)
+
+    def _from_result(self, P_ij, Q_ij, V, I):
+        """ Result dicts of solve() (scaled, square roots) back to model units """
+        ramos = self.topology.branch_list()
+        barras = self.topology.nodes.tolist()
+        times, mva = self.times, self.S_base
+
+        def por_ramo(values):
+            return np.array([[values[t][i][j] for t in times] for (i,j) in ramos], dtype=float)
+
+        return {'P_ij': por_ramo(P_ij) / mva, 'Q_ij': por_ramo(Q_ij) / mva,
+                'I': por_ramo(I) ** 2, 'V': np.array([[V[t][i] for t in times] for i in barras]) ** 2}
+
+    def _keep_multipliers(self):
+        """ Feed the bound multipliers of the last IPOPT solve into the next one """
+        m = self.modelo
+        for suffix in ('ipopt_zL', 'ipopt_zU'):
+            if hasattr(m, suffix + '_out'):
+                getattr(m, suffix + '_in').clear()
+                getattr(m, suffix + '_in').update(getattr(m, suffix + '_out').items())
+
+    def update_loads(self, P=None, Q=None, P_gen_limit=None, Q_gen_limit=None):
+        """
+        Change loads / generation limits of the built model in place
+        ------------------------------------------------
+        Args:
+            P, Q, P_gen_limit, Q_gen_limit = in the same units as the DBAR
+                sheet (kW / kvar), either
+                'dict' {bus: value or [value per period]} or
+                array ordered as topology.nodes, shape (bus,) for every
+                period or (bus, time).
+                None keeps the current values.
+        ------------------------------------------------
+        The model is built on the first call; afterwards only the Param
+        values change and resolve() skips model construction.
+        """
+        if self.topology is None:
+            self.load_data()
+        if self.modelo is None and self.pyomo:
+            self.build()
+        kva = self.S_base*1e3
+
+        for name, values in (('P', P), ('Q', Q), ('P_gen_limit', P_gen_limit), ('Q_gen_limit', Q_gen_limit)):
+            if values is None:
+                continue
+            if isinstance(values, dict):
+                rows = self.topology.index_of(list(values.keys()))
+                values = list(values.values())
+            else:
+                rows = slice(None)
+            values = NetData.convert_power_pu(np.asarray(values, dtype=float), kva)
+
+            # self.profiles holds arrays of its own (from_data / set_profiles copy them)
+            current = self.profiles[name]
+            current[rows] = values.reshape(values.shape[0], -1)
+            self._store_param(name)
+
+    def set_profiles(self, profiles):
+        """
+        Swap the bus x time profiles of the built model in place
+        ------------------------------------------------
+        Args:
+            profiles = 'dict' {quantity: array bus x time in p.u.} with the
+                       number of periods of the model (e.g. the next window
+                       of rolling.RollingHorizon); missing quantities are kept
+        """
+        for name, values in profiles.items():
+            # Own copy: update_loads() writes into self.profiles in place
+            values = np.array(values, dtype=float)
+            if values.shape != self.profiles[name].shape:
+                raise ValueError(f'Profile {name!r} must have shape {self.profiles[name].shape}, got {values.shape}')
+            self.profiles[name] = values
+            self._store_param(name)
+
+    def snapshot_profiles(self):
+        """ Keep a copy of the current profiles as the base case of reset_profiles() """
+        if self.topology is None:
+            self.load_data()
+        self.base_profiles = {name: values.copy() for name, values in self.profiles.items()}
+
+    def reset_profiles(self, load_scale=1.0):
+        """
+        Back to the profiles of snapshot_profiles(), in the built model
+        ------------------------------------------------
+        Args:
+            load_scale = factor applied to the base P and Q (generation
+                         limits are restored as they were)
+        """
+        if self.base_profiles is None:
+            raise ValueError('No base profiles, call snapshot_profiles() first')
+        self.set_profiles({name: values * load_scale if name in ('P', 'Q') else values
+                           for name, values in self.base_profiles.items()})
+
+    def _store_param(self, name):
+        # Copy a profile into its mutable Param (storage order = bus x time)
+        if self.modelo is not None:
+            param = getattr(self.modelo, PARAMS[name])
+            param.store_values(dict(zip(param.keys(), self.profiles[name].ravel().tolist())))
+
+    def set_voltage_limits(self, V_min, V_max):
+        """
+        Change the voltage magnitude limits [p.u.] in place
+        ------------------------------------------------
+        The bounds of V are the mutable Params V_min / V_max (squared), so
+        the built model is kept; the conic engine applies them on the next
+        resolve().
+        """
+        self.V_bounds = (V_min ** 2, V_max ** 2)
+        if self.modelo is not None:
+            self.modelo.V_min.set_value(self.V_bounds[0])
+            self.modelo.V_max.set_value(self.V_bounds[1])
+
+    def resolve(self, print_output:bool = False, warm_start:bool = False):
+        """
+        Solve the current model (built on the first call) and return the results
+        ------------------------------------------------
+        Args:
+            warm_start = start from the current variable values (e.g. the
+                         previous solution or set_initial_point) and pass the
+                         IPOPT warm-start options and bound multipliers
+        ------------------------------------------------
+        Return:
+            PFResult, as solve()
+        """
+        if self.engine == 'sweep':
+            with self.stats.phase('solve'):
+                values = self.sweep()
+            self.stats.set_solver(iterations=values['iterations'])
+            return self._results(values, values['converged'], print_output)
+
+        if not self.pyomo:
+            return self._resolve_conic(print_output)
+
+        if self.modelo is None:
+            self.build()
+
+        # Solver interface is created once and reused between solves
+        if self._opt is None:
+            self._opt = po.SolverFactory(self.solver)
+        if 'ipopt' in str(self.solver):
+            for option, value in WARM_START_OPTIONS.items():
+                if warm_start:
+                    self._opt.options[option] = value
+                else:
+                    self._opt.options.pop(option, None)
+        with self.stats.phase('solve'):
+            self.solver_result = self._solve_logged()
+        self._keep_multipliers()
+
+        converged = self.solver_result.solver.status == po.SolverStatus.ok
+        return self._results(None, converged, print_output)
+
+    def _resolve_conic(self, print_output):
+        """ Assemble the conic (or LinDistFlow) form of the current profiles and solve it with the backend """
+        if self.topology is None:
+            self.load_data()
+        with self.stats.phase('build'):
+            self.conic = (lindistflow_form if self.engine == 'lindistflow' else conic_form)(self.topology, self.profiles)
+            self.conic.lb[self.conic.columns['V']], self.conic.ub[self.conic.columns['V']] = self.V_bounds
+        self.stats.counts = {'variables': self.conic.n, 'constraints': self.conic.A.shape[0] + len(self.conic.rotated_cones),
+                             'buses': self.topology.n_bus, 'branches': self.topology.n_branch,
+                             'times': len(self.times)}
+
+        with self.stats.phase('solve'):
+            self.solver_result = get_backend(self.solver).solve(self.conic)
+        solver_stats = {'iterations': self.solver_result.iterations, 'solver_time': self.solver_result.solve_time,
+                        'exit': self.solver_result.status}
+        self.stats.set_solver(**{k: v for k, v in solver_stats.items() if v is not None})
+        return self._results(self.conic.values(self.solver_result.x), self.solver_result.converged, print_output)
+
+    def _solve_logged(self):
+        """ Run the solver keeping its log, from which the IPOPT statistics are read """
+        handle, logfile = tempfile.mkstemp(suffix='.log', prefix='socp_pf_')
+        os.close(handle)
+        try:
+            solver_result = self._opt.solve(self.modelo, logfile=logfile)
+            with open(logfile) as f:
+                log = f.read()
+        finally:
+            os.remove(logfile)
+        self.stats.set_solver(**parse_ipopt_log(log))
+        return solver_result
+
+    def solve(self, print_output:bool = False, initial_point=None):
+        """
+        Read the network, build a new model and solve it
+        ------------------------------------------------
+        Args:
+            initial_point = see set_initial_point; anything other than the
+                            default flat start also turns on the IPOPT warm start
+        ------------------------------------------------
+        Return:
+            PFResult; it replaces the former (P_ij, Q_ij, V, I) tuple of
+            nested dicts and still unpacks, indexes and len()s as that tuple
+        """
+        self.load_data()
+        if not self.pyomo:
+            return self.resolve(print_output)
+        self.build()
+        warm_start = initial_point is not None and not (isinstance(initial_point, str) and initial_point == 'flat')
+        if initial_point is not None:
+            self.set_initial_point(initial_point)
+        return self.resolve(print_output, warm_start=warm_start)
+
+    def profile_windows(self, window, start=0, stop=None):
+        """
+        Profiles of the source in windows of `window` periods
+        ------------------------------------------------
+        Read chunk by chunk through NetData.iter_profiles (CSV, Parquet or
+        memory-mapped .npy files, see there), so year-long horizons are never
+        held in memory at once. Only the topology is parsed up front.
+        ------------------------------------------------
+        Yield:
+            (first period, 'dict' {quantity: array bus x window in p.u.}) with
+            all the quantities of SOCP_PF.profiles; the ones missing in the
+            source repeat the DBAR snapshot
+        """
+        if self.profile_source is None:
+            raise ValueError('Windows need a profile source (profiles=...)')
+        net = NetData(path_filename=self.data_dir, S_base=self.S_base, V_base=self.V_base, cache_dir=self.cache_dir)
+        if self.topology is None:
+            with self.stats.phase('parse'):
+                self.topology = net.get_topology()
+
+        for first, profiles in net.iter_profiles(self.profile_source, self.topology.nodes, window, start, stop):
+            n_times = next(iter(profiles.values())).shape[1]
+            for name in PARAMS:
+                if name not in profiles:
+                    profiles[name] = np.repeat(getattr(self.topology, name)[:, None], n_times, axis=1)
+            yield first, profiles
+
+    def solve_windows(self, window, start=0, stop=None, print_output:bool = False):
+        """
+        Solve the horizon one window of periods at a time
+        ------------------------------------------------
+        Each window gets its own model over the periods first .. first +
+        window - 1 (labelled with the absolute period); results are written
+        to output_dir as they come, so memory stays bounded by the window.
+        ------------------------------------------------
+        Yield:
+            PFResult of each window
+        """
+        writers = open_writers(self.output_dir, self.output_formats) if self.output_dir is not None else []
+        output_dir, self.output_dir = self.output_dir, None
+        try:
+            for first, profiles in self.profile_windows(window, start, stop):
+                self.profiles = profiles
+                self.times = range(first, first + profiles['P'].shape[1])
+                self.modelo = None
+                resultado = self.resolve(print_output)
+                for writer in writers:
+                    writer.write(resultado)
+                yield resultado
+        finally:
+            self.output_dir = output_dir
+            for writer in writers:
+                writer.close()
+
+    def _model_values(self):
+        """ Variable values of the solved model as arrays (bus or branch) x time """
+        T = len(self.times)
+        values = {}
+        for name in VARIABLES:
+            var = getattr(self.modelo, name)
+            values[name] = np.fromiter((np.nan if v.value is None else v.value for v in var.values()),
+                                       dtype=float, count=len(var)).reshape(-1, T)
+        if self.engine == 'lindistflow':
+            # I is not in the LP (its values are whatever initial point was set)
+            values['I'] = np.zeros_like(values['I'])
+        return values
+
+    def _results(self, values, converged, print_output):
+        """ PFResult of `values` (None reads the model), printed and written as configured """
+        with self.stats.phase('extract'):
+            if values is None:
+                values = self._model_values()
+            resultado = PFResult.from_values(values, self.topology, self.times, self.S_base, converged, engine=self.engine)
+        self.result = resultado
+
+        # Nested dict views, only built for printing
+        if print_output:
+            views = resultado.as_dicts()
+            P_ij, Q_ij, V, I = views['P_ij'], views['Q_ij'], views['V'], views['I']
+            Pgen, Perdas = views['Pgen'], views['Perdas']
+            P_ijt = dict(zip(resultado.times, resultado.P_ijt.tolist()))
+
 
-        
         #region Output
-        if result.solver.status == po.SolverStatus.ok:
-            print('Model: ',self.modelo.name)
+        if converged:
+            print('Model: ',{'socp': self.modelo.name if self.modelo is not None else None,
+                             'sweep': 'Backward/forward sweep',
+                             'conic': f'SOCP conic form ({self.solver})',
+                             'lindistflow': f'LinDistFlow LP ({self.solver})'}[self.engine])
             print('[INFO] Results:')
             print('\t> [SUCCESS] The problem converged!')
             if print_output:
@@ -164,7 +704,7 @@ class SOCP_PF:
                 print(f"\n> Pgen [kW]:")
                 pprint({'PotGerador': Pgen})
 
-                print("\t> Optimal point:", round(pe.value(self.modelo.objective), 3))
+                print("\t> Optimal point:", round(resultado.objective, 3))
                 print("--------------------------------------------------------------------------------------------------------------")
                 print()
 
@@ -173,7 +713,7 @@ class SOCP_PF:
 
                 print(f"Perdas:")
                 pprint({'Perdas':Perdas})
-                
+
                 perdas_totais = 0
                 # for barra in Perdas.keys():
                 #     perdas_totais += Perdas[barra]
@@ -183,28 +723,149 @@ class SOCP_PF:
             print('[ERROR] Did not converge!')
         #endregion
 
-        with open('outputs/resolution.txt','w') as f:
-            with contextlib.redirect_stdout(f):
-                self.modelo.pprint()
-
-
-        with open('outputs/output.json','w') as f:
-            f.write(pformat({'Fluxo P': P_ij}))
-            f.write(pformat({'Fluxo Q': Q_ij}))
-            f.write(pformat({'Tensões': V}))
-            f.write(pformat({'Correntes': I}))
-            f.write(pformat({'PotGerador': Pgen}))
-            f.write(pformat({'Somatorio FluxPot': P_ijt}))
-            f.write(pformat({'Perdas':Perdas}))
-            #f.write(f"Perdas Totais = {perdas_totais}")
-
-
-
-        return P_ij, Q_ij, V, I
-
+        if self.output_dir is not None:
+            with self.stats.phase('write'):
+                self.write_results(resultado)
+
+        resultado.stats = self.stats.as_dict()
+        if print_output:
+            self.print_stats()
+        return resultado
+
+    def duals(self):
+        """
+        Multipliers of the balance and voltage drop constraints of the last solve
+        ------------------------------------------------
+        Read from the `dual` Suffix (Pyomo model) or from the conic
+        solution, signed as the change of the objective per unit increase of
+        the right-hand side (the load P / Q of the bus for the balances):
+        the AMPL convention of the Suffix (IPOPT, GLPK) as it is, and the
+        opposite of the conic duals (c + A'z = 0, see ConicSolution). A
+        load at the root bus has a positive dual.
+        ------------------------------------------------
+        Return:
+            'dict' {'active_power': bus x time, 'reactive_power': bus x time,
+                    'voltage_drop': branch x time} in objective units per p.u.
+        """
+        if self.engine == 'sweep':
+            raise ValueError(f'The {self.engine!r} engine has no constraint duals')
+        elif self.pyomo:
+            m, T = self.modelo, len(self.times)
+            if m is None or not hasattr(m, 'dual'):
+                raise ValueError('No model solved, call resolve() first')
+            duals = {name: np.array([m.dual.get(c, np.nan) for c in getattr(m, name).values()], dtype=float).reshape(-1, T)
+                     for name in DUALS}
+        else:
+            if getattr(self, 'solver_result', None) is None:
+                raise ValueError('No model solved, call resolve() first')
+            duals = self.conic.row_values(-np.asarray(self.solver_result.duals, dtype=float))
+
+        missing = [name for name in DUALS if np.isnan(duals[name]).any()]
+        if missing:
+            raise ValueError(f'Solver {self.solver!r} returned no duals for {", ".join(missing)} '
+                             '(not converged, or a solver without dual information)')
+        return duals
+
+    def sensitivities(self):
+        """
+        Bus-level sensitivities at the last solution, without re-solving
+        ------------------------------------------------
+        loss_P, loss_Q = marginal losses d(losses)/d(load) of each bus, from
+                         the balance duals relative to the one of the root
+                         bus (supplied without extra losses); an injection
+                         changes the losses by the opposite amount
+        V_P, V_Q       = rise of |V| of each bus per p.u. of P / Q injected
+                         at that bus, from the voltage_drop coefficients 2r
+                         and 2x summed over its path to the root (root
+                         voltage held). Buses downstream rise as much, so it
+                         is the largest rise the injection causes.
+        ------------------------------------------------
+        Return:
+            'dict' {name: array bus x time} in p.u.
+        """
+        duals = self.duals()
+        root = duals['active_power'][self.topology.root]
+        topo = self.topology
+
+        # Resistance / reactance of the path root -> bus
+        R, X = np.zeros(topo.n_bus), np.zeros(topo.n_bus)
+        for k in topo.order[1:]:
+            R[k] = R[topo.parent[k]] + topo.r[topo.parent_branch[k]]
+            X[k] = X[topo.parent[k]] + topo.x[topo.parent_branch[k]]
+        V = self.result.V.T
+
+        return {'loss_P': duals['active_power'] / root - 1, 'loss_Q': duals['reactive_power'] / root,
+                'V_P': R[:, None] / V, 'V_Q': X[:, None] / V}
+
+    def relaxation_gap(self, resultado=None):
+        """
+        Slack of the cone (4) V_from * I - P_ij^2 - Q_ij^2 in p.u.
+        ------------------------------------------------
+        Zero when the relaxation is exact; a positive slack means the
+        solution is not a power flow (current above the one of the flows).
+        ------------------------------------------------
+        Return:
+            array branch x time for `resultado` (default: the last result)
+        """
+        values = (resultado or self.result).model_values()
+        return values['V'][self.topology.from_idx] * values['I'] - values['P_ij'] ** 2 - values['Q_ij'] ** 2
+
+    def approximation_error(self, reference=None, engine='socp', solver=None):
+        """
+        Error of the last result (e.g. engine 'lindistflow') against the SOCP relaxation
+        ------------------------------------------------
+        Args:
+            reference = 'PFResult' of the SOCP relaxation over the same
+                        network and periods; None solves it with a new
+                        SOCP_PF of `engine` / `solver` on the same profiles
+        ------------------------------------------------
+        Return:
+            'dict' of largest absolute errors over buses / branches and
+            periods: V and V_mean [p.u.], P_ij, Q_ij and losses per period
+            [x S_base] (for LinDistFlow the SOCP losses it neglects) and
+            the objective
+        """
+        if reference is None:
+            pf = SOCP_PF.from_data(self.topology, self.profiles, self.S_base, self.V_base, solver=solver, engine=engine)
+            pf.V_bounds = self.V_bounds
+            reference = pf.resolve()
+        result = self.result
+        error = {name: float(np.nanmax(np.abs(getattr(result, name) - getattr(reference, name))))
+                 for name in ('V', 'P_ij', 'Q_ij')}
+        error['V_mean'] = float(np.nanmean(np.abs(result.V - reference.V)))
+        error['losses'] = float(np.max(np.abs(result.losses - reference.losses)))
+        error['objective'] = abs(result.objective - reference.objective)
+        return error
+
+    def print_stats(self):
+        """ Summary of the last run: phase timings, model size and solver statistics """
+        stats = self.stats
+        print('[INFO] Run statistics:')
+        for name, record in stats.phases.items():
+            memory = f", peak {record['peak_mb']:.1f} MB" if 'peak_mb' in record else ''
+            print(f"\t> {name:<8} {record['time']:9.4f} s{memory}")
+        if stats.counts:
+            print('\t> model    ' + ', '.join(f'{v} {k}' for k, v in stats.counts.items()))
+        if stats.solver:
+            print('\t> solver   ' + ', '.join(f'{k}={v}' for k, v in stats.solver.items()))
+
+    def write_results(self, resultado, output_dir=None, formats=None):
+        """
+        Stream a result to output_dir with the configured writers
+        ------------------------------------------------
+        The Pyomo model is only dumped (resolution.txt) with dump_model=True.
+        """
+        output_dir = output_dir or self.output_dir
+        for writer in open_writers(output_dir, formats or self.output_formats):
+            with writer:
+                writer.write(resultado)
+
+        if self.dump_model and self.modelo is not None:
+            with open(os.path.join(output_dir, 'resolution.txt'),'w') as f:
+                with contextlib.redirect_stdout(f):
+                    self.modelo.pprint()
 
 if __name__ == '__main__':
-    PF = SOCP_PF('DATA/teste.xlsx',S_base=100, V_base=13.8)
+    PF = SOCP_PF('DATA/teste.xlsx',S_base=100, V_base=13.8, output_dir='outputs', dump_model=True)
     # PF = SOCP_PF('DATA/teste.xlsx',S_base=100e-3, V_base=12.66)
     PF.solve(print_output=True)
-    
\ No newline at end of file
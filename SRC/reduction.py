@@ -0,0 +1,184 @@
+import numpy as np
+from topology import Topology
+from model import SOCP_PF, PARAMS
+from results import PFResult
+
+
+def zero_injection(topology, profiles=None):
+    """ Mask of the buses with no load and no generation limit in any period """
+    if profiles is None:
+        profiles = {name: getattr(topology, name)[:, None] for name in PARAMS}
+    mask = np.ones(topology.n_bus, dtype=bool)
+    for name in PARAMS:
+        mask &= ~np.any(np.asarray(profiles[name]) != 0, axis=1)
+    return mask
+
+
+class TopologyReduction:
+    """
+    Smaller equivalent of a radial network for the solver
+    ------------------------------------------------
+    Two passes over the buses with no load and no generation (zero_injection)
+    that are neither the root nor listed in `keep`:
+        (1) dead ends: a leaf of that kind carries no current, so it and its
+            branch are removed (repeated up the feeder while new leaves of
+            that kind appear); its V equals the V of its neighbour
+        (2) series chains: a bus of that kind with one arriving and one
+            leaving branch is removed and the branches around it merged into
+            one with r = sum(r) and x = sum(x)
+    Dead ends are exact. A merged branch is the physical series equivalent,
+    but the cone (4) of SOCP_PF pairs the received power with the voltage
+    at the sending end, so the losses of a chain move by a second order
+    term (voltage drop along the chain x current). expand() rebuilds each
+    chain from its last bus with the equations of the full model.
+    ------------------------------------------------
+    bsh of merged branches is summed (SOCP_PF does not model it).
+    """
+
+    def __init__(self, topology, profiles=None, keep=()):
+        """
+        Args:
+            topology = 'Topology' (p.u.)
+            profiles = 'dict' {quantity: array bus x time} as SOCP_PF.profiles;
+                       None looks at the DBAR snapshot of the topology
+            keep = bus ids never removed (e.g. monitored buses)
+        """
+        topo = self.original = topology
+        removable = zero_injection(topo, profiles)
+        removable[topo.root] = False
+        removable[topo.index_of(list(keep))] = False
+
+        live_bus = np.ones(topo.n_bus, dtype=bool)
+        live_branch = np.ones(topo.n_branch, dtype=bool)
+        degree = np.bincount(np.concatenate([topo.from_idx, topo.to_idx]), minlength=topo.n_bus)
+
+        # _________ (1) Dead ends, leaves first _________
+        pruned = []     # (bus row, neighbour row) in removal order
+        stack = np.flatnonzero(removable & (degree == 1)).tolist()
+        while stack:
+            k = stack.pop()
+            if not live_bus[k] or degree[k] != 1:
+                continue
+            edges = topo.adj_branch[topo.adj_ptr[k]:topo.adj_ptr[k + 1]]
+            b = int(edges[live_branch[edges]][0])
+            other = int(topo.from_idx[b] + topo.to_idx[b] - k)
+            live_bus[k] = live_branch[b] = False
+            degree[other] -= 1
+            pruned.append((k, other))
+            if removable[other] and degree[other] == 1:
+                stack.append(other)
+
+        # _________ (2) Series chains _________
+        n_in = np.bincount(topo.to_idx[live_branch], minlength=topo.n_bus)
+        n_out = np.bincount(topo.from_idx[live_branch], minlength=topo.n_bus)
+        interior = removable & live_bus & (n_in == 1) & (n_out == 1)
+        next_branch = np.full(topo.n_bus, -1, dtype=int)
+        next_branch[topo.from_idx[live_branch]] = np.flatnonzero(live_branch)
+
+        chains = []
+        for b in np.flatnonzero(live_branch):
+            if interior[topo.from_idx[b]]:
+                continue
+            chain = [int(b)]
+            while interior[topo.to_idx[chain[-1]]]:
+                chain.append(int(next_branch[topo.to_idx[chain[-1]]]))
+            chains.append(chain)
+        live_bus &= ~interior
+
+        # _________ Reduced network _________
+        self.buses = np.flatnonzero(live_bus)
+        self.chains = chains
+        self.pruned = pruned
+        first, last = [c[0] for c in chains], [c[-1] for c in chains]
+        self.topology = Topology(topo.nodes[self.buses], topo.nodes[topo.from_idx[first]], topo.nodes[topo.to_idx[last]],
+                                 r=[topo.r[c].sum() for c in chains], x=[topo.x[c].sum() for c in chains],
+                                 P=topo.P[self.buses], Q=topo.Q[self.buses],
+                                 P_gen_limit=topo.P_gen_limit[self.buses], Q_gen_limit=topo.Q_gen_limit[self.buses],
+                                 bsh=[topo.bsh[c].sum() for c in chains], branch_ids=topo.branch_ids[first])
+
+        self.summary = {'buses': topo.n_bus, 'branches': topo.n_branch,
+                        'reduced_buses': self.topology.n_bus, 'reduced_branches': self.topology.n_branch,
+                        'pruned': len(pruned), 'merged': int(interior.sum())}
+
+    @classmethod
+    def from_model(cls, pf, keep=()):
+        """ Reduction of the network and profiles of a SOCP_PF (read if needed) """
+        if pf.topology is None:
+            pf.load_data()
+        return cls(pf.topology, pf.profiles, keep)
+
+    def reduce_profiles(self, profiles):
+        """ Profiles {quantity: array bus x time} restricted to the buses kept """
+        return {name: np.asarray(values)[self.buses] for name, values in profiles.items()}
+
+    def model(self, pf):
+        """ SOCP_PF over the reduced network with the profiles, bases, engine and solver of pf """
+        if pf.topology is None:
+            pf.load_data()
+        reduced = SOCP_PF.from_data(self.topology, self.reduce_profiles(pf.profiles), pf.S_base, pf.V_base,
+                                    solver=pf.solver, engine=pf.engine)
+        reduced.V_bounds = pf.V_bounds
+        return reduced
+
+    def expand_values(self, values):
+        """
+        Values of the reduced network on the original buses and branches
+        ------------------------------------------------
+        Kept buses and unmerged branches take the reduced values; chains are
+        rebuilt segment by segment from their last bus with the equations of
+        SOCP_PF, dead ends get no flow.
+        ------------------------------------------------
+        Args:
+            values = 'dict' {variable: array (bus or branch) x time} in model
+                     units (squared V and I), e.g. PFResult.model_values()
+        """
+        topo = self.original
+        T = values['V'].shape[1]
+        full = {name: np.zeros((topo.n_bus, T)) for name in ('V', 'Pgen', 'Qgen', 'Perdas')}
+        for name in full:
+            full[name][self.buses] = values[name]
+
+        full.update({name: np.zeros((topo.n_branch, T)) for name in ('P_ij', 'Q_ij', 'I')})
+        V = full['V']
+        for m, chain in enumerate(self.chains):
+            P, Q, I = values['P_ij'][m], values['Q_ij'][m], values['I'][m]
+            if len(chain) == 1:
+                full['P_ij'][chain[0]], full['Q_ij'][chain[0]], full['I'][chain[0]] = P, Q, I
+                continue
+            # Up the chain from its last bus, whose V and received power are the reduced ones:
+            # (3) gives V_from = c + z2 * I and (4) V_from * I = P^2 + Q^2, so I solves z2 I^2 + c I - S2 = 0
+            V_to = V[topo.to_idx[chain[-1]]]
+            for b in chain[::-1]:
+                r, x = topo.r[b], topo.x[b]
+                z2, S2 = r ** 2 + x ** 2, P ** 2 + Q ** 2
+                c = V_to - 2 * (r * P + x * Q)
+                I = 2 * S2 / (c + np.sqrt(c ** 2 + 4 * z2 * S2))
+                full['P_ij'][b], full['Q_ij'][b], full['I'][b] = P, Q, I
+                if b != chain[0]:
+                    V_to = V[topo.from_idx[b]] = c + z2 * I
+                    # Balance at the removed bus: the flow arriving there carries this segment's r * I (x * I)
+                    P, Q = P - r * I, Q - x * I
+
+        # Dead ends float at the voltage of their neighbour (last removed first)
+        for k, other in reversed(self.pruned):
+            V[k] = V[other]
+        return full
+
+    def expand(self, resultado):
+        """ PFResult of the reduced network mapped back onto the original one """
+        expanded = PFResult.from_values(self.expand_values(resultado.model_values()), self.original, resultado.times,
+                                        resultado.scale, resultado.converged, engine=resultado.engine)
+        expanded.stats = resultado.stats
+        return expanded
+
+
+def solve_reduced(pf, keep=(), print_output=False):
+    """
+    Solve pf on its reduced network and return the result on the original one
+    ------------------------------------------------
+    Return:
+        ('PFResult' over all the buses and branches of pf, 'TopologyReduction')
+    """
+    reduction = TopologyReduction.from_model(pf, keep)
+    resultado = reduction.model(pf).resolve(print_output)
+    return reduction.expand(resultado), reduction
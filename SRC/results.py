@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+
+class PFResult:
+    """
+    Power flow result stored as arrays
+    ------------------------------------------------
+    Bus quantities (V, Pgen, Qgen, Perdas) have shape (time, bus) and branch
+    quantities (P_ij, Q_ij, I) shape (time, branch), in the units printed by
+    SOCP_PF: V and I as magnitudes in p.u., powers multiplied by S_base.
+    ------------------------------------------------
+    solve() used to return the tuple (P_ij, Q_ij, V, I) of nested dicts. The
+    result still behaves as that tuple: unpacking, len() and indexing give
+    those dicts, so `P_ij, Q_ij, V, I = PF.solve()` and `PF.solve()[2]` keep
+    working; as_dicts() and to_frame() build the other views on demand.
+    """
+
+    __slots__ = ('nodes', 'branches', 'times', 'scale', 'engine', 'converged', 'stats',
+                 'V', 'I', 'P_ij', 'Q_ij', 'Pgen', 'Qgen', 'Perdas')
+
+    BUS = ('V', 'Pgen', 'Qgen', 'Perdas')
+    BRANCH = ('P_ij', 'Q_ij', 'I')
+    LEGACY = ('P_ij', 'Q_ij', 'V', 'I')   # order of the tuple solve() used to return
+
+    def __init__(self, nodes, branches, times, scale, engine, converged, **arrays):
+        self.nodes = list(nodes)
+        self.branches = list(branches)
+        self.times = list(times)
+        self.scale = scale
+        self.engine = engine
+        self.converged = converged
+        self.stats = None   # run statistics (instrumentation.RunStats.as_dict), set by SOCP_PF
+        for name in self.BUS + self.BRANCH:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_values(cls, values, topology, times, scale, converged, engine='socp'):
+        """
+        Args:
+            values = 'dict' {variable: array (bus or branch) x time} in model
+                     units (p.u., squared V and I), as SOCP_PF._model_values
+            topology = 'Topology' the values refer to
+            scale = factor applied to powers (SOCP_PF uses S_base)
+        """
+        arrays = {name: np.sqrt(np.maximum(values[name].T, 0)) for name in ('V', 'I')}
+        arrays.update({name: values[name].T * scale for name in ('P_ij', 'Q_ij', 'Pgen', 'Qgen', 'Perdas')})
+        return cls(topology.nodes.tolist(), topology.branch_list(), times, scale, engine, converged, **arrays)
+
+    def periods(self, start, stop, times=None):
+        """ Result of the periods at positions start .. stop - 1 (relabelled with `times`) """
+        arrays = {name: getattr(self, name)[start:stop] for name in self.BUS + self.BRANCH}
+        times = self.times[start:stop] if times is None else times
+        return PFResult(self.nodes, self.branches, times, self.scale, self.engine, self.converged, **arrays)
+
+    @classmethod
+    def concat(cls, results):
+        """ One result over the periods of consecutive results of the same network """
+        results = list(results)
+        arrays = {name: np.concatenate([getattr(r, name) for r in results]) for name in cls.BUS + cls.BRANCH}
+        first = results[0]
+        return cls(first.nodes, first.branches, [t for r in results for t in r.times], first.scale,
+                   first.engine, all(r.converged for r in results), **arrays)
+
+    def model_values(self):
+        """ Inverse of from_values: arrays (bus or branch) x time in model units """
+        values = {name: getattr(self, name).T ** 2 for name in ('V', 'I')}
+        values.update({name: getattr(self, name).T / self.scale for name in ('P_ij', 'Q_ij', 'Pgen', 'Qgen', 'Perdas')})
+        return values
+
+    # _________ Aggregates _________
+    @property
+    def objective(self):
+        """ Value of the SOCP objective (10 * sum of Pgen in p.u.) """
+        return 10 * np.nansum(self.Pgen) / self.scale
+
+    @property
+    def losses(self):
+        """ Total losses per period (sum of Perdas over the buses) """
+        return self.Perdas.sum(axis=1)
+
+    @property
+    def P_ijt(self):
+        """ Sum of the active flows per period """
+        return self.P_ij.sum(axis=1)
+
+    # _________ Views _________
+    def __iter__(self):
+        return (self._view(name) for name in self.LEGACY)
+
+    def __len__(self):
+        return len(self.LEGACY)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return tuple(self._view(name) for name in self.LEGACY[k])
+        return self._view(self.LEGACY[k])
+
+    def as_dicts(self):
+        """
+        Nested dict views {t: {i: value}} for bus quantities and
+        {t: {i: {j: value}}} for branch quantities
+        """
+        return {name: self._view(name) for name in self.BUS + self.BRANCH}
+
+    def _view(self, name):
+        values = getattr(self, name)
+        if name in self.BUS:
+            return {t: dict(zip(self.nodes, values[k].tolist())) for k, t in enumerate(self.times)}
+        view = {}
+        for k, t in enumerate(self.times):
+            row = view[t] = {i: {} for i in self.nodes}
+            for (i, j), value in zip(self.branches, values[k].tolist()):
+                row[i][j] = value
+        return view
+
+    def to_frame(self, kind='bus'):
+        """
+        Long-format DataFrame indexed by (t, bus) for kind='bus' or
+        (t, from, to) for kind='branch'
+        """
+        names = self.BUS if kind == 'bus' else self.BRANCH
+        labels = self.nodes if kind == 'bus' else self.branches
+        if kind == 'bus':
+            index = pd.MultiIndex.from_product([self.times, labels], names=['t', 'bus'])
+        else:
+            index = pd.MultiIndex.from_tuples([(t,) + b for t in self.times for b in labels], names=['t', 'from', 'to'])
+        return pd.DataFrame({name: getattr(self, name).ravel() for name in names}, index=index)
+
+    def period_frames(self, k):
+        """ (buses, branches) DataFrames of the k-th period, used by the writers """
+        t = self.times[k]
+        buses = pd.DataFrame({'t': t, 'bus': self.nodes})
+        for name in self.BUS:
+            buses[name] = getattr(self, name)[k]
+        branches = pd.DataFrame({'t': t, 'from': [i for i, _ in self.branches], 'to': [j for _, j in self.branches]})
+        for name in self.BRANCH:
+            branches[name] = getattr(self, name)[k]
+        return buses, branches
+
+    def __repr__(self):
+        return (f'PFResult(engine={self.engine!r}, converged={self.converged}, '
+                f'times={len(self.times)}, buses={len(self.nodes)}, branches={len(self.branches)})')
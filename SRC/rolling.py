@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from results import PFResult
+from writers import open_writers
+from instrumentation import aggregate_stats
+
+
+class RollingHorizon:
+    """
+    Solve a long horizon window by window with one persistent model
+    ------------------------------------------------
+    The horizon is cut into windows of `window` periods that advance by
+    window - overlap periods. Each window commits its first periods; the
+    `overlap` last ones are only a look-ahead and are solved again by the
+    next window. The last window is aligned with the end of the horizon so
+    every window has the same length.
+    ------------------------------------------------
+    With a Pyomo model (SOCP_PF.pyomo: engine 'socp', or 'lindistflow'
+    with a Pyomo LP solver) the model is built once for `window` periods
+    (labelled 0 .. window - 1) and only its load / generation Params are
+    swapped between windows (SOCP_PF.set_profiles). Each window starts from
+    the solution of the previous one shifted by the periods it advanced
+    (the last period repeated at the end), with the IPOPT warm-start
+    options. Engines 'conic' and 'sweep' have no persistent model and just
+    solve the windows in turn.
+    ------------------------------------------------
+    Profiles are read by windows from the profile source of pf when it has
+    not been loaded yet (SOCP_PF.profile_windows), otherwise cut from
+    pf.profiles. pf is left with the model and profiles of the last window.
+    """
+
+    def __init__(self, pf, window, overlap=0, warm_start=True):
+        """
+        Args:
+            pf = 'SOCP_PF' with the whole horizon (profiles / times)
+            window = 'int' periods per window
+            overlap = 'int' look-ahead periods shared with the next window
+            warm_start = start each window from the previous solution
+        """
+        if window < 1 or not 0 <= overlap < window:
+            raise ValueError(f'Need window >= 1 and 0 <= overlap < window, got window={window}, overlap={overlap}')
+        self.pf = pf
+        self.window = window
+        self.overlap = overlap
+        self.warm_start = warm_start
+        self.history = None
+        self.stats = []
+
+    @property
+    def stride(self):
+        return self.window - self.overlap
+
+    def _chunks(self):
+        """ Profiles in consecutive blocks of `stride` periods """
+        pf = self.pf
+        if pf.profiles is None and pf.profile_source is not None:
+            yield from pf.profile_windows(self.stride, stop=pf.n_times)
+            return
+        if pf.profiles is None:
+            pf.load_data()
+        # pf.profiles is replaced by the windows as they are solved
+        profiles = dict(pf.profiles)
+        for first in range(0, profiles['P'].shape[1], self.stride):
+            yield first, {name: values[:, first:first + self.stride] for name, values in profiles.items()}
+
+    def windows(self):
+        """
+        Windows of the horizon, holding at most window + stride periods
+        ------------------------------------------------
+        Yield:
+            (first period, 'dict' {quantity: array bus x window}, (k0, k1))
+            where the local periods k0 .. k1 - 1 are the committed ones
+        """
+        W, stride = self.window, self.stride
+        chunks = self._chunks()
+        buffer, b0, committed, done = None, 0, 0, False
+
+        def cut(start, stop):
+            return {name: values[:, start - b0:stop - b0] for name, values in buffer.items()}
+
+        while not done:
+            chunk = next(chunks, None)
+            done = chunk is None
+            if not done:
+                buffer = chunk[1] if buffer is None else \
+                    {name: np.concatenate([buffer[name], chunk[1][name]], axis=1) for name in buffer}
+            if buffer is None:
+                return
+            b1 = b0 + buffer['P'].shape[1]
+
+            while committed < b1:
+                if done and b1 - committed <= W:
+                    first = max(b1 - W, b0)
+                    yield first, cut(first, b1), (committed - first, b1 - first)
+                    committed = b1
+                elif b1 - committed > W:
+                    yield committed, cut(committed, committed + W), (0, stride)
+                    committed += stride
+                else:
+                    break
+
+            # Keep what the next window (or an end-aligned last one) can still need
+            keep = max(b0, min(committed, b1 - W))
+            buffer, b0 = cut(keep, b1), keep
+
+    def run(self, print_output=False, stitch=True):
+        """
+        Solve all the windows
+        ------------------------------------------------
+        Args:
+            stitch = return the committed periods as one PFResult; with
+                     False nothing is kept (results only go to the writers
+                     of pf.output_dir) and memory stays bounded by the window
+        ------------------------------------------------
+        Return:
+            'PFResult' over the whole horizon (or None without stitch);
+            per-window times, iterations and convergence are in `history`
+        """
+        pf = self.pf
+        pf.modelo = None
+        writers = open_writers(pf.output_dir, pf.output_formats) if pf.output_dir is not None else []
+        output_dir, pf.output_dir = pf.output_dir, None
+        parts, history, self.stats = [], [], []
+        previous = None
+        try:
+            for k, (first, profiles, (k0, k1)) in enumerate(self.windows()):
+                width = profiles['P'].shape[1]
+                pf.times = range(width)
+                pf.stats.reset()
+
+                persistent = pf.pyomo and pf.modelo is not None
+                if persistent:
+                    pf.set_profiles(profiles)
+                else:
+                    pf.profiles = {name: np.ascontiguousarray(values) for name, values in profiles.items()}
+                warm_start = self.warm_start and persistent and previous is not None
+                if warm_start:
+                    pf.set_initial_point(_shifted(previous[1], first - previous[0]))
+
+                resultado = pf.resolve(print_output, warm_start=warm_start)
+                part = resultado.periods(k0, k1, times=list(range(first + k0, first + k1)))
+                for writer in writers:
+                    writer.write(part)
+                if stitch:
+                    parts.append(part)
+                previous = (first, resultado.model_values())
+
+                self.stats.append(resultado.stats)
+                history.append({'window': k, 'first': first, 'last': first + width - 1,
+                                'committed': k1 - k0, 'converged': resultado.converged,
+                                'warm_start': warm_start, 'rebuilt': not persistent,
+                                'solve_time': resultado.stats['phases'].get('solve', {}).get('time'),
+                                'iterations': resultado.stats['solver'].get('iterations')})
+        finally:
+            pf.output_dir = output_dir
+            for writer in writers:
+                writer.close()
+            self.history = pd.DataFrame(history)
+
+        return PFResult.concat(parts) if stitch and parts else None
+
+    def stats_summary(self):
+        """ Timings and solver statistics of the last run() aggregated over the windows """
+        return aggregate_stats(self.stats)
+
+
+def _shifted(values, offset):
+    """ Solution of the previous window moved `offset` periods back, its last period repeated at the end """
+    shifted = {}
+    for name, v in values.items():
+        kept = v[:, offset:]
+        shifted[name] = np.concatenate([kept, np.repeat(v[:, -1:], v.shape[1] - kept.shape[1], axis=1)], axis=1)
+    return shifted
@@ -0,0 +1,166 @@
+import os
+import contextlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from model import SOCP_PF
+from writers import open_writers
+from instrumentation import aggregate_stats
+
+# Scenario keys forwarded to SOCP_PF.update_loads
+DELTAS = ('P', 'Q', 'P_gen_limit', 'Q_gen_limit')
+
+# Model owned by each worker process (built once, re-solved per scenario)
+_WORKER = None
+
+
+class ScenarioBatch:
+    """
+    Run many load / DG scenarios of one feeder over a process pool
+    ------------------------------------------------
+    The workbook is parsed once here; each worker process receives the
+    parsed topology, builds its own model and solver instance once and
+    re-solves it for every scenario it gets. Nothing is written to disk
+    unless run() gets an output_dir. The run statistics of every scenario
+    are kept in `stats` and summarized by stats_summary().
+    ------------------------------------------------
+    A scenario is a 'dict' with optional keys
+        'name'        = label used in the result table (defaults to position)
+        'load_scale'  = factor applied to the base P and Q
+        'P', 'Q', 'P_gen_limit', 'Q_gen_limit'
+                      = values in kW / kvar as accepted by update_loads
+    applied on top of the base case, so scenarios never leak into each other.
+    """
+
+    def __init__(self, data_dir, S_base, V_base, solver='ipopt', times=None, profiles=None, workers=None):
+
+        base = SOCP_PF(data_dir, S_base, V_base, solver=solver, times=times, profiles=profiles)
+        base.load_data()
+        self.topology = base.topology
+        self.profiles = base.profiles
+        self.S_base = S_base
+        self.V_base = V_base
+        self.solver = solver
+        self.workers = workers or os.cpu_count()
+        self.stats = []
+
+    def run(self, scenarios, chunksize=1, output_dir=None, output_formats=('json',)):
+        """
+        Solve all scenarios
+        ------------------------------------------------
+        Args:
+            output_dir = 'str' folder where the full result of every scenario
+                         is streamed (one scenario at a time, labelled by name);
+                         None keeps only the summary table
+            output_formats = writers used in output_dir, see writers.WRITERS
+        ------------------------------------------------
+        Return:
+            'pd.DataFrame' with one row per scenario and period; every column
+            is a per-period value (objective is the period's own term of the
+            SOCP objective), so summing a column over the periods of a
+            scenario gives its total over the horizon
+        """
+        scenarios = [dict(s, name=s.get('name', k)) for k, s in enumerate(scenarios)]
+        initargs = (self.topology, self.profiles, self.S_base, self.V_base, self.solver)
+        task = partial(_run_scenario, keep_result=output_dir is not None)
+        writers = open_writers(output_dir, output_formats) if output_dir is not None else []
+
+        self.stats = []
+        try:
+            if self.workers == 1:
+                _init_worker(*initargs)
+                return self._collect(map(task, scenarios), writers)
+
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=initargs) as pool:
+                return self._collect(pool.map(task, scenarios, chunksize=chunksize), writers)
+        finally:
+            for writer in writers:
+                writer.close()
+
+    def _collect(self, outcomes, writers):
+        table = []
+        for rows, resultado, stats in outcomes:
+            table.extend(rows)
+            self.stats.append(stats)
+            if resultado is not None:
+                for writer in writers:
+                    writer.write(resultado, label=rows[0]['name'])
+        return pd.DataFrame(table)
+
+    def stats_summary(self):
+        """ Timings and solver statistics of the last run() aggregated over the scenarios """
+        return aggregate_stats(self.stats)
+
+
+def monte_carlo_scenarios(topology, n, S_base, load_sigma=0.1, dg_buses=None, dg_penetration=(0.0, 0.5), seed=None):
+    """
+    Random load and DG-penetration scenarios
+    ------------------------------------------------
+    Args:
+        topology = 'Topology' in p.u.
+        n = 'int' number of scenarios
+        S_base = base power in MVA (same as SOCP_PF)
+        load_sigma = std. deviation of the per-bus load multiplier (mean 1)
+        dg_buses = candidate bus ids for DG (default: all but the root)
+        dg_penetration = (min, max) DG injection as a fraction of the total load
+        seed = random seed
+    ------------------------------------------------
+    Return:
+        List of scenario dicts with 'P' in kW per bus; DG is modelled as a
+        negative load at one randomly drawn candidate bus.
+    """
+    rng = np.random.default_rng(seed)
+    base_kw = topology.P * S_base * 1e3
+    if dg_buses is None:
+        dg_buses = np.delete(topology.nodes, topology.root)
+    dg_rows = topology.index_of(dg_buses)
+
+    scenarios = []
+    for k in range(n):
+        P = base_kw * np.clip(rng.normal(1.0, load_sigma, topology.n_bus), 0, None)
+        penetration = rng.uniform(*dg_penetration)
+        bus = rng.choice(dg_rows)
+        P[bus] -= penetration * base_kw.clip(min=0).sum()
+        scenarios.append({'name': k, 'P': P, 'dg_bus': int(topology.nodes[bus]), 'dg_penetration': penetration})
+    return scenarios
+
+
+def _init_worker(topology, profiles, S_base, V_base, solver):
+    global _WORKER
+    _WORKER = SOCP_PF.from_data(topology, profiles, S_base, V_base, solver=solver)
+    _WORKER.build()
+    _WORKER.snapshot_profiles()
+
+
+def _run_scenario(scenario, keep_result=False):
+    pf = _WORKER
+
+    # Back to the base case, then apply this scenario's deltas
+    pf.reset_profiles(scenario.get('load_scale', 1.0))
+    pf.update_loads(**{name: scenario[name] for name in DELTAS if name in scenario})
+
+    info = {key: value for key, value in scenario.items() if key not in DELTAS and key != 'load_scale'}
+    pf.stats.reset()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            resultado = pf.resolve(print_output=False)
+    except Exception as error:
+        return [dict(info, t=t, status='error', message=str(error)) for t in pf.times], None, pf.stats.as_dict()
+
+    solver = pf.solver_result.solver
+    rows = [dict(info, t=t, status=str(solver.status), termination=str(solver.termination_condition), **summary)
+            for t, summary in enumerate(_summary(resultado))]
+    return rows, (resultado if keep_result else None), resultado.stats
+
+
+def _summary(resultado):
+    """ Per-period indicators of a PFResult """
+    return [{'objective': 10 * np.nansum(resultado.Pgen[t]) / resultado.scale,
+             'Pgen_total': np.nansum(resultado.Pgen[t]),
+             'losses': resultado.losses[t],
+             'V_min': np.nanmin(resultado.V[t]),
+             'V_min_bus': resultado.nodes[int(np.nanargmin(resultado.V[t]))],
+             'V_max': np.nanmax(resultado.V[t]),
+             'I_max': np.nanmax(resultado.I[t], initial=0.0)}
+            for t in range(len(resultado.times))]
@@ -0,0 +1,374 @@
+"""
+Local power-flow job service
+----------------------------
+Long-running asyncio server that keeps parsed networks and built SOCP_PF
+models in memory, so repeated solves of the same feeder skip the imports,
+the workbook parsing and the model construction.
+
+    python SRC/service.py --port 8765 --workers 4
+    python SRC/service.py --unix /tmp/socp_pf.sock
+
+HTTP/1.1 API (over TCP or the Unix socket):
+    GET  /health   {"status": "ok"}
+    GET  /stats    request, cache-hit and worker counters
+    POST /solve    JSON job, see SolveJob; once the solve is done the
+                   answer is sent as newline-delimited JSON in chunked
+                   transfer encoding, one chunk per line: one
+                   {"type": "period", ...} line per period, then one
+                   {"type": "summary", ...} line. This is not a stream
+                   of partial results: all periods are one model and
+                   are solved together, so the first line only leaves
+                   after the whole solve. Chunking lets the client
+                   parse the lines as they arrive instead of holding
+                   one large JSON document.
+
+    curl -N -d '{"data_dir": "DATA/teste.xlsx", "S_base": 100, "V_base": 13.8}' localhost:8765/solve
+
+Solves run in a pool of worker processes. Every worker holds an LRU cache
+of models and jobs of one feeder always go to the same worker, so its
+model is found in the cache.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model import SOCP_PF, PARAMS
+from data_handler import PROFILE_SHEETS
+from writers import JSONWriter
+
+# Job keys that select the model (everything else changes it in place)
+MODEL_KEYS = ('data_dir', 'S_base', 'V_base', 'engine', 'solver', 'times', 'profiles')
+
+# Models cached by each worker process
+_CACHE = None
+
+
+class ModelCache:
+    """
+    Least-recently-used cache of built SOCP_PF models
+    ------------------------------------------------
+    Keys carry the workbook (and profile file) modification time and size,
+    so an edited file builds a new model instead of serving a stale one.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._models = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(job):
+        profiles = job.get('profiles') or {}
+        profiles = [profiles] if isinstance(profiles, str) else list(profiles.values())
+        paths = [job['data_dir']] + [path for path in profiles if isinstance(path, str)]
+        return _model_key(job) + tuple((os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+
+    def get(self, job):
+        """ (model of the job, True when it came from the cache) """
+        key = self.key(job)
+        if key in self._models:
+            self._models.move_to_end(key)
+            self.hits += 1
+            return self._models[key], True
+
+        self.misses += 1
+        pf = SOCP_PF(job['data_dir'], job['S_base'], job['V_base'], solver=job.get('solver'),
+                     times=job.get('times'), profiles=job.get('profiles'), engine=job.get('engine', 'socp'))
+        pf.load_data()
+        if pf.pyomo:
+            pf.build()
+        pf.snapshot_profiles()
+        self._models[key] = pf
+        while len(self._models) > self.maxsize:
+            self._models.popitem(last=False)
+        return pf, False
+
+    def __len__(self):
+        return len(self._models)
+
+
+class SolveJob:
+    """
+    Body of POST /solve
+    ------------------------------------------------
+        data_dir, S_base, V_base       = network, as SOCP_PF (required)
+        engine, solver, times, profiles = as SOCP_PF ('profiles' as a
+                                         .xlsx / .npz path or {quantity:
+                                         .csv / .npy path or list bus x time})
+        load_scale                     = factor applied to the base P and Q
+        P, Q, P_gen_limit, Q_gen_limit = {bus: kW / kvar (or list per
+                                         period)} applied on top of the base
+                                         case, as SOCP_PF.update_loads
+        warm_start                     = start from the previous solution of
+                                         the cached model (engine 'socp')
+    """
+
+    REQUIRED = ('data_dir', 'S_base', 'V_base')
+
+    @classmethod
+    def parse(cls, body):
+        job = json.loads(body or b'{}')
+        if not isinstance(job, dict):
+            raise ValueError('The job must be a JSON object')
+        missing = [name for name in cls.REQUIRED if name not in job]
+        if missing:
+            raise ValueError(f'Missing job fields {missing}')
+        if not os.path.exists(job['data_dir']):
+            raise ValueError(f"No network file {job['data_dir']!r}")
+        cls._check_profiles(job.get('profiles'))
+        for name in PARAMS:
+            if isinstance(job.get(name), dict):
+                job[name] = {int(bus): value for bus, value in job[name].items()}
+        return job
+
+    @staticmethod
+    def _check_profiles(profiles):
+        # A .xlsx / .npz path or {quantity: .csv / .npy path or list}, as NetData.get_profiles
+        if profiles is None:
+            return
+        if isinstance(profiles, str):
+            profiles = {None: profiles}
+        elif isinstance(profiles, dict):
+            unknown = [name for name in profiles if name not in PROFILE_SHEETS]
+            if unknown:
+                raise ValueError(f'Unknown profile quantities {unknown}, expected some of {list(PROFILE_SHEETS)}')
+        else:
+            raise ValueError("'profiles' must be a file path or an object {quantity: file path or list}")
+        for source in profiles.values():
+            if not isinstance(source, (str, list)):
+                raise ValueError('A profile must be a file path or a list bus x time')
+            if isinstance(source, str) and not os.path.exists(source):
+                raise ValueError(f'No profile file {source!r}')
+
+
+def _model_key(job):
+    # JSON text of the model fields: hashable and the same in every process
+    return tuple(json.dumps(job.get(name), sort_keys=True) for name in MODEL_KEYS)
+
+
+def _init_worker(cache_size):
+    global _CACHE
+    _CACHE = ModelCache(cache_size)
+
+
+def _solve(job):
+    """ Solve a job with the cached model of its feeder (runs in a worker process) """
+    start = time.perf_counter()
+    pf, cached = _CACHE.get(job)
+
+    # Back to the base case, then apply the job's changes
+    pf.reset_profiles(job.get('load_scale', 1.0))
+    pf.update_loads(**{name: job[name] for name in PARAMS if job.get(name) is not None})
+
+    pf.stats.reset()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        resultado = pf.resolve(print_output=False, warm_start=bool(job.get('warm_start')) and cached)
+    return resultado, {'cached': cached, 'worker': os.getpid(), 'worker_time': time.perf_counter() - start}
+
+
+def _noop():
+    return os.getpid()
+
+
+class PowerFlowService:
+    """
+    asyncio HTTP server dispatching solve jobs to cached-model workers
+    ------------------------------------------------
+    Args:
+        workers = number of solver processes (one single-process pool each,
+                  so a feeder always lands on the same worker and its cache)
+        cache_size = models kept per worker
+    """
+
+    def __init__(self, workers=None, cache_size=8):
+        self.workers = workers or os.cpu_count()
+        self.cache_size = cache_size
+        self._pools = []
+        self._server = None
+        self.counters = {'requests': 0, 'jobs': 0, 'cache_hits': 0, 'errors': 0}
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        """ Start the worker processes and listen on TCP host:port or on the Unix socket unix_path """
+        loop = asyncio.get_running_loop()
+        self._pools = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(self.cache_size,))
+                       for _ in range(self.workers)]
+        # Pay the worker start-up and imports before the first job
+        await asyncio.gather(*(loop.run_in_executor(pool, _noop) for pool in self._pools))
+
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        return self
+
+    @property
+    def address(self):
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for pool in self._pools:
+            pool.shutdown(wait=True)
+
+    def _pool(self, job):
+        # Same feeder -> same worker (and its cache)
+        return self._pools[hash(_model_key(job)) % len(self._pools)]
+
+    # _________ HTTP _________
+    async def _handle(self, reader, writer):
+        self.counters['requests'] += 1
+        try:
+            method, path, body = await _read_request(reader)
+            if method == 'GET' and path == '/health':
+                await _send_json(writer, 200, {'status': 'ok'})
+            elif method == 'GET' and path == '/stats':
+                await _send_json(writer, 200, dict(self.counters, workers=self.workers, cache_size=self.cache_size))
+            elif method == 'POST' and path == '/solve':
+                await self._solve(writer, body)
+            else:
+                await _send_json(writer, 404, {'error': f'No route {method} {path}'})
+        except (ValueError, KeyError) as error:
+            self.counters['errors'] += 1
+            await _send_json(writer, 400, {'error': str(error)})
+        except Exception as error:
+            self.counters['errors'] += 1
+            await _send_json(writer, 500, {'error': f'{type(error).__name__}: {error}'})
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _solve(self, writer, body):
+        """
+        Solve a job in its worker and send the answer in chunks
+        ------------------------------------------------
+        The worker returns the complete PFResult; the period lines are
+        written from it after the solve, not while it runs (see the
+        module docstring).
+        """
+        start = time.perf_counter()
+        job = SolveJob.parse(body)
+        loop = asyncio.get_running_loop()
+        resultado, info = await loop.run_in_executor(self._pool(job), _solve, job)
+        self.counters['jobs'] += 1
+        self.counters['cache_hits'] += info['cached']
+
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n'
+                     b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n')
+        for k, t in enumerate(resultado.times):
+            buses, branches = resultado.period_frames(k)
+            await _send_chunk(writer, {'type': 'period', 't': t, 'buses': JSONWriter._columns(buses),
+                                       'branches': JSONWriter._columns(branches)})
+        await _send_chunk(writer, dict(info, type='summary', converged=bool(resultado.converged),
+                                       objective=float(resultado.objective),
+                                       losses=np.asarray(resultado.losses).tolist(), stats=resultado.stats,
+                                       elapsed=time.perf_counter() - start))
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode('latin-1').split()
+    if len(request_line) < 2:
+        raise ValueError('Malformed request line')
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    body = await reader.readexactly(length) if length else b''
+    return request_line[0].upper(), request_line[1], body
+
+
+async def _send_json(writer, status, payload):
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+    body = json.dumps(payload).encode()
+    writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+    await writer.drain()
+
+
+async def _send_chunk(writer, payload):
+    line = json.dumps(payload).encode() + b'\n'
+    writer.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+    await writer.drain()
+
+
+async def fetch(method, path, payload=None, host='127.0.0.1', port=8765, unix_path=None):
+    """
+    Minimal client of the service
+    ------------------------------------------------
+    Return:
+        (HTTP status, list of the JSON documents of the answer: one for
+        /health, /stats and errors, the period lines and summary for /solve)
+    """
+    if unix_path is not None:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                 f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    if b'transfer-encoding: chunked' in head.lower():
+        lines = []
+        while content:
+            size, _, content = content.partition(b'\r\n')
+            size = int(size, 16)
+            if size == 0:
+                break
+            lines.append(json.loads(content[:size]))
+            content = content[size + 2:]
+        return status, lines
+    return status, [json.loads(content)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-size', type=int, default=8, help='models cached per worker')
+    args = parser.parse_args(argv)
+
+    async def run():
+        service = await PowerFlowService(args.workers, args.cache_size).start(args.host, args.port, args.unix)
+        print(f'[INFO] Serving on {args.unix or service.address} with {service.workers} workers', flush=True)
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(run())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
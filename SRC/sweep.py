@@ -0,0 +1,83 @@
+import numpy as np
+
+
+def backward_forward_sweep(topology, P, Q, Pgen=None, Qgen=None, V0=1.0, tol=1e-10, max_iter=100):
+    """
+    Radial DistFlow load flow by backward/forward sweep (NumPy only)
+    ------------------------------------------------
+    Solves the same equations as SOCP_PF with the cone (4) tight:
+        (1)(2) P_ij = Pgen_j - P_j + sum_k (P_jk - r_jk I_jk)   (Q with x)
+        (3)    V_j  = V_i + 2 (r P_ij + x Q_ij) - (r^2 + x^2) I_ij
+        (4)    I_ij = (P_ij^2 + Q_ij^2) / V_i
+    The root bus is the slack (V = V0^2); generation at the other buses
+    is a fixed injection.
+    ------------------------------------------------
+    Args:
+        topology = 'Topology' in p.u.
+        P, Q = loads in p.u., shape (bus,) or (bus, scenarios)
+        Pgen, Qgen = fixed injections of the non-root buses (default 0)
+        V0 = root voltage magnitude in p.u. (scalar or per scenario)
+        tol = convergence tolerance on V (squared) between iterations
+        max_iter = iteration limit
+    ------------------------------------------------
+    Return:
+        'dict' with the SOCP_PF variables as arrays, branch x scenarios
+        ('P_ij', 'Q_ij', 'I') and bus x scenarios ('V', 'Pgen', 'Qgen',
+        'Perdas'), V and I squared, plus 'iterations' and 'converged'.
+    """
+    if not topology.radial:
+        raise ValueError('The backward/forward sweep needs a radial feeder with every branch from parent to child')
+
+    P = np.asarray(P, dtype=float)
+    vector = P.ndim == 1
+    P = P.reshape(topology.n_bus, -1)
+    Q = np.asarray(Q, dtype=float).reshape(topology.n_bus, -1)
+    S = P.shape[1]
+
+    Pgen = np.zeros_like(P) if Pgen is None else np.broadcast_to(np.asarray(Pgen, dtype=float).reshape(topology.n_bus, -1), P.shape).copy()
+    Qgen = np.zeros_like(Q) if Qgen is None else np.broadcast_to(np.asarray(Qgen, dtype=float).reshape(topology.n_bus, -1), Q.shape).copy()
+    root = topology.root
+    Pgen[root], Qgen[root] = 0.0, 0.0
+
+    r, x = topology.r[:, None], topology.x[:, None]
+    z2 = r ** 2 + x ** 2
+    f, to = topology.from_idx, topology.to_idx
+
+    # Branches grouped by the depth of their receiving bus
+    branch_depth = topology.depth[to]
+    levels = [np.flatnonzero(branch_depth == d) for d in range(1, branch_depth.max(initial=0) + 1)]
+
+    V = np.full((topology.n_bus, S), 1.0) * np.square(V0)
+    I = np.zeros((topology.n_branch, S))
+    P_ij, Q_ij = np.zeros_like(I), np.zeros_like(I)
+
+    converged = False
+    for iteration in range(1, max_iter + 1):
+        # _________ Backward: flows from the leaves to the root _________
+        net_P, net_Q = Pgen - P, Qgen - Q
+        for level in reversed(levels):
+            P_ij[level] = net_P[to[level]]
+            Q_ij[level] = net_Q[to[level]]
+            np.add.at(net_P, f[level], P_ij[level] - r[level] * I[level])
+            np.add.at(net_Q, f[level], Q_ij[level] - x[level] * I[level])
+
+        # _________ Forward: voltages from the root to the leaves _________
+        V_old = V.copy()
+        for level in levels:
+            V[to[level]] = V[f[level]] + 2 * (r[level] * P_ij[level] + x[level] * Q_ij[level]) - z2[level] * I[level]
+
+        I = (P_ij ** 2 + Q_ij ** 2) / V[f]
+        if np.max(np.abs(V - V_old), initial=0.0) < tol:
+            converged = True
+            break
+
+    # Root generation closes the balance (1)(2) at the slack bus
+    out = topology.out_branches(root)
+    Pgen[root] = P[root] - (P_ij[out] - r[out] * I[out]).sum(axis=0)
+    Qgen[root] = Q[root] - (Q_ij[out] - x[out] * I[out]).sum(axis=0)
+
+    values = {'P_ij': P_ij, 'Q_ij': Q_ij, 'I': I, 'V': V, 'Pgen': Pgen, 'Qgen': Qgen, 'Perdas': Pgen - P}
+    if vector:
+        values = {name: value[:, 0] for name, value in values.items()}
+    values.update(iterations=iteration, converged=converged)
+    return values
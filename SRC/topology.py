@@ -0,0 +1,258 @@
+from collections.abc import MutableMapping
+import numpy as np
+import scipy.sparse as sp
+
+
+class Topology:
+    """
+    Compact representation of a radial network
+    -------------------------------------------
+    Buses are stored by position (0 .. n_bus-1) and keep their original ids
+    in `nodes`. Branches are stored by position (0 .. n_branch-1) in a
+    branch table (`from_idx`, `to_idx`, `r`, `x`, `bsh`).
+
+    Neighbour lookup uses CSR-style lists:
+        out_ptr/out_branch = branches leaving each bus
+        in_ptr/in_branch   = branches arriving at each bus
+        adj_ptr/adj_idx    = neighbour buses (both directions)
+    and the tree itself is kept in `parent`/`parent_branch` arrays with
+    `order` (root first) and `depth` for sweeps over the feeder. With tie
+    branches in the table (a bus fed twice) the tree is the spanning tree
+    reached from the root following the branches from -> to; branches
+    left out of it are False in `tree`.
+    -------------------------------------------
+    Units are the ones given to the constructor; NetData builds it in p.u.
+    """
+
+    def __init__(self, nodes, from_bus, to_bus, r, x, P, Q, P_gen_limit, Q_gen_limit,
+                 bsh=None, branch_ids=None):
+
+        self.nodes = np.asarray(nodes, dtype=int)
+        self.n_bus = len(self.nodes)
+        self.bus_index = {int(b): k for k, b in enumerate(self.nodes)}
+
+        from_bus = np.asarray(from_bus, dtype=int)
+        to_bus = np.asarray(to_bus, dtype=int)
+        self.n_branch = len(from_bus)
+        if branch_ids is None:
+            branch_ids = np.arange(1, self.n_branch + 1)
+        self.branch_ids = np.asarray(branch_ids, dtype=int)
+
+        # _________ Branch table _________
+        self.from_idx = self.index_of(from_bus)
+        self.to_idx = self.index_of(to_bus)
+        self.r = np.asarray(r, dtype=float)
+        self.x = np.asarray(x, dtype=float)
+        self.bsh = np.zeros(self.n_branch) if bsh is None else np.asarray(bsh, dtype=float)
+
+        # _________ Bus data _________
+        self.P = np.asarray(P, dtype=float)
+        self.Q = np.asarray(Q, dtype=float)
+        self.P_gen_limit = np.asarray(P_gen_limit, dtype=float)
+        self.Q_gen_limit = np.asarray(Q_gen_limit, dtype=float)
+
+        self._build_structure()
+
+    def index_of(self, buses):
+        """ Map bus ids to bus positions """
+        return np.fromiter((self.bus_index[int(b)] for b in np.ravel(buses)), dtype=int,
+                           count=np.size(buses)).reshape(np.shape(buses))
+
+    @staticmethod
+    def _csr(keys, values, n):
+        order = np.argsort(keys, kind='stable')
+        ptr = np.zeros(n + 1, dtype=int)
+        np.cumsum(np.bincount(keys, minlength=n), out=ptr[1:])
+        return ptr, values[order]
+
+    def _build_structure(self):
+        n, branches = self.n_bus, np.arange(self.n_branch)
+
+        self.out_ptr, self.out_branch = self._csr(self.from_idx, branches, n)
+        self.in_ptr, self.in_branch = self._csr(self.to_idx, branches, n)
+
+        ends = np.concatenate([self.from_idx, self.to_idx])
+        others = np.concatenate([self.to_idx, self.from_idx])
+        self.adj_ptr, self.adj_idx = self._csr(ends, others, n)
+        _, self.adj_branch = self._csr(ends, np.concatenate([branches, branches]), n)
+
+        # _________ Tree (parent/child arrays) _________
+        # Root: first bus without incoming branches
+        roots = np.flatnonzero(np.diff(self.in_ptr) == 0)
+        self.root = int(roots[0]) if len(roots) else 0
+
+        # Spanning tree from the root, branches followed from -> to first and
+        # backwards only for buses not reached that way; the first branch
+        # reaching a bus is its parent branch, any other one (a tie) is left out
+        self.parent = np.full(n, -1, dtype=int)
+        self.parent_branch = np.full(n, -1, dtype=int)
+        self.depth = np.zeros(n, dtype=int)
+        order = [self.root]
+        for backwards in (False, True):
+            for k in order:
+                if backwards:
+                    ends = self.adj_branch[self.adj_ptr[k]:self.adj_ptr[k + 1]]
+                    others = self.neighbours(k)
+                else:
+                    ends = self.out_branches(k)
+                    others = self.to_idx[ends]
+                for j, b in zip(others, ends):
+                    if j != self.root and self.parent[j] < 0:
+                        self.parent[j], self.parent_branch[j] = k, b
+                        self.depth[j] = self.depth[k] + 1
+                        order.append(int(j))
+        self.order = np.asarray(order, dtype=int)
+
+        self.tree = np.zeros(self.n_branch, dtype=bool)
+        self.tree[self.parent_branch[self.parent_branch >= 0]] = True
+        fed = np.flatnonzero(self.parent >= 0)
+        self.child_ptr, self.child_idx = self._csr(self.parent[fed], fed, n)
+
+    @property
+    def radial(self):
+        """ True when every branch is in the tree and points away from the root """
+        return bool(self.tree.all()) and bool((self.parent[self.to_idx] == self.from_idx).all())
+
+    # _________ Neighbour lookup _________
+    def out_branches(self, k):
+        return self.out_branch[self.out_ptr[k]:self.out_ptr[k + 1]]
+
+    def in_branches(self, k):
+        return self.in_branch[self.in_ptr[k]:self.in_ptr[k + 1]]
+
+    def children(self, k):
+        return self.child_idx[self.child_ptr[k]:self.child_ptr[k + 1]]
+
+    def neighbours(self, k):
+        return self.adj_idx[self.adj_ptr[k]:self.adj_ptr[k + 1]]
+
+    def branch_list(self):
+        """ List of (from, to) bus ids in branch table order """
+        return list(zip(self.nodes[self.from_idx].tolist(), self.nodes[self.to_idx].tolist()))
+
+    # _________ Admittance matrix _________
+    def admittance(self, shunts=True):
+        """
+        Bus admittance matrix (Ybus) of the branch table
+        ------------------------------------------------
+        Each branch is a pi model: series admittance 1 / (r + jx) and, with
+        shunts, half of bsh (total charging susceptance, same units as
+        1 / x) at each end.
+        ------------------------------------------------
+        Return:
+            'scipy.sparse.csr_matrix' complex n_bus x n_bus, rows / columns
+            by bus position
+        """
+        y = 1 / (self.r + 1j * self.x)
+        half = 0.5j * self.bsh if shunts else np.zeros(self.n_branch)
+        f, t = self.from_idx, self.to_idx
+        return sp.csr_matrix((np.concatenate([y + half, y + half, -y, -y]),
+                              (np.concatenate([f, t, f, t]), np.concatenate([f, t, t, f]))),
+                             shape=(self.n_bus, self.n_bus))
+
+    # _________ Serialization _________
+    _FIELDS = ('nodes', 'branch_ids', 'r', 'x', 'bsh', 'P', 'Q', 'P_gen_limit', 'Q_gen_limit')
+
+    def arrays(self):
+        """ Flat dict of the arrays needed to rebuild the topology """
+        data = {name: getattr(self, name) for name in self._FIELDS}
+        data['from_bus'] = self.nodes[self.from_idx]
+        data['to_bus'] = self.nodes[self.to_idx]
+        return data
+
+    @classmethod
+    def from_arrays(cls, data):
+        """ Rebuild a topology from the output of arrays() (e.g. a loaded .npz) """
+        return cls(data['nodes'], data['from_bus'], data['to_bus'], r=data['r'], x=data['x'],
+                   P=data['P'], Q=data['Q'], P_gen_limit=data['P_gen_limit'],
+                   Q_gen_limit=data['Q_gen_limit'], bsh=data['bsh'], branch_ids=data['branch_ids'])
+
+    # _________ Dict views _________
+    def system_data(self):
+        """
+        Dict view in the format historically returned by NetData
+        --------------------------------------------------------
+        Return:
+            branches, nodes, P, Q, R, X, Pgen_limit, Qgen_limit, Cx
+
+            R, X and Cx behave as dense N x N nested dicts but only store
+            the branch entries.
+        """
+        nodes = self.nodes.tolist()
+        ramos = self.branch_list()
+        branches = dict(zip(self.branch_ids.tolist(), ramos))
+
+        R, X, Cx = {}, {}, {}
+        for (i, j), r, x in zip(ramos, self.r.tolist(), self.x.tolist()):
+            for a, b in ((i, j), (j, i)):
+                R.setdefault(a, {})[b] = r
+                X.setdefault(a, {})[b] = x
+                if r != 0:
+                    Cx.setdefault(a, {})[b] = 1
+
+        def per_bus(values):
+            return dict(zip(nodes, values.tolist()))
+
+        return (branches, nodes, per_bus(self.P), per_bus(self.Q),
+                SparseMatrixView(nodes, R), SparseMatrixView(nodes, X),
+                per_bus(self.P_gen_limit), per_bus(self.Q_gen_limit),
+                SparseMatrixView(nodes, Cx))
+
+
+class SparseMatrixView(MutableMapping):
+    """ Nested dict {i: {j: value}} over all node pairs backed by its nonzero entries """
+
+    def __init__(self, nodes, entries):
+        self._nodes = nodes
+        self._members = set(nodes)
+        self._rows = {i: _SparseRow(nodes, self._members, entries.get(i, {})) for i in nodes}
+
+    def __getitem__(self, i):
+        return self._rows[i]
+
+    def __setitem__(self, i, row):
+        self._rows[i] = _SparseRow(self._nodes, self._members, dict(row))
+
+    def __delitem__(self, i):
+        raise TypeError('Buses can not be removed from the matrix view')
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class _SparseRow(MutableMapping):
+
+    def __init__(self, nodes, members, data):
+        self._nodes = nodes
+        self._members = members
+        self._data = data
+
+    def __getitem__(self, j):
+        if j in self._data:
+            return self._data[j]
+        if j in self._members:
+            return 0
+        raise KeyError(j)
+
+    def __setitem__(self, j, value):
+        if j not in self._members:
+            raise KeyError(j)
+        self._data[j] = value
+
+    def __delitem__(self, j):
+        self._data.pop(j, None)
+
+    def __iter__(self):
+        return iter(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
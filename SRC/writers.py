@@ -0,0 +1,123 @@
+import os
+import json
+import numpy as np
+
+
+class ResultWriter:
+    """
+    Base class of the result writers
+    ------------------------------------------------
+    A writer owns its files in `output_dir` and receives PFResult objects
+    through write(); each result is written one period at a time, so memory
+    does not grow with the horizon or the number of scenarios. `label`
+    (e.g. the scenario name) is added as a 'scenario' column.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, result, label=None):
+        for k in range(len(result.times)):
+            buses, branches = result.period_frames(k)
+            if label is not None:
+                buses.insert(0, 'scenario', label)
+                branches.insert(0, 'scenario', label)
+            self.write_period(buses, branches)
+
+    def write_period(self, buses, branches):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JSONWriter(ResultWriter):
+    """ output.json: a JSON array with one object {"buses": {...}, "branches": {...}} per period """
+
+    def __init__(self, output_dir, filename='output.json'):
+        super().__init__(output_dir)
+        self.path = os.path.join(output_dir, filename)
+        self._file = open(self.path, 'w')
+        self._file.write('[')
+        self._first = True
+
+    @staticmethod
+    def _columns(frame):
+        # NaN is not valid JSON
+        return {name: [None if isinstance(v, float) and np.isnan(v) else v for v in values.tolist()]
+                for name, values in frame.items()}
+
+    def write_period(self, buses, branches):
+        if not self._first:
+            self._file.write(',')
+        self._first = False
+        self._file.write('\n')
+        json.dump({'buses': self._columns(buses), 'branches': self._columns(branches)}, self._file)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write('\n]\n')
+            self._file.close()
+
+
+class CSVWriter(ResultWriter):
+    """ buses.csv and branches.csv, one block of rows appended per period """
+
+    def __init__(self, output_dir):
+        super().__init__(output_dir)
+        self._files = {name: open(os.path.join(output_dir, f'{name}.csv'), 'w', newline='')
+                       for name in ('buses', 'branches')}
+        self._header = True
+
+    def write_period(self, buses, branches):
+        buses.to_csv(self._files['buses'], header=self._header, index=False)
+        branches.to_csv(self._files['branches'], header=self._header, index=False)
+        self._header = False
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+
+class ParquetWriter(ResultWriter):
+    """ buses.parquet and branches.parquet, one row group per period (requires pyarrow) """
+
+    def __init__(self, output_dir):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from error
+        super().__init__(output_dir)
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._writers = {}
+
+    def write_period(self, buses, branches):
+        for name, frame in (('buses', buses), ('branches', branches)):
+            table = self._pa.Table.from_pandas(frame, preserve_index=False)
+            if name not in self._writers:
+                self._writers[name] = self._pq.ParquetWriter(os.path.join(self.output_dir, f'{name}.parquet'), table.schema)
+            self._writers[name].write_table(table)
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+
+WRITERS = {'json': JSONWriter, 'csv': CSVWriter, 'parquet': ParquetWriter}
+
+
+def open_writers(output_dir, formats=('json',)):
+    """ One writer per format ('json', 'csv', 'parquet') in output_dir """
+    unknown = set(formats) - set(WRITERS)
+    if unknown:
+        raise ValueError(f'Unknown output formats {sorted(unknown)}, expected some of {list(WRITERS)}')
+    return [WRITERS[name](output_dir) for name in formats]
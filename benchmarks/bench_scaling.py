@@ -0,0 +1,143 @@
+"""
+Scaling benchmark of SOCP_PF on synthetic radial feeders
+--------------------------------------------------------
+Times every phase of a run (parse, build, solve, extract, write) and its
+peak traced memory for a grid of bus counts and horizon lengths, then
+compares build/parse against a stored baseline. The phases are the ones
+SOCP_PF records in its RunStats, so the benchmark measures the same code
+paths as a normal run (solve goes through resolve()).
+
+    python benchmarks/bench_scaling.py                      # run and compare
+    python benchmarks/bench_scaling.py --update-baseline    # store new baseline
+    python benchmarks/bench_scaling.py --sizes 33 1000 --times 1 96
+
+The solve phase is skipped (reported as null) when the solver is not
+installed; extract then runs on the flat-start point of the model.
+Memory is the peak traced by tracemalloc during the phase (so it includes
+the model already held). Timings are machine dependent: regenerate the
+baseline on the machine that runs the check.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+
+import numpy as np
+import pyomo.opt as po
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'SRC'))
+sys.path.append(HERE)
+
+from model import SOCP_PF
+from synthetic import write_feeder
+
+BASELINE = os.path.join(HERE, 'baseline.json')
+S_BASE, V_BASE = 100, 12.66
+
+# Phases compared against the baseline
+CHECKED = ('parse', 'build')
+
+
+def daily_profile(base_kw, n_times, seed=0):
+    """ Bus x time loads following a smooth daily curve with per-bus noise """
+    rng = np.random.default_rng(seed)
+    curve = 0.6 + 0.4 * np.sin(np.linspace(0, 2 * np.pi, n_times, endpoint=False)) ** 2
+    return base_kw[:, None] * curve[None, :] * rng.uniform(0.9, 1.1, (len(base_kw), n_times))
+
+
+def bench_case(path, n_times, workdir, solver):
+    """ Phases of one run as timed by SOCP_PF itself (RunStats with trace_memory) """
+    # cache_dir=False: parse the workbook, not a cached topology
+    pf = SOCP_PF(path, S_BASE, V_BASE, solver=solver, times=n_times, trace_memory=True, cache_dir=False,
+                 output_dir=os.path.join(workdir, 'out'), output_formats=('json', 'csv'))
+
+    # Traced for the whole run, so the peak of a phase includes the model already held
+    tracemalloc.start()
+    try:
+        pf.load_data()
+        if n_times > 1:
+            kva = S_BASE * 1e3
+            pf.profiles['P'] = daily_profile(pf.topology.P * kva, n_times) / kva
+            pf.profiles['Q'] = daily_profile(pf.topology.Q * kva, n_times, seed=1) / kva
+        pf.build()
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if po.SolverFactory(solver).available(exception_flag=False):
+                pf.resolve()
+            else:
+                pf._results(None, False, False)
+    finally:
+        tracemalloc.stop()
+
+    stats = {name: {'time': record['time'], 'peak_mb': record['peak_mb']} for name, record in pf.stats.phases.items()}
+    stats.setdefault('solve', None)
+    stats['variables'] = pf.stats.counts['variables']
+    stats['constraints'] = pf.stats.counts['constraints']
+    return stats
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance, min_delta=0.05):
+    """
+    List of regressions of the CHECKED phases against the baseline; time
+    differences under `min_delta` seconds are ignored as timer noise
+    """
+    regressions = []
+    for case, stats in results.items():
+        for name in CHECKED:
+            ref = baseline.get(case, {}).get(name)
+            if not ref or not stats.get(name):
+                continue
+            if stats[name]['time'] > max(ref['time'] * (1 + time_tolerance), ref['time'] + min_delta):
+                regressions.append(f"{case} {name}: time {stats[name]['time']:.3f}s > baseline {ref['time']:.3f}s")
+            if stats[name]['peak_mb'] > ref['peak_mb'] * (1 + memory_tolerance):
+                regressions.append(f"{case} {name}: peak {stats[name]['peak_mb']:.1f}MB > baseline {ref['peak_mb']:.1f}MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[33, 330, 3300, 10000])
+    parser.add_argument('--times', type=int, nargs='+', default=[1, 24])
+    parser.add_argument('--solver', default='ipopt')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help='allowed relative slowdown (0.5 = 50%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.2, help='allowed relative memory growth')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='time differences (s) always accepted')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_bus in args.sizes:
+            path = write_feeder(os.path.join(workdir, f'feeder_{n_bus}.xlsx'), n_bus, S_base=S_BASE, V_base=V_BASE)
+            for n_times in args.times:
+                case = f'{n_bus}x{n_times}'
+                results[case] = stats = bench_case(path, n_times, workdir, args.solver)
+                line = '  '.join(f"{name} {stats[name]['time']:7.3f}s/{stats[name]['peak_mb']:7.1f}MB"
+                                 if stats[name] else f'{name}     skipped'
+                                 for name in ('parse', 'build', 'solve', 'extract', 'write'))
+                print(f'{case:>12}  vars {stats["variables"]:>8}  {line}', flush=True)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline to compare with (run with --update-baseline)')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance, args.min_delta)
+    for line in regressions:
+        print('[REGRESSION]', line)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
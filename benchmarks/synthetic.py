@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_feeder(n_bus, S_base=100, V_base=12.66, total_load_pu=0.37, seed=0):
+    """
+    Random radial feeder in the DLIN / DBAR layout read by NetData
+    ------------------------------------------------
+    Bus 1 is the substation; every other bus k hangs from a random earlier
+    bus, which keeps the depth around 2 ln(n). Impedances and loads are
+    drawn in p.u. (IEEE-33-like ratios, total load `total_load_pu` spread
+    over the buses) and written back in the sheet units so that NetData's
+    conversion with the same S_base / V_base returns those p.u. values.
+    ------------------------------------------------
+    Args:
+        n_bus = 'int' number of buses
+        S_base, V_base = bases the feeder is meant to be read with
+        total_load_pu = 'float' total active load in p.u.
+        seed = random seed
+    ------------------------------------------------
+    Return:
+        DLIN, DBAR 'pd.DataFrame'
+    """
+    rng = np.random.default_rng(seed)
+    kva = S_base * 1e3
+    z_base = V_base * V_base / kva
+
+    parent = np.r_[0, [rng.integers(0, k) for k in range(1, n_bus - 1)]]
+    r = rng.uniform(0.005, 0.03, n_bus - 1)
+    x = r * rng.uniform(0.5, 1.5, n_bus - 1)
+
+    P = rng.uniform(0.5, 1.5, n_bus)
+    P[0] = 0.0
+    P *= total_load_pu / P.sum()
+    Q = P * rng.uniform(0.3, 0.6, n_bus)
+
+    DLIN = pd.DataFrame({'Linha': np.arange(1, n_bus),
+                         'De': parent + 1,
+                         'Para': np.arange(2, n_bus + 1),
+                         'R[ohm]': r * z_base,
+                         'X[ohm]': x * z_base,
+                         'Bsh': 0.0})
+
+    P_gen = np.full(n_bus, np.nan)
+    Q_gen = np.full(n_bus, np.nan)
+    P_gen[0] = Q_gen[0] = 10 * total_load_pu * kva
+    DBAR = pd.DataFrame({'Barra': np.arange(1, n_bus + 1),
+                         'Localizacao': np.arange(1, n_bus + 1),
+                         'P[kw]': P * kva,
+                         'Q[kvar]': Q * kva,
+                         'P_Gen': P_gen,
+                         'Q_Gen': Q_gen})
+    return DLIN, DBAR
+
+
+def write_feeder(path, n_bus, **options):
+    """ Write a synthetic_feeder() to an .xlsx readable by NetData """
+    DLIN, DBAR = synthetic_feeder(n_bus, **options)
+    with pd.ExcelWriter(path) as writer:
+        DLIN.to_excel(writer, sheet_name='DLIN', index=False)
+        DBAR.to_excel(writer, sheet_name='DBAR', index=False)
+    return path
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_temporario(tmp_path_factory, monkeypatch):
+    """ Parsed network cache of NetData in a temporary folder, never next to the workbooks """
+    pasta = tmp_path_factory.mktemp('netdata_cache')
+    monkeypatch.setenv('NETDATA_CACHE_DIR', str(pasta))
+    return pasta
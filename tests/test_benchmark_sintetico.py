@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.append('SRC')
+sys.path.append('benchmarks')
+import numpy as np
+from data_handler import NetData
+from sweep import backward_forward_sweep
+from synthetic import synthetic_feeder, write_feeder
+from bench_scaling import compare, bench_case
+
+
+def test_synthetic_feeder_is_radial():
+    DLIN, DBAR = synthetic_feeder(200, seed=3)
+    assert len(DLIN) == 199
+    assert sorted(DLIN['Para']) == list(range(2, 201))
+    assert (DLIN['De'] < DLIN['Para']).all()
+
+def test_synthetic_feeder_round_trip(tmp_path):
+    path = write_feeder(str(tmp_path / 'feeder.xlsx'), 100, S_base=100, V_base=12.66, total_load_pu=0.37)
+    topology = NetData(path, S_base=100, V_base=12.66, cache_dir=False).get_topology()
+
+    assert topology.n_bus == 100
+    assert np.isclose(topology.P.sum(), 0.37)
+    assert ((topology.r >= 0.005) & (topology.r <= 0.03)).all()
+
+    sweep = backward_forward_sweep(topology, topology.P, topology.Q)
+    assert sweep['converged']
+    assert np.sqrt(sweep['V']).min() > 0.95
+
+def test_compare_flags_regressions():
+    baseline = {'33x1': {'parse': {'time': 1.0, 'peak_mb': 10.0}, 'build': {'time': 1.0, 'peak_mb': 10.0}}}
+    ok = {'33x1': {'parse': {'time': 1.2, 'peak_mb': 10.5}, 'build': {'time': 0.5, 'peak_mb': 9.0}}}
+    slow = {'33x1': {'parse': {'time': 1.0, 'peak_mb': 10.0}, 'build': {'time': 2.0, 'peak_mb': 13.0}}}
+
+    assert compare(ok, baseline, 0.5, 0.2) == []
+    regressions = compare(slow, baseline, 0.5, 0.2)
+    assert len(regressions) == 2
+    assert all('build' in line for line in regressions)
+
+def test_bench_case_leaves_user_cache_alone(tmp_path, cache_temporario):
+    (cache_temporario / 'outro.npz').write_bytes(b'')
+    path = write_feeder(str(tmp_path / 'feeder.xlsx'), 20, S_base=100, V_base=12.66)
+    stats = bench_case(path, 1, str(tmp_path), 'ipopt')
+    assert stats['parse']['time'] > 0 and stats['variables'] > 0
+    assert os.listdir(cache_temporario) == ['outro.npz']
@@ -0,0 +1,87 @@
+import sys
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('SRC')
+import numpy as np
+import pandas as pd
+from data_handler import NetData
+
+
+def copia_planilha(tmp_path):
+    path = str(tmp_path / 'teste.xlsx')
+    shutil.copy('DATA/teste.xlsx', path)
+    return path
+
+def test_cache_hit_does_not_open_workbook(tmp_path):
+    path = copia_planilha(tmp_path)
+    first = NetData(path, cache_dir=str(tmp_path / 'cache')).get_topology()
+
+    obj = NetData(path, cache_dir=str(tmp_path / 'cache'))
+    cached = obj.get_topology()
+    assert obj._data is None
+    assert np.allclose(cached.r, first.r)
+    assert np.allclose(cached.P, first.P)
+    assert cached.branch_list() == first.branch_list()
+
+def test_cache_keyed_by_bases(tmp_path):
+    path = copia_planilha(tmp_path)
+    a = NetData(path, S_base=100, cache_dir=str(tmp_path / 'cache')).get_topology()
+    b = NetData(path, S_base=10, cache_dir=str(tmp_path / 'cache')).get_topology()
+    assert np.isclose(b.P[1], 10 * a.P[1])
+    assert len(os.listdir(tmp_path / 'cache')) == 2
+
+def test_cache_invalidated_when_workbook_changes(tmp_path):
+    path = copia_planilha(tmp_path)
+    NetData(path, cache_dir=str(tmp_path / 'cache')).get_topology()
+
+    sheets = pd.read_excel(path, sheet_name=None)
+    sheets['DBAR'].iloc[1, 2] = -20000
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+    topo = NetData(path, cache_dir=str(tmp_path / 'cache')).get_topology()
+    assert np.isclose(topo.P[1], -0.2)
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+
+def test_cache_disabled(tmp_path):
+    path = copia_planilha(tmp_path)
+    topo = NetData(path, cache_dir=False).get_topology()
+    assert topo.n_bus == 2
+    assert os.listdir(tmp_path) == ['teste.xlsx']
+
+def test_default_cache_outside_workbook_folder(tmp_path, monkeypatch, cache_temporario):
+    path = copia_planilha(tmp_path)
+    # conftest points NETDATA_CACHE_DIR at a temporary folder
+    NetData(path).get_topology()
+    assert len(os.listdir(cache_temporario)) == 1
+    assert os.listdir(tmp_path) == ['teste.xlsx']
+
+    monkeypatch.delenv('NETDATA_CACHE_DIR')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'usuario'))
+    assert NetData(path).cache_dir == str(tmp_path / 'usuario' / 'socp_pf' / 'netdata')
+
+def test_same_named_workbooks_kept_apart(tmp_path, cache_temporario):
+    outra = tmp_path / 'outra'
+    outra.mkdir()
+    NetData(copia_planilha(tmp_path)).get_topology()
+    NetData(copia_planilha(outra)).get_topology()
+    assert len(os.listdir(cache_temporario)) == 2
+
+def test_corrupted_entry_parses_workbook(tmp_path):
+    path = copia_planilha(tmp_path)
+    obj = NetData(path, cache_dir=str(tmp_path / 'cache'))
+    first = obj.get_topology()
+    with open(obj.cache_path(), 'r+b') as f:
+        f.truncate(100)
+    topo = NetData(path, cache_dir=str(tmp_path / 'cache')).get_topology()
+    assert np.allclose(topo.r, first.r)
+
+def test_concurrent_writers_leave_one_entry(tmp_path):
+    path = copia_planilha(tmp_path)
+    with ThreadPoolExecutor(4) as pool:
+        topos = list(pool.map(lambda _: NetData(path, cache_dir=str(tmp_path / 'cache')).get_topology(), range(8)))
+    assert all(np.allclose(t.r, topos[0].r) for t in topos)
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+    assert NetData(path, cache_dir=str(tmp_path / 'cache')).get_topology().n_bus == 2
@@ -0,0 +1,59 @@
+import sys
+sys.path.append('SRC')
+import numpy as np
+import pytest
+import pyomo.environ as pe
+import scenarios
+from model import SOCP_PF
+from scenarios import ScenarioBatch, monte_carlo_scenarios
+
+
+def test_monte_carlo_scenarios():
+    batch = ScenarioBatch('DATA/teste.xlsx', S_base=100, V_base=13.8, workers=1)
+    cenarios = monte_carlo_scenarios(batch.topology, 5, S_base=100, seed=1)
+    assert len(cenarios) == 5
+    assert all(c['P'].shape == (2,) for c in cenarios)
+    assert all(c['dg_bus'] == 2 for c in cenarios)
+
+def test_scenarios_start_from_base_case():
+    batch = ScenarioBatch('DATA/teste.xlsx', S_base=100, V_base=13.8, workers=1)
+    scenarios._init_worker(batch.topology, batch.profiles, 100, 13.8, 'ipopt')
+    scenarios._run_scenario({'name': 'a', 'P': [0, -10e3]})
+    scenarios._run_scenario({'name': 'b', 'load_scale': 2})
+    modelo = scenarios._WORKER.modelo
+    assert round(modelo.P[2,0].value, 6) == -0.8
+
+def test_reset_profiles_to_snapshot():
+    batch = ScenarioBatch('DATA/teste.xlsx', S_base=100, V_base=13.8, workers=1)
+    PF = SOCP_PF.from_data(batch.topology, batch.profiles, 100, 13.8, engine='sweep')
+    PF.snapshot_profiles()
+    perfil = np.array([[0.0], [-0.1]])
+    PF.set_profiles({'P': perfil})
+    PF.update_loads(P={2: -30e3})
+    # The caller's array is never written
+    assert perfil[1, 0] == -0.1 and PF.profiles['P'][1, 0] == -0.3
+
+    PF.reset_profiles(load_scale=2)
+    assert np.allclose(PF.profiles['P'], 2 * batch.profiles['P'])
+    assert np.array_equal(PF.profiles['P_gen_limit'], batch.profiles['P_gen_limit'])
+
+@pytest.mark.skipif(not pe.SolverFactory('ipopt').available(exception_flag=False), reason='IPOPT not installed')
+def test_batch_table():
+    batch = ScenarioBatch('DATA/teste.xlsx', S_base=100, V_base=13.8, workers=2)
+    table = batch.run([{'name': 'base'}, {'name': 'dobro', 'load_scale': 2}])
+    assert list(table['name']) == ['base', 'dobro']
+    assert (table['status'] == 'ok').all()
+    base, dobro = table.set_index('name').loc[['base', 'dobro']].to_dict('records')
+    # Twice the load: more losses and a deeper voltage drop at bus 2
+    assert 0 < base['losses'] < dobro['losses']
+    assert dobro['V_min'] < base['V_min'] < 1 and base['V_min_bus'] == dobro['V_min_bus'] == 2
+
+def test_summary_objective_per_period():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=3, engine='sweep')
+    PF.load_data()
+    PF.set_profiles({'P': PF.profiles['P'] * np.array([1.0, 2.0, 3.0])})
+    resultado = PF.resolve()
+    linhas = scenarios._summary(resultado)
+    # Summed over the periods, the per-period terms give the objective once
+    assert sum(l['objective'] for l in linhas) == pytest.approx(resultado.objective)
+    assert linhas[0]['objective'] > linhas[1]['objective'] > linhas[2]['objective']
@@ -0,0 +1,96 @@
+import sys
+sys.path.append('SRC')
+import numpy as np
+import pytest
+import pyomo.environ as pe
+from model import SOCP_PF, VARIABLES
+import conic
+from conic import conic_form, get_backend, register_backend, ConicBackend, ConicSolution
+from topology import Topology
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def test_conic_form_matches_pyomo_model():
+    topo = alimentador_radial(20)
+    profiles = perfis(topo)
+    problema = conic_form(topo, profiles)
+    assert problema.A.shape == ((3 * 20 + 19) * 2, (3 * 19 + 4 * 20) * 2)
+    assert problema.rotated_cones.shape == (19 * 2, 4)
+
+    # Same residuals as the Pyomo constraints at an arbitrary point
+    x = np.random.default_rng(3).normal(size=problema.n)
+    PF = SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8)
+    PF.build()
+    PF.set_initial_point(problema.values(x))
+    residuos = problema.row_values(problema.A @ x - problema.b)
+    for name, values in residuos.items():
+        restricao = getattr(PF.modelo, name)
+        pyomo = np.array([pe.value(c.body) - pe.value(c.upper) for c in restricao.values()]).reshape(values.shape)
+        assert np.allclose(values, pyomo)
+
+    u, v, w1, w2 = problema.rotated_cones.T
+    cone = np.array([pe.value(c.body) for c in PF.modelo.branch_flow.values()])
+    assert np.allclose(x[w1] ** 2 + x[w2] ** 2 - x[u] * x[v], cone)
+    assert np.allclose(problema.c @ x, pe.value(PF.modelo.objective))
+
+def test_standard_form_cones():
+    topo = alimentador_radial(10)
+    problema = conic_form(topo, perfis(topo, (1.0,)))
+    A_eq, b_eq, G, h, n_nonneg, n_soc = problema.standard_form()
+    assert G.shape[0] == n_nonneg + 4 * n_soc
+
+    x = np.abs(np.random.default_rng(0).normal(size=problema.n))
+    s = (h - G @ x)[n_nonneg:].reshape(-1, 4)
+    u, v, w1, w2 = problema.rotated_cones.T
+    dentro = np.linalg.norm(s[:, 1:], axis=1) <= s[:, 0]
+    assert np.array_equal(dentro, x[u] * x[v] >= x[w1] ** 2 + x[w2] ** 2)
+
+def test_backend_registry():
+    with pytest.raises(ValueError):
+        get_backend('inexistente')
+
+    class Varredura(ConicBackend):
+        """ 'Solves' the relaxation with the sweep solution """
+        def solve(self, problem, **options):
+            return ConicSolution(self.x, None, 'sweep', True)
+
+    topo = alimentador_radial(10)
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8)
+    valores = PF.sweep()
+    Varredura.x = np.concatenate([valores[name].ravel() for name in VARIABLES])
+    register_backend('varredura', Varredura)
+    try:
+        PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, solver='varredura', engine='conic')
+        resultado = PF.resolve()
+    finally:
+        del conic.BACKENDS['varredura']
+    assert resultado.converged
+    assert np.allclose(resultado.V ** 2, valores['V'].T)
+    assert PF.stats.counts['constraints'] == PF.conic.A.shape[0] + 9 * 2
+
+def test_conic_engine_solves_relaxation():
+    pytest.importorskip('clarabel')
+    topo = alimentador_radial(30)
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, engine='conic')
+    resultado = PF.resolve()
+    assert resultado.converged
+    # Relaxation is exact and the losses are the ones of the power flow
+    u, v, w1, w2 = PF.conic.rotated_cones.T
+    x = PF.solver_result.x
+    assert np.abs(x[u] * x[v] - x[w1] ** 2 - x[w2] ** 2).max() < 1e-6
+    assert resultado.V.max() <= 1.05 + 1e-6
+    assert np.all(resultado.losses > 0)
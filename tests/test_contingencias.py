@@ -0,0 +1,173 @@
+import sys
+sys.path.append('SRC')
+import numpy as np
+import pytest
+import pandas as pd
+import pyomo.environ as pe
+import pyomo.opt as po
+from types import SimpleNamespace
+from topology import Topology
+from model import SOCP_PF
+from data_handler import NetData
+import contingency
+from contingency import ContingencyScreening, energized_buses, n_minus_1_cases
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def alimentador_com_interligacao():
+    """ Two laterals 1-2-3-4 and 1-5-6-7 with the tie 4-7 (normally open) """
+    P = np.r_[0, 0.1, 0.1, 0.1, 0.3, 0.3, 0.2]
+    return Topology(range(1, 8), [1, 2, 3, 1, 5, 6, 4], [2, 3, 4, 5, 6, 7, 7],
+                    r=np.full(7, 0.02), x=np.full(7, 0.02), P=P, Q=0.5 * P,
+                    P_gen_limit=np.r_[10, np.zeros(6)], Q_gen_limit=np.r_[10, np.zeros(6)])
+
+def planilha_com_interligacao(path):
+    """ alimentador_com_interligacao() written in the DLIN / DBAR layout, tie row last """
+    topo = alimentador_com_interligacao()
+    kva, z_base = 100e3, 13.8 ** 2 / 100e3
+    DLIN = pd.DataFrame({'Linha': range(1, 8), 'De': topo.nodes[topo.from_idx], 'Para': topo.nodes[topo.to_idx],
+                         'R[ohm]': topo.r * z_base, 'X[ohm]': topo.x * z_base, 'Bsh': 0.0})
+    DBAR = pd.DataFrame({'Barra': topo.nodes, 'Localizacao': topo.nodes, 'P[kw]': topo.P * kva, 'Q[kvar]': topo.Q * kva,
+                         'P_Gen': topo.P_gen_limit * kva, 'Q_Gen': topo.Q_gen_limit * kva})
+    with pd.ExcelWriter(path) as writer:
+        DLIN.to_excel(writer, sheet_name='DLIN', index=False)
+        DBAR.to_excel(writer, sheet_name='DBAR', index=False)
+    return path
+
+def test_tie_read_from_workbook(tmp_path):
+    path = planilha_com_interligacao(str(tmp_path / 'interligacao.xlsx'))
+    topo = NetData(path, S_base=100, V_base=13.8).get_topology()
+    assert topo.nodes.tolist() == list(range(1, 8))
+    assert np.allclose(topo.P, alimentador_com_interligacao().P)
+
+    # The tie closes a loop: left out of the tree, bus 7 stays fed by 6
+    assert [b for b, t in zip(topo.branch_list(), topo.tree) if not t] == [(4, 7)]
+    assert topo.nodes[topo.parent[topo.index_of(7)]] == 6
+    assert sorted(topo.nodes[topo.order].tolist()) == list(range(1, 8))
+    assert not topo.radial
+
+    pytest.importorskip('clarabel')
+    PF = SOCP_PF(path, S_base=100, V_base=13.8, engine='conic')
+    triagem = ContingencyScreening(PF, normally_open=[(4, 7)], workers=1)
+    tabela = triagem.run([{'name': 'transferencia', 'open': [(1, 2)], 'close': [(4, 7)]}])
+    assert tabela.loc[0, 'status'] == 'ok'
+    assert tabela.loc[0, 'islanded_buses'] == 0 and tabela.loc[0, 'load_shed'] == 0
+
+def test_islands_and_switching_state():
+    topo = alimentador_com_interligacao()
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, engine='conic')
+    triagem = ContingencyScreening(PF, normally_open=[(4, 7)])
+
+    aberto, desligado = triagem.case_state({'open': [(2, 3)]})
+    assert topo.nodes[desligado].tolist() == [3, 4]
+    assert [b for b, a in zip(topo.branch_list(), aberto) if a] == [(2, 3), (3, 4), (4, 7)]
+
+    aberto, desligado = triagem.case_state({'open': [(2, 3)], 'close': [(4, 7)]})
+    assert not desligado.any() and aberto.sum() == 1
+    with pytest.raises(ValueError):
+        triagem.case_state({'close': [(1, 2)]})
+
+    # An island with generation is only kept with dg_islands
+    profiles = perfis(topo)
+    profiles['P_gen_limit'][3] = 1.0
+    aberto = np.array([b in ((2, 3), (4, 7)) for b in topo.branch_list()])
+    assert not energized_buses(topo, aberto)[3]
+    assert energized_buses(topo, aberto, profiles)[3]
+
+def test_pyomo_case_switches_incrementally():
+    topo = alimentador_radial(10)
+    contingency._init_worker(topo, perfis(topo), 100, 13.8, 'ipopt', 'socp', (0.95, 1.05), (0.9, 1.05))
+    caso = contingency._WORKER
+    m = caso.pf.modelo
+    assert m.V[2, 0].ub == pytest.approx(1.05 ** 2) and m.V[2, 0].lb == pytest.approx(0.81)
+
+    i, j = topo.branch_list()[4]
+    aberto = np.arange(topo.n_branch) == 4
+    desligado = np.zeros(topo.n_bus, dtype=bool)
+    desligado[topo.index_of([j])] = True
+    caso.apply(aberto, desligado)
+    assert m.I[i, j, 1].fixed and m.I[i, j, 1].value == 0
+    assert not m.voltage_drop[i, j, 0].active and not m.branch_flow[i, j, 1].active
+    assert m.V[j, 0].fixed and not m.active_power[j, 1].active
+    assert sum(v.fixed for v in m.component_data_objects(pe.Var)) == 2 * (3 + 4)
+
+    caso.apply(np.zeros_like(aberto), np.zeros_like(desligado))
+    assert not any(v.fixed for v in m.component_data_objects(pe.Var))
+    assert all(c.active for c in m.component_data_objects(pe.Constraint))
+
+class SolverGravador:
+    """ Stands in for IPOPT: records the options and the suffixes it would receive """
+
+    def __init__(self):
+        self.options = {}
+        self.chamadas = []
+
+    def solve(self, modelo, logfile=None):
+        self.chamadas.append({'options': dict(self.options),
+                              'dual': [modelo.dual.get(c) for c in modelo.active_power.values()],
+                              'zL': [modelo.ipopt_zL_in.get(v) for v in modelo.V.values()]})
+        for v in modelo.component_data_objects(pe.Var):
+            if v.value is None:
+                v.set_value(0, skip_validation=True)
+        for c in modelo.active_power.values():
+            modelo.dual[c] = 2.0
+        for v in modelo.V.values():
+            modelo.ipopt_zL_out[v] = 0.5
+        return SimpleNamespace(solver=SimpleNamespace(status=po.SolverStatus.ok))
+
+def test_pyomo_cases_warm_started_from_base():
+    topo = alimentador_radial(10)
+    contingency._init_worker(topo, perfis(topo), 100, 13.8, 'ipopt', 'socp', (0.95, 1.05), (0.9, 1.05))
+    solver = contingency._WORKER.pf._opt = SolverGravador()
+    base, valores = contingency._solve_case((np.zeros(topo.n_branch, bool), np.zeros(topo.n_bus, bool)))
+    multiplicadores = contingency._WORKER.multipliers()
+    assert 'warm_start_init_point' not in solver.chamadas[0]['options']
+
+    # A worker of the cases gets the base-case point and multipliers
+    contingency._init_worker(topo, perfis(topo), 100, 13.8, 'ipopt', 'socp', (0.95, 1.05), (0.9, 1.05),
+                             valores, multiplicadores)
+    solver = contingency._WORKER.pf._opt = SolverGravador()
+    aberto = np.arange(topo.n_branch) == 4
+    assert contingency._run_case((aberto, np.zeros(topo.n_bus, bool)))['status'] == 'ok'
+    chamada = solver.chamadas[0]
+    assert chamada['options']['warm_start_init_point'] == 'yes'
+    m = contingency._WORKER.pf.modelo
+    assert chamada['dual'] == [2.0] * len(m.active_power)
+    assert chamada['zL'] == [0.5] * len(m.V)
+
+def test_failed_case_keeps_columns():
+    topo = alimentador_radial(10)
+    contingency._init_worker(topo, perfis(topo), 100, 13.8, 'no_such_solver', 'socp', (0.95, 1.05), (0.9, 1.05))
+    registro = contingency._run_case((np.zeros(topo.n_branch, bool), np.zeros(topo.n_bus, bool)))
+    assert registro['status'].startswith('error') and np.isnan(registro['losses'])
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_screening_ranking(workers):
+    pytest.importorskip('clarabel')
+    topo = alimentador_com_interligacao()
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, engine='conic')
+    triagem = ContingencyScreening(PF, normally_open=[(4, 7)], workers=workers)
+    casos = n_minus_1_cases(topo, [(2, 3), (6, 7)]) + [{'name': 'transferencia', 'open': [(1, 2)], 'close': [(4, 7)]}]
+    tabela = triagem.run(casos)
+
+    assert triagem.base['voltage_violation'] == 0
+    assert tabela['rank'].tolist() == [1, 2, 3]
+    # Feeding the first lateral through the tie is the most severe case
+    assert tabela.loc[0, 'name'] == 'transferencia'
+    assert tabela.loc[0, 'voltage_violation'] > 0 and tabela.loc[0, 'loss_increase'] > 0
+    assert tabela.loc[0, 'islanded_buses'] == 0
+    assert tabela.set_index('name').loc['2-3', 'load_shed'] == pytest.approx(2 * 0.1 * 100 * 1.5)
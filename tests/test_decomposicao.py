@@ -0,0 +1,79 @@
+import sys
+sys.path.append('SRC')
+import contextlib
+import io
+import numpy as np
+import pytest
+from pyomo.core.expr import polynomial_degree
+from model import SOCP_PF
+from decomposition import ADMMDecomposition, split_tree, choose_boundaries, area_specs, _Area
+from topology import Topology
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def test_split_tree_partitions_feeder():
+    topo = alimentador_radial(40, seed=2)
+    fronteiras = choose_boundaries(topo, 3)
+    areas = split_tree(topo, fronteiras)
+    assert len(areas) == len(fronteiras) + 1
+
+    barras = np.concatenate([a['buses'] for a in areas])
+    ramos = np.concatenate([a['branches'] for a in areas])
+    assert sorted(barras.tolist()) == list(range(topo.n_bus))
+    assert sorted(ramos.tolist()) == list(range(topo.n_branch))
+    # Every boundary bus is the root of one area and a leaf copy in another
+    copias = np.concatenate([a['copies'] for a in areas])
+    assert sorted(copias.tolist()) == sorted(topo.index_of(fronteiras).tolist())
+    assert [a['root'] for a in areas[1:]] == topo.index_of(fronteiras).tolist()
+
+    with pytest.raises(ValueError):
+        split_tree(topo, [topo.nodes[topo.root]])
+
+def test_boundary_with_generation_rejected():
+    topo = alimentador_radial(20)
+    profiles = perfis(topo)
+    profiles['P_gen_limit'][5] = 1.0
+    with pytest.raises(ValueError):
+        area_specs(topo, profiles, [int(topo.nodes[5])])
+
+def test_pyomo_area_objective():
+    topo = alimentador_radial(20)
+    spec = area_specs(topo, perfis(topo), choose_boundaries(topo, 2))[1]
+    area = _Area(spec, 100, 13.8, 'ipopt', 'socp')
+    m = area.pf.modelo
+    assert not m.objective.active
+    assert polynomial_degree(m.admm_objective.expr) == 2
+    raiz = spec['topology'].nodes[spec['artificial'][-1]]
+    assert m.Pgen[raiz, 0].lb is None and m.Pgen[raiz, 0].ub is None
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_admm_matches_single_model(workers):
+    pytest.importorskip('clarabel')
+    topo = alimentador_radial(60, seed=2)
+    profiles = perfis(topo)
+    referencia = SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8, engine='conic')
+    with contextlib.redirect_stdout(io.StringIO()):
+        esperado = referencia.resolve()
+
+    admm = ADMMDecomposition.from_model(referencia, choose_boundaries(topo, 3), workers=workers)
+    resultado = admm.run(tol=1e-5)
+    assert resultado.converged
+    assert resultado.engine == 'admm'
+    assert list(admm.history.columns[:3]) == ['iteration', 'primal_residual', 'dual_residual']
+    desvio = admm.deviation(esperado)
+    assert desvio['V'] < 1e-4
+    assert desvio['objective'] < 1e-3
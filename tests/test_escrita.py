@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+sys.path.append('SRC')
+import pandas as pd
+import pytest
+from model import SOCP_PF
+from results import PFResult
+from writers import JSONWriter
+
+
+def test_no_output_by_default(tmp_path, monkeypatch):
+    dados = os.path.abspath('DATA/teste.xlsx')
+    monkeypatch.chdir(tmp_path)
+    SOCP_PF(dados, S_base=100, V_base=13.8, engine='sweep').solve()
+    assert os.listdir(tmp_path) == []
+
+def test_json_and_csv_writers(tmp_path):
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=3, engine='sweep',
+                 output_dir=str(tmp_path), output_formats=('json', 'csv'))
+    resultado = PF.solve()
+
+    with open(tmp_path / 'output.json') as f:
+        periodos = json.load(f)
+    assert len(periodos) == 3
+    assert periodos[2]['buses']['V'] == resultado.V[2].tolist()
+    assert periodos[0]['branches']['from'] == [1]
+
+    barras = pd.read_csv(tmp_path / 'buses.csv')
+    ramos = pd.read_csv(tmp_path / 'branches.csv')
+    assert len(barras) == 3 * 2
+    assert len(ramos) == 3 * 1
+    assert not os.path.exists(tmp_path / 'resolution.txt')
+
+def test_parquet_writer(tmp_path):
+    pytest.importorskip('pyarrow')
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=2, engine='sweep',
+                 output_dir=str(tmp_path), output_formats=('parquet',))
+    PF.solve()
+    assert len(pd.read_parquet(tmp_path / 'buses.parquet')) == 4
+
+def test_writer_labels_scenarios(tmp_path):
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep')
+    resultado = PF.solve()
+    with JSONWriter(str(tmp_path)) as writer:
+        writer.write(resultado, label='a')
+        writer.write(resultado, label='b')
+    with open(tmp_path / 'output.json') as f:
+        periodos = json.load(f)
+    assert [p['buses']['scenario'][0] for p in periodos] == ['a', 'b']
+
+def test_model_dump_only_when_requested(tmp_path):
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, output_dir=str(tmp_path), dump_model=True)
+    PF.build()
+    PF.write_results(PFResult.from_values(PF._model_values(), PF.topology, PF.times, 100, converged=False))
+    assert os.path.exists(tmp_path / 'resolution.txt')
+    with pytest.raises(ValueError):
+        SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, dump_model=True)
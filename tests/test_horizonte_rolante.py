@@ -0,0 +1,84 @@
+import sys
+sys.path.append('SRC')
+import contextlib
+import io
+import numpy as np
+import pytest
+from model import SOCP_PF
+from rolling import RollingHorizon, _shifted
+from topology import Topology
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis_diarios(topo, T):
+    escala = 1 + 0.5 * np.sin(np.arange(T) / 4)
+    return {'P': topo.P[:, None] * escala, 'Q': topo.Q[:, None] * escala,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], T, axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], T, axis=1)}
+
+def test_windows_cover_horizon():
+    topo = alimentador_radial(10)
+    PF = SOCP_PF.from_data(topo, perfis_diarios(topo, 30), S_base=100, V_base=13.8)
+    janelas = list(RollingHorizon(PF, window=8, overlap=3).windows())
+    assert [(inicio, p['P'].shape[1], k) for inicio, p, k in janelas] == \
+           [(0, 8, (0, 5)), (5, 8, (0, 5)), (10, 8, (0, 5)), (15, 8, (0, 5)), (20, 8, (0, 5)), (22, 8, (3, 8))]
+    assert np.array_equal(janelas[-1][1]['P'], PF.profiles['P'][:, 22:])
+
+    # Horizon shorter than the window: a single window
+    assert [(inicio, k) for inicio, _, k in RollingHorizon(PF, window=50).windows()] == [(0, (0, 30))]
+    with pytest.raises(ValueError):
+        RollingHorizon(PF, window=4, overlap=4)
+
+def test_persistent_model_swaps_profiles():
+    topo = alimentador_radial(10)
+    perfis = perfis_diarios(topo, 12)
+    PF = SOCP_PF.from_data(topo, {k: v[:, :4] for k, v in perfis.items()}, S_base=100, V_base=13.8)
+    modelo = PF.build()
+    PF.set_profiles({'P': perfis['P'][:, 4:8]})
+    assert PF.modelo is modelo
+    assert modelo.P[3, 2].value == pytest.approx(perfis['P'][2, 6])
+    with pytest.raises(ValueError):
+        PF.set_profiles({'P': perfis['P']})
+
+def test_shifted_initial_point():
+    anterior = {'V': np.arange(8.0).reshape(1, 8)}
+    assert _shifted(anterior, 5)['V'].tolist() == [[5, 6, 7, 7, 7, 7, 7, 7]]
+    assert _shifted(anterior, 0)['V'].tolist() == anterior['V'].tolist()
+
+@pytest.mark.parametrize('engine', ['sweep', 'conic'])
+def test_stitched_result_matches_single_model(engine):
+    if engine == 'conic':
+        pytest.importorskip('clarabel')
+    topo = alimentador_radial(20, seed=3)
+    perfis = perfis_diarios(topo, 30)
+    with contextlib.redirect_stdout(io.StringIO()):
+        inteiro = SOCP_PF.from_data(topo, perfis, S_base=100, V_base=13.8, engine=engine).resolve()
+        horizonte = RollingHorizon(SOCP_PF.from_data(topo, perfis, S_base=100, V_base=13.8, engine=engine),
+                                   window=8, overlap=3)
+        resultado = horizonte.run()
+
+    assert resultado.times == list(range(30))
+    assert resultado.converged
+    assert np.allclose(resultado.V, inteiro.V, atol=1e-4)
+    assert np.allclose(resultado.Pgen, inteiro.Pgen, atol=1e-4)
+    assert horizonte.history['committed'].sum() == 30
+    assert len(horizonte.stats) == len(horizonte.history) == 6
+
+def test_streamed_horizon(tmp_path):
+    P = np.c_[np.zeros(50), np.linspace(-5e3, -20e3, 50)]
+    np.save(tmp_path / 'P.npy', P)
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep', times=40,
+                 profiles={'P': str(tmp_path / 'P.npy')}, output_dir=str(tmp_path / 'out'))
+    resultado = RollingHorizon(PF, window=12, overlap=2).run(stitch=False)
+    assert resultado is None
+    assert PF.profiles['P'].shape == (2, 12)
+    with open(tmp_path / 'out' / 'output.json') as f:
+        assert f.read().count('"buses"') == 40
@@ -0,0 +1,79 @@
+import sys
+sys.path.append('SRC')
+import logging
+from model import SOCP_PF
+from scenarios import ScenarioBatch
+from instrumentation import RunStats, parse_ipopt_log, flat_stats, aggregate_stats
+
+LOG_IPOPT = """
+Number of Iterations....: 12
+
+                                   (scaled)                 (unscaled)
+Objective...............:   1.0000000000000000e+00    1.0000000000000000e+00
+
+Total seconds in IPOPT                               = 0.031
+
+EXIT: Optimal Solution Found.
+"""
+
+LOG_IPOPT_ANTIGO = """
+Number of Iterations....: 7
+Total CPU secs in IPOPT (w/o function evaluations)   =      0.020
+Total CPU secs in NLP function evaluations           =      0.005
+
+EXIT: Optimal Solution Found.
+"""
+
+
+def test_parse_ipopt_log():
+    assert parse_ipopt_log(LOG_IPOPT) == {'iterations': 12, 'solver_time': 0.031, 'exit': 'Optimal Solution Found.'}
+    antigo = parse_ipopt_log(LOG_IPOPT_ANTIGO)
+    assert antigo['iterations'] == 7
+    assert abs(antigo['solver_time'] - 0.025) < 1e-12
+    assert parse_ipopt_log('') == {}
+
+def test_build_records_phases_and_counts():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=3)
+    PF.build()
+    assert set(PF.stats.phases) == {'parse', 'build'}
+    assert PF.stats.phases['build']['time'] > 0
+    counts = PF.stats.counts
+    assert counts['variables'] == PF.modelo.nvariables() == 3 * (3 * 1 + 4 * 2)
+    assert counts['constraints'] == PF.modelo.nconstraints()
+    assert (counts['buses'], counts['branches'], counts['times']) == (2, 1, 3)
+
+def test_result_stats_and_hooks(tmp_path, caplog):
+    chamadas = []
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep', output_dir=str(tmp_path),
+                 trace_memory=True, hooks=[lambda phase, record: chamadas.append(phase)])
+    with caplog.at_level(logging.DEBUG, logger='socp_pf'):
+        resultado = PF.solve()
+
+    assert chamadas == ['parse', 'solve', 'solver', 'extract', 'write']
+    assert set(resultado.stats['phases']) == {'parse', 'solve', 'extract', 'write'}
+    assert resultado.stats['phases']['solve']['peak_mb'] >= 0
+    assert resultado.stats['solver']['iterations'] >= 1
+    assert any(r.message.startswith('solve:') for r in caplog.records)
+
+def test_aggregate_stats():
+    runs = []
+    for k in range(3):
+        stats = RunStats()
+        with stats.phase('solve'):
+            pass
+        stats.set_solver(iterations=10 + k, solver_time=0.0)
+        runs.append(stats if k else stats.as_dict())
+    assert flat_stats(runs[1])['iterations'] == 11
+
+    summary = aggregate_stats(runs)
+    assert summary.loc['iterations', 'count'] == 3
+    assert summary.loc['iterations', 'total'] == 33
+    assert summary.loc['iterations', 'max'] == 12
+    assert 'solve_time' in summary.index
+
+def test_batch_keeps_stats_per_scenario():
+    batch = ScenarioBatch('DATA/teste.xlsx', S_base=100, V_base=13.8, workers=1)
+    batch.run([{'name': 'base'}, {'name': 'dobro', 'load_scale': 2}])
+    assert len(batch.stats) == 2
+    assert all('build' not in stats['phases'] for stats in batch.stats)
+    assert batch.stats_summary().index.size > 0
@@ -1,5 +1,6 @@
 import sys
 sys.path.append('SRC')
+import numpy as np
 from data_handler import NetData
 
 
@@ -53,4 +54,43 @@ def test_convert_ohm_pu():
     tol = 1e-3
     erro = abs(0.19999999999999996 - pu[1][1])    
     print(pu)
-    assert erro < tol
\ No newline at end of file
+    assert erro < tol
+
+def test_get_topology():
+    topo = NetData('DATA/teste.xlsx').get_topology()
+    assert topo.n_bus == 2
+    assert topo.branch_list() == [(1,2)]
+    assert round(topo.r[0], 2) == 0.2
+    assert round(topo.x[0], 2) == 1
+    assert list(topo.P) == [0, -0.4]
+    assert list(topo.parent) == [-1, 0]
+
+def test_topology_neighbour_lists():
+    from topology import Topology
+    #     1 - 2 - 3
+    #         |
+    #         4 - 5
+    topo = Topology([1,2,3,4,5], [1,2,2,4], [2,3,4,5], r=[1,2,3,4], x=[1,1,1,1],
+                    P=[0,1,1,1,1], Q=[0,0,0,0,0], P_gen_limit=[1,0,0,0,0], Q_gen_limit=[1,0,0,0,0])
+    assert list(topo.children(1)) == [2,3]
+    assert sorted(topo.neighbours(1)) == [0,2,3]
+    assert list(topo.in_branches(4)) == [3]
+    assert list(topo.parent) == [-1,0,1,1,3]
+    assert list(topo.depth) == [0,1,2,2,3]
+    assert list(topo.order) == [0,1,2,3,4]
+
+def test_system_data_view():
+    branches, nodes, P, Q, R, X, P_gen_limit, Q_gen_limit, Cx = NetData('DATA/teste.xlsx').get_system_data()
+    assert Cx == {1: {1:0, 2:1}, 2: {1:1, 2:0}}
+    assert R[2][2] == 0
+    assert len(R[1]) == 2
+
+def test_bsh_read_in_pu():
+    # DLIN of teste.xlsx: R = 3.8088e-4 ohm, X = 1.9044e-3 ohm, Bsh = 1 S, on the bases of NetData
+    net = NetData('DATA/teste.xlsx', S_base=100, V_base=13.8, cache_dir=False)
+    z_base = 13.8 ** 2 / 100e3
+    y = 1 / (0.2 + 1j)
+    assert np.allclose(net.get_topology().bsh, [1 * z_base])
+    Ybus = net.get_ybus().toarray()
+    assert np.allclose(Ybus, [[y + 0.5j * z_base, -y], [-y, y + 0.5j * z_base]])
+    assert np.allclose(net.get_ybus(shunts=False).toarray(), [[y, -y], [-y, y]])
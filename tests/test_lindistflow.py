@@ -0,0 +1,81 @@
+import sys
+sys.path.append('SRC')
+import contextlib
+import io
+import numpy as np
+import pytest
+import pyomo.environ as pe
+from pyomo.core.expr import polynomial_degree
+from model import SOCP_PF
+from conic import lindistflow_form
+from topology import Topology
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def resolvido(topo, profiles, engine, solver=None):
+    PF = SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8, engine=engine, solver=solver)
+    with contextlib.redirect_stdout(io.StringIO()):
+        PF.resolve()
+    return PF
+
+def test_pyomo_model_is_linear():
+    topo = alimentador_radial(20)
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, engine='lindistflow')
+    assert PF.solver == 'glpk' and PF.pyomo
+    m = PF.build()
+    assert not hasattr(m, 'branch_flow')
+    assert all(polynomial_degree(c.body) == 1 for c in m.component_data_objects(pe.Constraint, active=True))
+    assert polynomial_degree(m.objective.expr) == 1
+    # The current is not in the LP
+    assert not any(v.parent_component() is m.I for c in m.voltage_drop.values()
+                   for v in pe.expr.identify_variables(c.body))
+
+def test_lp_form_has_no_cones():
+    topo = alimentador_radial(20)
+    problema = lindistflow_form(topo, perfis(topo))
+    assert len(problema.rotated_cones) == 0
+    assert (problema.ub[problema.columns['I']] == 0).all()
+
+def test_batched_lp_solution():
+    topo = alimentador_radial(30, seed=1)
+    profiles = perfis(topo, np.linspace(0.5, 1.5, 12))
+    PF = resolvido(topo, profiles, 'lindistflow', 'highs')
+    assert not PF.pyomo
+    valores = PF.result.model_values()
+    assert PF.result.converged and len(PF.result.times) == 12
+    assert (valores['I'] == 0).all()
+
+    # Flows are the downstream loads, voltages fall linearly
+    fluxo = SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8).flat_start()
+    assert np.allclose(valores['P_ij'], fluxo['P_ij'], atol=1e-8)
+    queda = valores['V'][topo.from_idx] - valores['V'][topo.to_idx]
+    assert np.allclose(queda, -2 * (topo.r[:, None] * valores['P_ij'] + topo.x[:, None] * valores['Q_ij']), atol=1e-8)
+    assert np.allclose(PF.result.losses, 0, atol=1e-8)
+
+def test_approximation_error_against_socp():
+    pytest.importorskip('clarabel')
+    topo = alimentador_radial(30, seed=1)
+    profiles = perfis(topo)
+    socp = resolvido(topo, profiles, 'conic').result
+    PF = resolvido(topo, profiles, 'lindistflow', 'highs')
+    erro = PF.approximation_error(socp)
+    assert erro['V'] < 1e-3 and erro['V_mean'] <= erro['V']
+    # The LP neglects exactly the SOCP losses
+    assert erro['losses'] == pytest.approx(socp.losses.max(), rel=1e-6)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert PF.approximation_error(engine='conic') == pytest.approx(erro)
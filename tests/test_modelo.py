@@ -0,0 +1,122 @@
+import sys
+sys.path.append('SRC')
+import numpy as np
+import pandas as pd
+import pyomo.environ as pe
+from pyomo.environ import value
+from pyomo.core.expr import polynomial_degree
+from model import SOCP_PF, linear
+
+
+def test_build_branch_indexed_variables():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=3)
+    modelo = PF.build()
+    assert len(modelo.P_ij) == 1 * 3
+    assert len(modelo.I) == 1 * 3
+    assert len(modelo.V) == 2 * 3
+    assert len(modelo.voltage_drop) == 1 * 3
+    assert len(modelo.branch_flow) == 1 * 3
+
+def test_constraints_indexed_by_bus_and_branch():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=2)
+    modelo = PF.build()
+    assert set(modelo.active_power.keys()) == {(i, t) for i in (1, 2) for t in (0, 1)}
+    assert set(modelo.voltage_drop.keys()) == {(1, 2, 0), (1, 2, 1)}
+    assert polynomial_degree(modelo.active_power[2,1].body) == 1
+    assert polynomial_degree(modelo.voltage_drop[1,2,0].body) == 1
+    assert polynomial_degree(modelo.branch_flow[1,2,0].body) == 2
+
+    # P at the load bus enters its balance as a mutable constant
+    modelo.Pgen[2,1].value = modelo.P_ij[1,2,1].value = 0
+    PF.update_loads(P={2: [0, -10e3]})
+    assert round(value(modelo.active_power[2,1].body), 6) == 0.1
+
+def test_linear_helper():
+    m = pe.ConcreteModel()
+    m.x = pe.Var([1, 2], initialize=2.0)
+    m.p = pe.Param(mutable=True, initialize=3.0)
+    expressao = linear([(1.5, m.x[1]), (-1, m.x[2])], m.p)
+    assert value(expressao) == 3.0 + 1.5 * 2 - 2
+    m.p = 1.0
+    assert value(expressao) == 1.0 + 1.5 * 2 - 2
+
+def test_update_loads_keeps_model():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8)
+    modelo = PF.build()
+    PF.update_loads(P={2: -20e3}, P_gen_limit=[5e6, 0])
+    assert PF.modelo is modelo
+    assert round(modelo.P[2,0].value, 6) == -0.2
+    assert modelo.P[1,0].value == 0
+    assert modelo.Pgen_max[1,0].value == 50
+    assert modelo.Pgen[1,0].ub == 50
+
+def test_update_loads_per_period():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=2)
+    PF.update_loads(P={2: [-10e3, -30e3]})
+    assert round(PF.modelo.P[2,0].value, 6) == -0.1
+    assert round(PF.modelo.P[2,1].value, 6) == -0.3
+    assert PF.profiles['P'].shape == (2, 2)
+
+def test_profiles_from_arrays():
+    P = np.array([[0, 0, 0], [-10e3, -20e3, -30e3]])
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, profiles={'P': P})
+    modelo = PF.build()
+    assert list(PF.times) == [0, 1, 2]
+    assert [round(modelo.P[2,t].value, 6) for t in PF.times] == [-0.1, -0.2, -0.3]
+    # Quantities without profile repeat the DBAR snapshot
+    assert [modelo.Pgen_max[1,t].value for t in PF.times] == [100, 100, 100]
+
+def test_profiles_from_csv_and_npz(tmp_path):
+    pd.DataFrame({'Barra': [2], 't0': [-10e3], 't1': [-20e3]}).to_csv(tmp_path / 'P.csv', index=False)
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, profiles={'P': str(tmp_path / 'P.csv')})
+    PF.load_data()
+    assert np.allclose(PF.profiles['P'], [[0, 0], [-0.1, -0.2]])
+
+    np.savez(tmp_path / 'perfis.npz', P=np.zeros((2, 4)), Q=np.ones((2, 4)) * 1e3)
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=3, profiles=str(tmp_path / 'perfis.npz'))
+    PF.load_data()
+    assert PF.profiles['Q'].shape == (2, 3)
+    assert np.allclose(PF.profiles['Q'], 0.01)
+
+def test_profiles_from_workbook_sheets(tmp_path):
+    path = str(tmp_path / 'perfil.xlsx')
+    sheets = pd.read_excel('DATA/teste.xlsx', sheet_name=None)
+    with pd.ExcelWriter(path) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+        pd.DataFrame({'Barra': [1, 2], 'h1': [0, -40e3], 'h2': [0, -20e3]}).to_excel(writer, sheet_name='DPERFIL_P', index=False)
+
+    PF = SOCP_PF(path, S_base=100, V_base=13.8, profiles=path)
+    PF.load_data()
+    assert len(PF.times) == 2
+    assert np.allclose(PF.profiles['P'][1], [-0.4, -0.2])
+
+def test_flat_start_inside_bounds():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=2)
+    PF.update_loads(P=[0, 30e3])
+    modelo = PF.modelo
+    PF.set_initial_point('flat')
+    assert all(modelo.V[i,t].lb <= modelo.V[i,t].value <= modelo.V[i,t].ub for i in (1,2) for t in (0,1))
+    assert round(modelo.P_ij[1,2,0].value, 6) == -0.3
+    assert round(modelo.Pgen[1,1].value, 6) == 0.3
+
+def test_initial_point_from_previous_model():
+    base = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8)
+    base.build()
+    base.modelo.V[2,0].value = 1.05
+    base.modelo.ipopt_zL_out[base.modelo.V[2,0]] = 0.5
+
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8)
+    PF.build()
+    PF.set_initial_point(base)
+    assert PF.modelo.V[2,0].value == 1.05
+    assert PF.modelo.ipopt_zL_in[PF.modelo.V[2,0]] == 0.5
+
+def test_initial_point_from_result_tuple():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8)
+    PF.build()
+    resultado = ({0: {1: {2: 20.0}, 2: {}}}, {0: {1: {2: 0.0}, 2: {}}}, {0: {1: 1.0, 2: 1.02}}, {0: {1: {2: 0.2}, 2: {}}})
+    PF.set_initial_point(resultado)
+    assert round(PF.modelo.P_ij[1,2,0].value, 6) == 0.2
+    assert round(PF.modelo.V[2,0].value, 6) == round(1.02 ** 2, 6)
+    assert round(PF.modelo.I[1,2,0].value, 6) == 0.04
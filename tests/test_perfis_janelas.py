@@ -0,0 +1,78 @@
+import sys
+sys.path.append('SRC')
+import json
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+from data_handler import NetData
+from model import SOCP_PF
+
+
+def perfil_anual(n_barras, T, seed=0):
+    return np.random.default_rng(seed).uniform(0, 50, (T, n_barras))
+
+def test_convert_power_pu_in_place():
+    valores = np.array([[1e3, np.nan], [-2e3, 4e3]])
+    pu = NetData.convert_power_pu(valores, 1e5, inplace=True)
+    assert pu is valores
+    assert np.array_equal(valores, [[0.01, 0], [-0.02, 0.04]])
+
+@pytest.mark.parametrize('formato', ['csv', 'parquet', 'npy'])
+def test_windows_match_whole_profile(tmp_path, formato):
+    barras = np.arange(1, 31)
+    dados = perfil_anual(30, 100)
+    path = str(tmp_path / f'P.{formato}')
+    if formato == 'npy':
+        np.save(path, dados)
+    else:
+        # Bus 30 is missing from the file and reads as 0
+        tabela = pd.DataFrame(dados[:, :29], columns=barras[:29].astype(str))
+        tabela.index.name = 't'
+        if formato == 'csv':
+            tabela.to_csv(path)
+        else:
+            pytest.importorskip('pyarrow')
+            tabela.to_parquet(path)
+        dados[:, 29] = 0
+
+    net = NetData('DATA/teste.xlsx', S_base=100)
+    janelas = list(net.iter_profiles({'P': path}, barras, window=24, start=5, stop=77, block=7))
+    assert [inicio for inicio, _ in janelas] == [5, 29, 53]
+    assert [p['P'].shape for _, p in janelas] == [(30, 24)] * 3
+    assert np.allclose(np.concatenate([p['P'] for _, p in janelas], axis=1), dados[5:77].T / 1e5)
+
+def test_windows_memory_bounded(tmp_path):
+    barras = np.arange(1, 501)
+    np.save(tmp_path / 'P.npy', perfil_anual(500, 8760))
+    net = NetData('DATA/teste.xlsx', S_base=100)
+
+    tracemalloc.start()
+    try:
+        periodos = sum(p['P'].shape[1] for _, p in net.iter_profiles({'P': str(tmp_path / 'P.npy')}, barras, window=24))
+        pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert periodos == 8760
+    # A few windows of 500 x 24 floats, far from the 35 MB of the whole year
+    assert pico < 2e6
+
+def test_mismatched_horizons(tmp_path):
+    np.save(tmp_path / 'P.npy', perfil_anual(2, 48))
+    np.save(tmp_path / 'Q.npy', perfil_anual(2, 30))
+    net = NetData('DATA/teste.xlsx', S_base=100)
+    with pytest.raises(ValueError):
+        list(net.iter_profiles({'P': str(tmp_path / 'P.npy'), 'Q': str(tmp_path / 'Q.npy')}, [1, 2], window=24))
+
+def test_solve_windows_streams_results(tmp_path):
+    P = np.c_[np.zeros(10), np.linspace(-5e3, -20e3, 10)]
+    np.save(tmp_path / 'P.npy', P)
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep',
+                 profiles={'P': str(tmp_path / 'P.npy')}, output_dir=str(tmp_path / 'out'))
+    resultados = list(PF.solve_windows(window=4))
+    assert [r.times for r in resultados] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+    inteiro = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep', profiles={'P': P.T}).solve()
+    assert np.allclose(np.concatenate([r.V for r in resultados]), inteiro.V)
+    with open(tmp_path / 'out' / 'output.json') as f:
+        assert len(json.load(f)) == 10
@@ -0,0 +1,80 @@
+import sys
+sys.path.append('SRC')
+import contextlib
+import io
+import numpy as np
+import pytest
+from topology import Topology
+from model import SOCP_PF
+from reduction import TopologyReduction, solve_reduced
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def alimentador_com_vazias(n=200, seed=4):
+    """ Radial feeder where most buses have no load """
+    topo = alimentador_radial(n, seed=seed)
+    vazias = np.random.default_rng(1).random(n) < 0.6
+    vazias[topo.root] = False
+    topo.P[vazias] = topo.Q[vazias] = 0
+    return topo
+
+def test_chain_and_dead_end_reduced():
+    # 1 - 2 - 3 - 4 (load) - 5 - 6 and 3 - 7 (load); only 2 and the dead end 5 - 6 go away
+    topo = Topology(range(1, 8), [1, 2, 3, 4, 5, 3], [2, 3, 4, 5, 6, 7],
+                    r=[1, 2, 3, 4, 5, 6], x=[1, 1, 1, 1, 1, 1], P=[0, 0, 0, 1, 0, 0, 1], Q=np.zeros(7),
+                    P_gen_limit=[5, 0, 0, 0, 0, 0, 0], Q_gen_limit=[5, 0, 0, 0, 0, 0, 0])
+    reducao = TopologyReduction(topo)
+    assert reducao.topology.nodes.tolist() == [1, 3, 4, 7]
+    assert reducao.topology.branch_list() == [(1, 3), (3, 4), (3, 7)]
+    assert reducao.topology.r.tolist() == [3, 3, 6]
+    assert reducao.summary['pruned'] == 2 and reducao.summary['merged'] == 1
+
+    # Kept buses are never removed
+    assert TopologyReduction(topo, keep=[2, 5, 6]).topology.n_bus == 7
+
+def test_profiles_decide_zero_injection():
+    topo = alimentador_com_vazias(50)
+    profiles = perfis(topo)
+    vazia = int(np.flatnonzero(profiles['P'][:, 0] == 0)[-1])
+    profiles['P'][vazia, 1] = 0.01
+    assert topo.nodes[vazia] in TopologyReduction(topo, profiles).topology.nodes
+    assert topo.nodes[vazia] not in TopologyReduction(topo).topology.nodes
+
+@pytest.mark.parametrize('engine', ['sweep', 'conic'])
+def test_expanded_result_matches_full_network(engine):
+    if engine == 'conic':
+        pytest.importorskip('clarabel')
+    topo = alimentador_com_vazias()
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, engine=engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        inteiro = PF.resolve()
+        reduzido, reducao = solve_reduced(PF)
+
+    assert reducao.topology.n_bus < 0.6 * topo.n_bus
+    assert reduzido.nodes == inteiro.nodes and reduzido.branches == inteiro.branches
+    assert reduzido.converged
+    assert np.allclose(reduzido.V, inteiro.V, atol=1e-6)
+    # Within 1e-4 p.u. (the full conic model also keeps ~1e-5 of slack current on dead ends)
+    valores, referencia = reduzido.model_values(), inteiro.model_values()
+    for nome in ('I', 'P_ij', 'Q_ij', 'Pgen'):
+        assert np.allclose(valores[nome], referencia[nome], atol=1e-4)
+
+    # Pruning alone is exact
+    interiores = [int(topo.nodes[topo.to_idx[b]]) for c in reducao.chains for b in c[:-1]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        podado, _ = solve_reduced(PF, keep=interiores)
+    assert np.allclose(podado.V, inteiro.V, atol=1e-7)
@@ -0,0 +1,48 @@
+import sys
+sys.path.append('SRC')
+import numpy as np
+from model import SOCP_PF
+from results import PFResult
+
+
+def resultado_sweep():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=2, engine='sweep')
+    return PF, PF.solve()
+
+def test_result_arrays():
+    PF, resultado = resultado_sweep()
+    assert isinstance(resultado, PFResult)
+    assert resultado.V.shape == (2, 2)
+    assert resultado.P_ij.shape == (2, 1)
+    assert not hasattr(resultado, '__dict__')
+    assert np.allclose(resultado.losses, resultado.Pgen.sum(axis=1) - PF.profiles['P'].sum(axis=0) * 100)
+
+def test_result_unpacks_as_dicts():
+    PF, resultado = resultado_sweep()
+    P_ij, Q_ij, V, I = resultado
+    assert set(V) == {0, 1}
+    assert V[1][2] == resultado.V[1, 1]
+    assert P_ij[0][1][2] == resultado.P_ij[0, 0]
+    assert P_ij[0][2] == {}
+
+def test_result_indexes_as_legacy_tuple():
+    PF, resultado = resultado_sweep()
+    assert len(resultado) == 4
+    assert resultado[2] == resultado.as_dicts()['V']
+    assert resultado[-1] == resultado.as_dicts()['I']
+    assert resultado[:2] == tuple(resultado)[:2]
+
+def test_result_frames():
+    PF, resultado = resultado_sweep()
+    barras = resultado.to_frame('bus')
+    ramos = resultado.to_frame('branch')
+    assert barras.loc[(1, 2), 'V'] == resultado.V[1, 1]
+    assert ramos.loc[(0, 1, 2), 'P_ij'] == resultado.P_ij[0, 0]
+
+def test_result_round_trip_as_initial_point():
+    PF, resultado = resultado_sweep()
+    socp = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, times=2)
+    socp.build()
+    socp.set_initial_point(resultado)
+    assert np.isclose(socp.modelo.V[2,1].value, resultado.V[1, 1] ** 2)
+    assert np.isclose(socp.modelo.P_ij[1,2,0].value * 100, resultado.P_ij[0, 0])
@@ -0,0 +1,96 @@
+import sys
+sys.path.append('SRC')
+import contextlib
+import io
+import numpy as np
+import pytest
+from model import SOCP_PF
+from hosting import hosting_capacity, capacity_estimates
+from topology import Topology
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def resolvido(topo, profiles):
+    PF = SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8, engine='conic')
+    with contextlib.redirect_stdout(io.StringIO()):
+        PF.resolve()
+    return PF
+
+def test_duals_from_suffix():
+    topo = alimentador_radial(10)
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, solver='glpk')
+    m = PF.build()
+    assert m.dual.import_enabled()
+    for k, c in enumerate(m.active_power.values()):
+        m.dual[c] = 10.0 + k
+    # Constraints without a dual are an error, not NaN
+    with pytest.raises(ValueError, match='reactive_power, voltage_drop'):
+        PF.duals()
+
+    for nome in ('reactive_power', 'voltage_drop'):
+        for c in getattr(m, nome).values():
+            m.dual[c] = -1.0
+    duais = PF.duals()
+    assert duais['active_power'].shape == (10, 2)
+    # The Suffix is already d(objective)/d(load)
+    assert duais['active_power'][0, 0] == 10 and (duais['voltage_drop'] == -1).all()
+
+@pytest.mark.parametrize('engine, solver', [('conic', 'clarabel'), ('lindistflow', 'highs')])
+def test_conic_duals_sign(engine, solver):
+    if solver == 'clarabel':
+        pytest.importorskip('clarabel')
+    topo = alimentador_radial(10)
+    PF = SOCP_PF.from_data(topo, perfis(topo), S_base=100, V_base=13.8, engine=engine, solver=solver)
+    with pytest.raises(ValueError, match='resolve'):
+        PF.duals()
+    with contextlib.redirect_stdout(io.StringIO()):
+        PF.resolve()
+    # Load at the root is served by Pgen at cost 10 per p.u.
+    assert np.allclose(PF.duals()['active_power'][topo.root], 10, rtol=1e-4)
+
+def test_sensitivities_match_perturbation():
+    pytest.importorskip('clarabel')
+    topo = alimentador_radial(30, seed=1)
+    PF = resolvido(topo, perfis(topo))
+    sens = PF.sensitivities()
+    assert np.abs(PF.relaxation_gap()).max() < 1e-8
+    assert np.allclose(sens['loss_P'][topo.root], 0)
+
+    base = PF.result
+    k, d = 17, 1e-3
+    PF.profiles['P'][k] -= d
+    with contextlib.redirect_stdout(io.StringIO()):
+        injetado = PF.resolve()
+    perdas = (injetado.losses - base.losses) / PF.S_base
+    assert np.allclose(perdas, -sens['loss_P'][k] * d, rtol=0.05)
+    assert np.allclose(injetado.V[:, k] - base.V[:, k], sens['V_P'][k] * d, rtol=0.05)
+
+def test_hosting_capacity_brackets():
+    pytest.importorskip('clarabel')
+    topo = alimentador_radial(30, seed=1)
+    topo.r *= 15
+    topo.x *= 15
+    PF = resolvido(topo, perfis(topo))
+    estimativas = capacity_estimates(PF, [10, 17])
+    tabela = hosting_capacity(PF, buses=[10, 17], max_solves=4)
+
+    assert np.allclose(tabela['estimate'], estimativas * 1e5)
+    assert (tabela['solves'] == 4).all()
+    assert (tabela['capacity'] > 0).all() and (tabela['capacity'] < tabela['upper']).all()
+    # Four solves around the estimate bracket the capacity within a few percent
+    assert ((tabela['upper'] - tabela['capacity']) / tabela['capacity'] < 0.1).all()
+    assert np.allclose(PF.profiles['P'], perfis(topo)['P'])
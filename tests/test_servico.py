@@ -0,0 +1,80 @@
+import sys
+sys.path.append('SRC')
+import asyncio
+import numpy as np
+import pytest
+from model import SOCP_PF
+from service import PowerFlowService, ModelCache, SolveJob, fetch
+
+JOB = {'data_dir': 'DATA/teste.xlsx', 'S_base': 100, 'V_base': 13.8, 'engine': 'sweep'}
+
+
+def servir(requisicoes, **kwargs):
+    """ Run the service on a free port, send the requests in turn and return the answers """
+    async def run():
+        service = await PowerFlowService(**kwargs).start(port=0)
+        port = service.address[1]
+        try:
+            return [await fetch(*req, port=port) for req in requisicoes]
+        finally:
+            await service.close()
+    return asyncio.run(run())
+
+def test_job_validation():
+    with pytest.raises(ValueError):
+        SolveJob.parse(b'{"data_dir": "DATA/teste.xlsx"}')
+    with pytest.raises(ValueError):
+        SolveJob.parse(b'{"data_dir": "DATA/nao_existe.xlsx", "S_base": 100, "V_base": 13.8}')
+    assert SolveJob.parse(b'{"data_dir": "DATA/teste.xlsx", "S_base": 100, "V_base": 13.8, '
+                          b'"P": {"2": -5000}}')['P'] == {2: -5000}
+
+    # Profiles: a file path or {quantity: path or list}
+    job = b'{"data_dir": "DATA/teste.xlsx", "S_base": 100, "V_base": 13.8, "profiles": %s}'
+    for perfis in (b'"DATA/nao_existe.xlsx"', b'["DATA/teste.xlsx"]', b'{"X": [[1]]}', b'{"P": 3}',
+                   b'{"P": "DATA/nao_existe.csv"}'):
+        with pytest.raises(ValueError):
+            SolveJob.parse(job % perfis)
+    assert SolveJob.parse(job % b'{"P": [[0], [-100]]}')['profiles'] == {'P': [[0], [-100]]}
+
+def test_cache_key_of_profile_file(tmp_path):
+    perfis = tmp_path / 'perfis.npz'
+    np.savez(perfis, P=np.array([[0.0], [-40e3]]))
+    job = dict(JOB, profiles=str(perfis))
+    chave = ModelCache.key(job)
+    assert chave == ModelCache.key(job)
+    np.savez(perfis, P=np.array([[0.0, 0.0], [-40e3, -20e3]]))
+    assert ModelCache.key(job) != chave
+    pf, _ = ModelCache().get(job)
+    assert np.allclose(pf.profiles['P'], [[0, 0], [-0.4, -0.2]])
+
+def test_model_cache_lru():
+    cache = ModelCache(maxsize=1)
+    pf, cached = cache.get(JOB)
+    assert not cached and cache.get(JOB) == (pf, True)
+    cache.get(dict(JOB, S_base=10))
+    assert len(cache) == 1 and not cache.get(JOB)[1]
+
+def test_solve_sends_periods_and_uses_cache():
+    respostas = servir([('GET', '/health'), ('POST', '/solve', JOB),
+                        ('POST', '/solve', dict(JOB, P={2: -10000})),
+                        ('POST', '/solve', JOB), ('GET', '/stats'), ('POST', '/solve', {'S_base': 100}),
+                        ('GET', '/nada')], workers=2)
+    saude, primeiro, injecao, repetido, stats, erro, rota = respostas
+    assert saude == (200, [{'status': 'ok'}])
+
+    status, linhas = primeiro
+    assert status == 200
+    assert [linha['type'] for linha in linhas] == ['period', 'summary']
+    resumo = linhas[-1]
+    assert resumo['converged'] and not resumo['cached']
+
+    esperado = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep').solve()
+    assert np.allclose(linhas[0]['buses']['V'], esperado.V[0])
+
+    # The cached model is reset to the base case between jobs
+    assert injecao[1][-1]['cached'] and injecao[1][0]['buses']['V'] != linhas[0]['buses']['V']
+    assert repetido[1][-1]['cached'] and repetido[1][0]['buses']['V'] == linhas[0]['buses']['V']
+    assert stats[1][0]['jobs'] == 3 and stats[1][0]['cache_hits'] == 2
+
+    assert erro[0] == 400 and 'Missing' in erro[1][0]['error']
+    assert rota[0] == 404
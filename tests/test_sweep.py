@@ -0,0 +1,68 @@
+import sys
+sys.path.append('SRC')
+import numpy as np
+import pytest
+import pyomo.environ as pe
+from topology import Topology
+from sweep import backward_forward_sweep
+from model import SOCP_PF, VARIABLES
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def test_sweep_satisfies_socp_equations():
+    topo = alimentador_radial()
+    P = np.c_[topo.P, 2 * topo.P]
+    Q = np.c_[topo.Q, 2 * topo.Q]
+    res = backward_forward_sweep(topo, P, Q)
+    assert res['converged']
+
+    profiles = {'P': P, 'Q': Q, 'P_gen_limit': np.c_[topo.P_gen_limit, topo.P_gen_limit],
+                'Q_gen_limit': np.c_[topo.Q_gen_limit, topo.Q_gen_limit]}
+    PF = SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8)
+    PF.build()
+    PF.set_initial_point({name: res[name] for name in VARIABLES})
+    m = PF.modelo
+    for restricoes in (m.active_power, m.reactive_power, m.voltage_drop, m.perdas):
+        assert max(abs(pe.value(c.body) - pe.value(c.upper)) for c in restricoes.values()) < 1e-9
+    # Cone (4) is tight
+    assert max(abs(pe.value(c.body)) for c in m.branch_flow.values()) < 1e-9
+
+def test_sweep_scenario_matrix():
+    topo = alimentador_radial()
+    escalas = np.array([0.5, 1.0, 1.5])
+    res = backward_forward_sweep(topo, topo.P[:, None] * escalas, topo.Q[:, None] * escalas)
+    assert res['V'].shape == (topo.n_bus, 3)
+    assert res['P_ij'].shape == (topo.n_branch, 3)
+    # More load, lower voltages and more losses
+    assert np.all(np.diff(res['V'].min(axis=0)) < 0)
+    assert np.all(np.diff(res['Perdas'].sum(axis=0)) > 0)
+
+    single = backward_forward_sweep(topo, topo.P, topo.Q)
+    assert np.allclose(single['V'], res['V'][:, 1])
+
+def test_sweep_engine():
+    PF = SOCP_PF('DATA/teste.xlsx', S_base=100, V_base=13.8, engine='sweep')
+    P_ij, Q_ij, V, I = PF.solve()
+    assert PF.modelo is None
+    assert V[0][1] == 1.0
+    # Bus 2 injects 0.4 p.u. towards the root
+    assert round(P_ij[0][1][2] / 100, 6) == 0.4
+    # V2^2 = 1 + 2 r P - (r^2 + x^2) P^2
+    assert abs(V[0][2] ** 2 - (1 + 2 * 0.2 * 0.4 - 1.04 * 0.16)) < 1e-6
+
+def test_sweep_rejects_meshed_feeder():
+    # The tie 4-3 closes a loop: out of the tree, the sweep cannot place it
+    P = np.r_[0, 0.01, 0.01, 0.01]
+    topo = Topology(range(1, 5), [1, 2, 1, 4], [2, 3, 4, 3], r=np.full(4, 0.01), x=np.full(4, 0.01),
+                    P=P, Q=P, P_gen_limit=np.r_[10, 0, 0, 0], Q_gen_limit=np.r_[10, 0, 0, 0])
+    assert topo.tree.tolist() == [True, True, True, False]
+    with pytest.raises(ValueError):
+        backward_forward_sweep(topo, topo.P, topo.Q)
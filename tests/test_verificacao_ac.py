@@ -0,0 +1,87 @@
+import sys
+sys.path.append('SRC')
+import contextlib
+import io
+import numpy as np
+from data_handler import NetData
+from model import SOCP_PF
+from results import PFResult
+from acpf import newton_raphson, verify_ac, injections, power_mismatch
+from topology import Topology
+
+
+def alimentador_radial(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    pais = [int(rng.integers(0, k)) for k in range(1, n)]
+    P = np.r_[0, rng.uniform(0, 0.02, n - 1)]
+    gen = np.r_[10, np.zeros(n - 1)]
+    return Topology(range(1, n + 1), [p + 1 for p in pais], range(2, n + 1),
+                    r=rng.uniform(1e-3, 1e-2, n - 1), x=rng.uniform(1e-3, 1e-2, n - 1),
+                    P=P, Q=0.5 * P, P_gen_limit=gen, Q_gen_limit=gen)
+
+def perfis(topo, escalas=(1.0, 1.5)):
+    escalas = np.asarray(escalas)
+    return {'P': topo.P[:, None] * escalas, 'Q': topo.Q[:, None] * escalas,
+            'P_gen_limit': np.repeat(topo.P_gen_limit[:, None], len(escalas), axis=1),
+            'Q_gen_limit': np.repeat(topo.Q_gen_limit[:, None], len(escalas), axis=1)}
+
+def resolvido(topo, profiles, engine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SOCP_PF.from_data(topo, profiles, S_base=100, V_base=13.8, engine=engine).resolve()
+
+def test_ybus_from_branch_table():
+    topo = alimentador_radial(20)
+    topo.bsh[:] = 1e-3
+    Y = topo.admittance(shunts=False)
+    assert Y.shape == (20, 20) and Y.nnz == 20 + 2 * 19
+    assert abs(Y - Y.T).max() == 0
+    # Without shunts a flat profile draws no current
+    assert np.allclose(Y @ np.ones(20), 0)
+    assert np.allclose(topo.admittance() @ np.ones(20), 1e-3j * np.bincount(
+        np.r_[topo.from_idx, topo.to_idx], minlength=20) / 2)
+
+    net = NetData('DATA/teste.xlsx', S_base=100, cache_dir=False)
+    assert net.Ybar is None
+    Ybus = net.get_ybus()
+    assert net.Ybar is Ybus and Ybus.shape == (net.get_topology().n_bus,) * 2
+
+def test_batched_newton_raphson_matches_single_cases():
+    topo = alimentador_radial(40, seed=3)
+    escalas = np.linspace(0.5, 2.0, 6)
+    S = -(topo.P + 1j * topo.Q)[:, None] * escalas
+    Y = topo.admittance()
+    lote = newton_raphson(Y, S, np.ones(S.shape), topo.root)
+    assert lote['converged'].all() and lote['iterations'] < 8
+    assert np.abs(power_mismatch(Y, lote['V'], S)[1:]).max() < 1e-8
+    for k in (0, 5):
+        sozinho = newton_raphson(Y, S[:, k], np.ones(40), topo.root)
+        assert np.allclose(sozinho['V'][:, 0], lote['V'][:, k], atol=1e-10)
+
+def test_verify_tight_solutions_in_one_batch():
+    topo = alimentador_radial(30, seed=1)
+    profiles = perfis(topo, np.linspace(0.5, 1.5, 8))
+    resultados = [resolvido(topo, profiles, 'sweep'), resolvido(topo, profiles, 'sweep')]
+    relatorio = verify_ac(topo, resultados)
+
+    assert len(relatorio) == 16 and relatorio['case'].tolist() == [0] * 8 + [1] * 8
+    assert relatorio['converged'].all()
+    assert (relatorio['relaxation_gap'].abs() < 1e-12).all()
+    assert (relatorio['iterations'] <= 3).all()
+    assert (relatorio['V_error'] < 1e-4).all()
+    assert np.allclose(relatorio['losses_ac'], relatorio['losses'], rtol=0.02)
+
+def test_verify_flags_inexact_relaxation():
+    topo = alimentador_radial(30, seed=1)
+    resultado = resolvido(topo, perfis(topo), 'sweep')
+    valores = resultado.model_values()
+    # Current above the one of the flows on branch 3: losses that no power flow has
+    valores['I'][3] *= 1.5
+    folgado = PFResult.from_values(valores, topo, resultado.times, resultado.scale, True)
+    relatorio = verify_ac(topo, [resultado, folgado])
+
+    assert (relatorio.loc[relatorio['case'] == 1, 'relaxation_gap'] > 1e-4).all()
+    assert (relatorio.loc[relatorio['case'] == 1, 'start_mismatch'] >
+            10 * relatorio.loc[relatorio['case'] == 0, 'start_mismatch'].to_numpy()).all()
+    # The injections of the balances carry the extra losses
+    assert np.allclose(injections(topo, valores).real.sum(axis=0),
+                       (topo.r[:, None] * valores['I']).sum(axis=0))